@@ -10,6 +10,7 @@ from database import (
     ChatHistory, KnowledgePoint, StudentDispute, KnowledgeMastery
 )
 from api.auth import get_current_user
+from services.fast_json import list_response
 
 # 创建路由器
 analytics_router = APIRouter()
@@ -273,7 +274,7 @@ async def get_system_activities(
     # 按时间排序
     activities.sort(key=lambda x: x.timestamp, reverse=True)
 
-    return activities[:limit]
+    return list_response(SystemActivity, activities[:limit])
 
 @analytics_router.get("/teacher-dashboard")
 async def get_teacher_dashboard(
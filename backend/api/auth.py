@@ -1,17 +1,105 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, make_transient_to_detached
 from pydantic import BaseModel
 from datetime import timedelta
-from typing import Optional
+from typing import Dict, Optional
+from collections import OrderedDict
+import os
+import threading
+import time
 
 from database import get_db, User
-from auth import verify_password, create_access_token, verify_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_password_hash
+from auth import (
+    verify_password, create_access_token, verify_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_password_hash,
+    verify_password_async, get_password_hash_async, PasswordPoolBusy
+)
 
 # 创建路由器
 auth_router = APIRouter()
 security = HTTPBearer()
 
+# 认证用户缓存配置
+class UserCacheConfig:
+    TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+    MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+
+class CachedPrincipal:
+    """缓存的认证主体：用户列值快照 + 令牌版本 + 预计算的权限集合"""
+
+    def __init__(self, user: User, permissions: frozenset):
+        self.values = {attr.key: getattr(user, attr.key) for attr in User.__mapper__.column_attrs}
+        self.user_id = user.id
+        self.class_id = user.class_id
+        self.token_version = user.token_version or 0
+        self.permissions = permissions
+        self.expires_at = time.monotonic() + UserCacheConfig.TTL_SECONDS
+
+    def attach(self, db: Session) -> User:
+        """
+        把快照还原为当前会话中的持久化 User 对象，不产生任何 SQL；
+        之后对它的修改与关系访问与查询得到的对象完全一致
+        """
+        user = User(**self.values)
+        make_transient_to_detached(user)
+        user = db.merge(user, load=False)
+        user.permissions = self.permissions
+        return user
+
+class UserCache:
+    """进程内认证用户缓存（按用户ID，命中时还要求令牌版本一致），短 TTL + LRU"""
+
+    def __init__(self):
+        self._entries: "OrderedDict[int, CachedPrincipal]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[CachedPrincipal]:
+        with self._lock:
+            principal = self._entries.get(user_id)
+            if principal is None:
+                return None
+            if principal.expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def put(self, user: User) -> CachedPrincipal:
+        # 延迟导入：permission_service 依赖本模块的 get_current_user
+        from services.permission_service import ROLE_PERMISSION_SETS
+        principal = CachedPrincipal(user, ROLE_PERMISSION_SETS.get(user.role, frozenset()))
+        with self._lock:
+            self._entries[user.id] = principal
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > UserCacheConfig.MAX_SIZE:
+                self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def invalidate_class(self, class_id: int):
+        """班级变更时，清除该班级所有用户的缓存"""
+        with self._lock:
+            for user_id in [uid for uid, p in self._entries.items() if p.class_id == class_id]:
+                del self._entries[user_id]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# 创建全局认证用户缓存实例
+user_cache = UserCache()
+
+def create_user_token(user: User) -> str:
+    """为用户签发访问令牌（携带令牌版本）"""
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    return create_access_token(
+        data={"sub": str(user.id), "ver": user.token_version or 0},
+        expires_delta=access_token_expires
+    )
+
 # Pydantic模型
 class LoginRequest(BaseModel):
     account_id: str
@@ -33,10 +121,16 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> User:
     """获取当前用户"""
+    # 批量请求的子请求：批量接口已完成认证，直接还原同一认证主体
+    principal = getattr(request.state, "batch_principal", None)
+    if principal is not None:
+        return principal.attach(db)
+    
     token = credentials.credentials
     payload = verify_token(token)
     if payload is None:
@@ -46,22 +140,40 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user_id: int = payload.get("sub")
-    if user_id is None:
+    try:
+        user_id = int(payload.get("sub"))
+    except (TypeError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="无效的认证令牌",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    # 旧令牌没有版本号，视为版本0
+    token_version = payload.get("ver", 0)
+    
+    # 缓存命中且令牌版本一致时直接还原用户对象，省去一次数据库查询
+    principal = user_cache.get(user_id)
+    if principal is not None and principal.token_version == token_version:
+        return principal.attach(db)
     
     user = db.query(User).filter(User.id == user_id).first()
     if user is None:
+        user_cache.invalidate(user_id)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户不存在",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    if (user.token_version or 0) != token_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="认证令牌已失效，请重新登录",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    principal = user_cache.put(user)
+    user.permissions = principal.permissions
     return user
 
 @auth_router.post("/login", response_model=LoginResponse)
@@ -75,19 +187,24 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
             detail="账号或密码错误"
         )
     
-    # 验证密码
-    if not verify_password(request.password, user.hashed_password):
+    # 验证密码（bcrypt 在线程池中执行，登录高峰时排队已满直接返回503）
+    try:
+        password_ok = await verify_password_async(request.password, user.hashed_password)
+    except PasswordPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="登录人数过多，请稍后重试",
+            headers={"Retry-After": "1"}
+        )
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="账号或密码错误"
         )
     
-    # 创建访问令牌
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user.id)},
-        expires_delta=access_token_expires
-    )
+    # 创建访问令牌，并预热认证缓存
+    access_token = create_user_token(user)
+    user_cache.put(user)
     
     # 返回用户信息
     user_data = {
@@ -123,11 +240,7 @@ async def logout():
 @auth_router.post("/refresh")
 async def refresh_token(current_user: User = Depends(get_current_user)):
     """刷新访问令牌"""
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(current_user.id)},
-        expires_delta=access_token_expires
-    )
+    access_token = create_user_token(current_user)
     
     return {
         "access_token": access_token,
@@ -0,0 +1,157 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+import asyncio
+import os
+
+from database import User
+from api.auth import get_current_user, CachedPrincipal
+from services.fast_json import embed_json, dumps
+
+# 创建路由器
+batch_router = APIRouter()
+
+# 批量请求配置
+class BatchConfig:
+    MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+    # 同时执行的子请求数（每个子请求占用一个数据库连接，不宜超过连接池大小）
+    MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "5"))
+    SUBREQUEST_TIMEOUT = float(os.getenv("BATCH_SUBREQUEST_TIMEOUT", "30"))
+
+# 子响应中透传的响应头（分页游标、缓存校验）
+FORWARDED_HEADERS = ("x-next-cursor", "link", "etag", "last-modified", "retry-after")
+
+# Pydantic模型
+class BatchSubRequest(BaseModel):
+    id: Optional[str] = None  # 调用方自定义标识，原样返回
+    method: str = "GET"
+    path: str  # 如 /student/videos?limit=20，可省略 /api 前缀
+    params: Optional[Dict[str, Any]] = None
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest]
+
+class BatchSubResponse(BaseModel):
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str] = {}
+    body: Any = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchSubResponse]
+
+def normalize_path(path: str) -> str:
+    """子请求路径统一为 /api/... 形式"""
+    path = "/" + path.lstrip("/")
+    if path != "/api" and not path.startswith("/api/"):
+        path = "/api" + path
+    return path
+
+async def run_subrequest(request: Request, sub: BatchSubRequest, principal: CachedPrincipal,
+                         semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """在进程内把子请求交给应用处理（完整经过路由、依赖与异常处理），收集响应"""
+    parts = urlsplit(normalize_path(sub.path))
+    query_string = parts.query
+    if sub.params:
+        extra = urlencode(sub.params, doseq=True)
+        query_string = f"{query_string}&{extra}" if query_string else extra
+
+    headers = [(b"accept", b"application/json")]
+    authorization = request.headers.get("authorization")
+    if authorization:
+        headers.append((b"authorization", authorization.encode("latin-1")))
+
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": request.scope.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": request.url.scheme,
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": request.scope.get("root_path", ""),
+        "path": parts.path,
+        "raw_path": parts.path.encode(),
+        "query_string": query_string.encode(),
+        "headers": headers,
+        # 批量接口已完成认证，子请求的 get_current_user 直接还原该认证主体
+        "state": {"batch_principal": principal},
+    }
+
+    result: Dict[str, Any] = {"status": None, "headers": {}, "chunks": [], "content_type": ""}
+    finished = asyncio.Event()
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # 流式响应会等待断开消息，子请求处理完后再返回
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+            for key, value in message.get("headers", []):
+                name = key.decode("latin-1").lower()
+                if name == "content-type":
+                    result["content_type"] = value.decode("latin-1")
+                elif name in FORWARDED_HEADERS:
+                    result["headers"][name] = value.decode("latin-1")
+        elif message["type"] == "http.response.body":
+            result["chunks"].append(message.get("body", b""))
+
+    async with semaphore:
+        try:
+            await asyncio.wait_for(request.app(scope, receive, send), BatchConfig.SUBREQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            result.update(status=504, chunks=[dumps({"detail": "子请求超时"})], content_type="application/json")
+        except Exception:
+            # 未处理的异常已由应用写出 500 响应；尚未写出时补一个
+            if result["status"] is None:
+                result.update(status=500, chunks=[dumps({"detail": "子请求执行失败"})],
+                              content_type="application/json")
+        finally:
+            finished.set()
+
+    body = b"".join(result["chunks"])
+    if not body:
+        content = None
+    elif result["content_type"].startswith("application/json"):
+        # 子响应已是 JSON，原样嵌入，不再解析再编码
+        content = embed_json(body)
+    else:
+        content = body.decode("utf-8", errors="replace")
+    return {"id": sub.id, "status": result["status"], "headers": result["headers"], "body": content}
+
+@batch_router.post("", response_model=BatchResponse)
+async def run_batch(
+    batch: BatchRequest,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    批量执行只读请求：一次认证，子请求并发执行，结果按请求顺序合并返回
+    单个子请求失败不影响其他子请求，失败信息在各自的 status/body 中
+    """
+    if not batch.requests:
+        raise HTTPException(status_code=400, detail="批量请求不能为空")
+    if len(batch.requests) > BatchConfig.MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"单次批量请求最多 {BatchConfig.MAX_REQUESTS} 个子请求")
+    for sub in batch.requests:
+        if sub.method.upper() != "GET":
+            raise HTTPException(status_code=400, detail=f"批量请求只支持 GET 子请求: {sub.method} {sub.path}")
+        path = normalize_path(urlsplit(sub.path).path)
+        if path == "/api/batch" or path.startswith("/api/batch/"):
+            raise HTTPException(status_code=400, detail="批量请求不能嵌套")
+
+    principal = CachedPrincipal(current_user, getattr(current_user, "permissions", frozenset()))
+    semaphore = asyncio.Semaphore(max(1, BatchConfig.MAX_CONCURRENCY))
+    responses = await asyncio.gather(*[
+        run_subrequest(request, sub, principal, semaphore) for sub in batch.requests
+    ])
+    return Response(content=dumps({"responses": responses}), media_type="application/json")
@@ -4,7 +4,7 @@ from pydantic import BaseModel
 from typing import List, Optional
 
 from database import get_db, Class, User
-from api.auth import get_current_user
+from api.auth import get_current_user, user_cache
 
 # 创建路由器
 classes_router = APIRouter()
@@ -94,6 +94,7 @@ async def update_class(
     
     db.commit()
     db.refresh(cls)
+    user_cache.invalidate_class(class_id)
     
     return ClassResponse.from_orm(cls)
 
@@ -114,5 +115,6 @@ async def delete_class(
     
     db.delete(cls)
     db.commit()
+    user_cache.invalidate_class(class_id)
     
     return {"message": "班级删除成功"} 
\ No newline at end of file
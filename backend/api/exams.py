@@ -6,6 +6,7 @@ from datetime import datetime
 
 from database import get_db, Exam, User
 from api.auth import get_current_user
+from services.pagination import PageParams
 
 # 创建路由器
 exams_router = APIRouter()
@@ -47,12 +48,13 @@ class ExamResponse(BaseModel):
 
 @exams_router.get("/", response_model=List[ExamResponse])
 async def get_exams(
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
     class_id: Optional[int] = None,
     is_active: Optional[bool] = None
 ):
-    """获取考试列表"""
+    """获取考试列表（游标分页）"""
     query = db.query(Exam)
     
     # 根据用户角色过滤
@@ -68,7 +70,7 @@ async def get_exams(
     if is_active is not None:
         query = query.filter(Exam.is_active == is_active)
     
-    exams = query.order_by(Exam.created_at.desc()).all()
+    exams = page.apply(query, Exam.id, Exam.created_at)
     return [ExamResponse.from_orm(exam) for exam in exams]
 
 @exams_router.get("/{exam_id}", response_model=ExamResponse)
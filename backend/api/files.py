@@ -9,6 +9,7 @@ from pathlib import Path
 from database import get_db, User
 from api.auth import get_current_user
 from services.file_service import file_service
+from services.pagination import PageParams
 
 # 创建路由器
 files_router = APIRouter()
@@ -47,6 +48,8 @@ async def upload_file(
             file_type=file_type,
             storage_type=storage_type
         )
+
+        file_service.register_upload(db, file_info, uploader_id=current_user.id)
         
         return UploadResponse(
             success=True,
@@ -77,6 +80,8 @@ async def upload_video(
             file_type="video",
             storage_type=storage_type
         )
+
+        file_service.register_upload(db, file_info, uploader_id=current_user.id)
         
         return UploadResponse(
             success=True,
@@ -104,6 +109,8 @@ async def upload_image(
             file_type="image",
             storage_type=storage_type
         )
+
+        file_service.register_upload(db, file_info, uploader_id=current_user.id)
         
         return UploadResponse(
             success=True,
@@ -131,6 +138,8 @@ async def upload_document(
             file_type="document",
             storage_type=storage_type
         )
+
+        file_service.register_upload(db, file_info, uploader_id=current_user.id)
         
         return UploadResponse(
             success=True,
@@ -145,19 +154,45 @@ async def upload_document(
 
 @files_router.get("/list", response_model=List[FileInfo])
 async def list_files(
+    page: PageParams = Depends(),
     file_type: str = "any",
-    limit: int = 100,
+    uploader_id: Optional[int] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取文件列表"""
+    """获取文件列表（按上传时间倒序，下一页游标通过 X-Next-Cursor 响应头返回）"""
     
     try:
-        files = file_service.list_files(file_type=file_type, limit=limit)
+        files, next_cursor = file_service.list_files(
+            db,
+            file_type=file_type,
+            uploader_id=uploader_id,
+            limit=page.limit,
+            cursor=page.cursor
+        )
+        page.set_next_cursor(next_cursor)
         return [FileInfo(**file_info) for file_info in files]
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取文件列表失败: {str(e)}")
 
+@files_router.post("/catalog/reconcile")
+async def reconcile_file_catalog(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """将文件目录与上传目录对账（管理员）"""
+    
+    if current_user.role != "管理员":
+        raise HTTPException(status_code=403, detail="权限不足")
+    
+    try:
+        stats = file_service.reconcile_catalog(db)
+        return {"success": True, "message": "文件目录对账完成", **stats}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"文件目录对账失败: {str(e)}")
+
 @files_router.get("/download/{file_type}/{filename}")
 async def download_file(
     file_type: str,
@@ -197,9 +232,12 @@ async def delete_file(
     try:
         success = file_service.delete_local_file(str(file_path))
         if success:
+            file_service.unregister_file(db, filename)
             return {"success": True, "message": "文件删除成功"}
         else:
             raise HTTPException(status_code=404, detail="文件不存在或删除失败")
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"删除失败: {str(e)}")
 
@@ -239,6 +277,8 @@ async def upload_to_qiniu(
             file=file,
             file_type=file_type
         )
+
+        file_service.register_upload(db, file_info, uploader_id=current_user.id)
         
         return UploadResponse(
             success=True,
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import Query as QueryParam
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, Query, aliased
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 
-from database import get_db, Note, User
+from database import get_db, Note, NoteTag, User, parse_tags
 from api.auth import get_current_user
+from services.note_search import note_search_service
+from services.pagination import PageParams
 
 # 创建路由器
 notes_router = APIRouter()
@@ -36,17 +40,40 @@ class NoteResponse(BaseModel):
     class Config:
         from_attributes = True
 
-@notes_router.get("/", response_model=List[NoteResponse])
-async def get_notes(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    is_public: Optional[bool] = None,
-    author_id: Optional[int] = None
-):
-    """获取笔记列表"""
-    query = db.query(Note)
-    
-    # 根据用户角色过滤
+class NoteSearchResult(NoteResponse):
+    score: float
+    title_highlight: str
+    snippet: str
+
+class TagCount(BaseModel):
+    tag: str
+    count: int
+
+# 搜索分页上限
+SEARCH_MAX_LIMIT = 100
+# 标签统计返回条数上限
+TAG_FACET_MAX_LIMIT = 200
+
+def set_note_tags(note: Note, tags: Optional[str]):
+    """规范化标签字符串并同步 note_tags 关联行（只增删有变化的标签）"""
+    tag_list = parse_tags(tags)
+    note.tags = ",".join(tag_list) or None
+    wanted = set(tag_list)
+    for row in list(note.tag_rows):
+        if row.tag not in wanted:
+            note.tag_rows.remove(row)
+    existing = {row.tag for row in note.tag_rows}
+    for tag in tag_list:
+        if tag not in existing:
+            note.tag_rows.append(NoteTag(tag=tag))
+
+def notes_with_tag(tag: str):
+    """带有某个标签的笔记ID子查询（走 ix_note_tags_tag_note 索引）"""
+    tag_alias = aliased(NoteTag)
+    return select(tag_alias.note_id).where(tag_alias.tag == tag)
+
+def filter_visible_notes(query: Query, current_user: User, db: Session) -> Query:
+    """根据用户角色过滤可见笔记"""
     if current_user.role == "学生":
         # 学生只能看到自己的笔记和公开笔记
         query = query.filter(
@@ -68,13 +95,29 @@ async def get_notes(
             query = query.filter(
                 (Note.author_id == current_user.id) | (Note.is_public == True)
             )
+    return query
+
+@notes_router.get("/", response_model=List[NoteResponse])
+async def get_notes(
+    page: PageParams = Depends(),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    is_public: Optional[bool] = None,
+    author_id: Optional[int] = None,
+    tag: Optional[List[str]] = QueryParam(None)
+):
+    """获取笔记列表（游标分页；可用多个 tag 参数筛选，需同时带有全部标签）"""
+    # 根据用户角色过滤
+    query = filter_visible_notes(db.query(Note), current_user, db)
     
     if is_public is not None:
         query = query.filter(Note.is_public == is_public)
     if author_id:
         query = query.filter(Note.author_id == author_id)
+    for tag_name in tag or []:
+        query = query.filter(Note.id.in_(notes_with_tag(tag_name)))
     
-    notes = query.order_by(Note.updated_at.desc()).all()
+    notes = page.apply(query, Note.id, Note.updated_at)
     return [NoteResponse.from_orm(note) for note in notes]
 
 @notes_router.get("/{note_id}", response_model=NoteResponse)
@@ -112,11 +155,13 @@ async def create_note(
         title=note_data.title,
         content=note_data.content,
         author_id=current_user.id,
-        is_public=note_data.is_public,
-        tags=note_data.tags
+        is_public=note_data.is_public
     )
+    set_note_tags(new_note, note_data.tags)
     
     db.add(new_note)
+    db.flush()
+    note_search_service.index_note(db, new_note)
     db.commit()
     db.refresh(new_note)
     
@@ -146,8 +191,9 @@ async def update_note(
     if note_data.is_public is not None:
         note.is_public = note_data.is_public
     if note_data.tags is not None:
-        note.tags = note_data.tags
+        set_note_tags(note, note_data.tags)
     
+    note_search_service.index_note(db, note)
     db.commit()
     db.refresh(note)
     
@@ -168,48 +214,60 @@ async def delete_note(
     if note.author_id != current_user.id:
         raise HTTPException(status_code=403, detail="权限不足")
     
+    note_search_service.remove_note(db, note.id)
     db.delete(note)
     db.commit()
     
     return {"message": "笔记删除成功"}
 
-@notes_router.get("/search/")
+@notes_router.get("/search/", response_model=List[NoteSearchResult])
 async def search_notes(
     q: str,
+    response: Response,
+    limit: int = 20,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """搜索笔记"""
-    query = db.query(Note)
+    """搜索笔记（全文索引，按相关度排序；下一页游标通过 X-Next-Cursor 响应头返回）"""
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
     
-    # 根据用户角色过滤
-    if current_user.role == "学生":
-        query = query.filter(
-            (Note.author_id == current_user.id) | (Note.is_public == True)
+    # 可见性过滤与全文检索在同一条查询中完成
+    query = filter_visible_notes(db.query(Note), current_user, db)
+    results, next_cursor = note_search_service.search(query, q, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    return [
+        NoteSearchResult(
+            **NoteResponse.from_orm(note).dict(),
+            score=score,
+            title_highlight=note_search_service.highlight(note.title, q, radius=len(note.title or "")),
+            snippet=note_search_service.highlight(note.content, q)
         )
-    elif current_user.role == "教师":
-        if current_user.class_id:
-            from database import User as UserModel
-            class_students = db.query(UserModel.id).filter(
-                UserModel.class_id == current_user.class_id
-            ).subquery()
-            query = query.filter(
-                (Note.author_id == current_user.id) | 
-                (Note.is_public == True) |
-                (Note.author_id.in_(class_students))
-            )
-        else:
-            query = query.filter(
-                (Note.author_id == current_user.id) | (Note.is_public == True)
-            )
+        for note, score in results
+    ]
+
+@notes_router.get("/tags/", response_model=List[TagCount])
+async def get_note_tags(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    tag: Optional[List[str]] = QueryParam(None),
+    limit: int = 50
+):
+    """
+    标签统计（分面）：返回可见笔记中各标签的笔记数，按数量降序；
+    传入 tag 时只统计同时带有这些标签的笔记，用于逐级筛选
+    """
+    limit = max(1, min(limit, TAG_FACET_MAX_LIMIT))
+    query = db.query(NoteTag.tag, func.count(NoteTag.note_id).label("count"))
     
-    # 搜索标题和内容
-    search_filter = (
-        Note.title.contains(q) | 
-        Note.content.contains(q) | 
-        Note.tags.contains(q)
-    )
-    query = query.filter(search_filter)
+    # 管理员可见全部笔记，直接在关联表索引上计数
+    if current_user.role != "管理员":
+        visible_ids = filter_visible_notes(db.query(Note.id), current_user, db)
+        query = query.filter(NoteTag.note_id.in_(visible_ids))
+    for tag_name in tag or []:
+        query = query.filter(NoteTag.note_id.in_(notes_with_tag(tag_name)))
     
-    notes = query.order_by(Note.updated_at.desc()).all()
-    return [NoteResponse.from_orm(note) for note in notes] 
\ No newline at end of file
+    rows = query.group_by(NoteTag.tag).order_by(func.count(NoteTag.note_id).desc(), NoteTag.tag).limit(limit).all()
+    return [TagCount(tag=tag_name, count=count) for tag_name, count in rows]
@@ -14,6 +14,10 @@ from database import (
 )
 from api.auth import get_current_user
 from services.ai_service import ai_service
+from services.chat_context import ChatContextConfig, chat_context_assembler
+from services.semantic_cache import semantic_cache
+from services.pagination import PageParams
+from services.fast_json import list_response
 
 # 创建路由器
 student_router = APIRouter()
@@ -26,6 +30,7 @@ class ChatMessage(BaseModel):
 class ChatResponse(BaseModel):
     answer: str
     timestamp: datetime
+    cached: bool = False  # 是否来自语义缓存（同班同学问过意思相同的问题）
 
 class ChatHistoryResponse(BaseModel):
     id: int
@@ -112,32 +117,48 @@ async def chat_with_ai(
         if len(message.question) > 1000:
             raise HTTPException(status_code=400, detail="问题内容过长，请控制在1000字符以内")
         
-        # 获取最近的对话历史作为上下文
-        recent_chats = db.query(ChatHistory).filter(
-            ChatHistory.student_id == current_user.id
-        ).order_by(ChatHistory.timestamp.desc()).limit(10).all()
-        
-        # 构建对话上下文
-        chat_history = []
-        for chat in reversed(recent_chats):
-            chat_history.append((chat.question, chat.answer))
+        # 先查语义缓存：同班级、同AI模式下意思相同的独立问题直接复用已有回答
+        cached_entry, question_vector = await semantic_cache.lookup(
+            current_user.class_id, message.ai_mode, message.question
+        )
         
-        try:
-            # 调用AI服务生成回答
-            ai_answer = await ai_service.chat_with_student(
-                question=message.question,
-                ai_mode=message.ai_mode,
-                chat_history=chat_history
-            )
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"AI服务调用失败: {str(e)}。请检查API密钥配置。"
+        if cached_entry:
+            ai_answer = cached_entry["answer"]
+        else:
+            # 获取最近的对话历史作为上下文
+            recent_chats = db.query(ChatHistory).filter(
+                ChatHistory.student_id == current_user.id
+            ).order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc()).limit(
+                ChatContextConfig.HISTORY_FETCH_LIMIT
+            ).all()
+            
+            # 构建对话上下文：预算内的最近轮次 + 更早对话的摘要（按学生缓存）
+            history_summary, chat_history = await chat_context_assembler.assemble(
+                current_user.id, list(reversed(recent_chats))
             )
-        
-        # 验证AI回答质量
-        if not ai_answer or len(ai_answer.strip()) < 10:
-            ai_answer = f"很抱歉，我需要更多信息来回答您关于 '{message.question}' 的问题。请您提供更多具体的背景信息，这样我就能给出更准确和有用的回答。"
+            
+            try:
+                # 调用AI服务生成回答
+                ai_response = await ai_service.chat_with_student_response(
+                    question=message.question,
+                    ai_mode=message.ai_mode,
+                    chat_history=chat_history,
+                    history_summary=history_summary
+                )
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"AI服务调用失败: {str(e)}。请检查API密钥配置。"
+                )
+            ai_answer = ai_response.content
+            
+            # 验证AI回答质量，只有真实的有效回答才写入语义缓存
+            if not ai_answer or len(ai_answer.strip()) < 10:
+                ai_answer = f"很抱歉，我需要更多信息来回答您关于 '{message.question}' 的问题。请您提供更多具体的背景信息，这样我就能给出更准确和有用的回答。"
+            elif not ai_service.is_mock_response(ai_response):
+                await semantic_cache.store(
+                    current_user.class_id, message.ai_mode, message.question, ai_answer, question_vector
+                )
         
         # 保存对话历史
         chat_record = ChatHistory(
@@ -149,7 +170,7 @@ async def chat_with_ai(
         db.add(chat_record)
         db.commit()
         
-        return ChatResponse(answer=ai_answer, timestamp=datetime.now())
+        return ChatResponse(answer=ai_answer, timestamp=datetime.now(), cached=bool(cached_entry))
         
     except HTTPException:
         raise
@@ -172,7 +193,7 @@ async def get_chat_history(
         ChatHistory.student_id == current_user.id
     ).order_by(ChatHistory.timestamp.desc()).limit(limit).all()
     
-    return [ChatHistoryResponse.from_orm(chat) for chat in chats]
+    return list_response(ChatHistoryResponse, chats)
 
 @student_router.delete("/chat/history")
 async def clear_chat_history(
@@ -188,6 +209,7 @@ async def clear_chat_history(
     ).delete()
     
     db.commit()
+    chat_context_assembler.invalidate(current_user.id)
     
     return {"message": "聊天历史已清空"}
 
@@ -479,16 +501,18 @@ async def create_dispute(
 
 @student_router.get("/disputes", response_model=List[DisputeResponse])
 async def get_my_disputes(
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取我的疑问列表"""
+    """获取我的疑问列表（游标分页）"""
     if current_user.role != "学生":
         raise HTTPException(status_code=403, detail="权限不足")
     
-    disputes = db.query(StudentDispute).filter(
-        StudentDispute.student_id == current_user.id
-    ).order_by(StudentDispute.created_at.desc()).all()
+    disputes = page.apply(
+        db.query(StudentDispute).filter(StudentDispute.student_id == current_user.id),
+        StudentDispute.id, StudentDispute.created_at
+    )
     
     return [DisputeResponse.from_orm(dispute) for dispute in disputes]
 
@@ -548,21 +572,28 @@ async def get_knowledge_mastery(
 # 视频学习相关接口
 @student_router.get("/videos", response_model=List[VideoResourceResponse])
 async def get_available_videos(
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取可用的视频资源"""
+    """获取可用的视频资源（游标分页）"""
     if current_user.role != "学生":
         raise HTTPException(status_code=403, detail="权限不足")
     
     # 获取已发布的视频资源
-    videos = db.query(VideoResource).filter(
-        VideoResource.status == "已发布"
-    ).order_by(VideoResource.created_at.desc()).all()
+    videos = page.apply(
+        db.query(VideoResource).filter(VideoResource.status == "已发布"),
+        VideoResource.id, VideoResource.created_at
+    )
+    
+    # 本页涉及的教师姓名一次查出
+    teacher_ids = {video.teacher_id for video in videos}
+    teacher_names = dict(
+        db.query(User.id, User.display_name).filter(User.id.in_(teacher_ids)).all()
+    ) if teacher_ids else {}
     
     result = []
     for video in videos:
-        teacher = db.query(User).filter(User.id == video.teacher_id).first()
         result.append(VideoResourceResponse(
             id=video.id,
             title=video.title,
@@ -570,7 +601,7 @@ async def get_available_videos(
             path=video.path,
             status=video.status,
             created_at=video.created_at,
-            teacher_name=teacher.display_name if teacher else "未知教师"
+            teacher_name=teacher_names.get(video.teacher_id, "未知教师")
         ))
     
     return result
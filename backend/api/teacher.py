@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from fastapi.responses import StreamingResponse
+from sqlalchemy import JSON, type_coerce
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
@@ -14,14 +15,27 @@ from docx.oxml.ns import qn
 
 from database import (
     get_db, User, TeachingPlan, MindMap, VideoResource,
-    StudentDispute, KnowledgePoint
+    StudentDispute, KnowledgePoint, parse_json_document
 )
 from api.auth import get_current_user
 from services.ai_service import ai_service
+from services.pagination import PageParams
+from services.fast_json import list_response
+from services.http_cache import CacheValidators
 
 # 创建路由器
 teacher_router = APIRouter()
 
+# 教案各部分的键名：兼容老键名（英文）与新键名（中文）
+PLAN_SECTION_ALIASES = {
+    "教学内容": ["教学内容", "teaching_content"],
+    "教学目标": ["教学目标", "teaching_objectives"],
+    "教学重点": ["教学重点", "key_points"],
+    "教学难点": ["教学难点", "teaching_difficulties"],
+    "教学设计": ["教学设计", "teaching_design"],
+    "教学反思与总结": ["教学反思与总结", "teaching_reflection", "reflection"],
+}
+
 # Pydantic模型
 class TeachingPlanCreate(BaseModel):
     course_name: str
@@ -126,11 +140,16 @@ async def create_teaching_plan(
             detail=f"AI服务调用失败: {str(e)}。请检查API密钥配置。"
         )
     
+    # 写入时解析一次（去掉代码块围栏等），以 JSON 对象保存，读取时不再重复解析
+    plan_content = parse_json_document(ai_response, fallback_key="教学内容")
+    if not isinstance(plan_content, dict):
+        plan_content = {"教学内容": plan_content}
+
     # 保存到数据库
     new_plan = TeachingPlan(
         teacher_id=current_user.id,
         input_prompt=topic_text,
-        output_content=json.dumps(ai_response, ensure_ascii=False)
+        output_content=plan_content
     )
     
     db.add(new_plan)
@@ -141,26 +160,31 @@ async def create_teaching_plan(
 
 @teacher_router.get("/teaching-plans", response_model=List[TeachingPlanResponse])
 async def get_teaching_plans(
+    page: PageParams = Depends(),
+    cache: CacheValidators = Depends(),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取教师的教学计划列表"""
+    """获取教师的教学计划列表（游标分页，支持 ETag 条件请求）"""
     if current_user.role != "教师":
         raise HTTPException(status_code=403, detail="权限不足")
     
-    plans = db.query(TeachingPlan).filter(
-        TeachingPlan.teacher_id == current_user.id
-    ).order_by(TeachingPlan.created_at.desc()).all()
+    query = db.query(TeachingPlan).filter(TeachingPlan.teacher_id == current_user.id)
+    # 教案创建后不再修改，用创建时间作为行版本；未变化时直接返回304
+    cache.check_collection(query, TeachingPlan.id, TeachingPlan.created_at, current_user.id)
+    plans = page.apply(query, TeachingPlan.id, TeachingPlan.created_at)
     
-    return [TeachingPlanResponse.from_orm(plan) for plan in plans]
+    # 教案正文较长，整页批量序列化
+    return list_response(TeachingPlanResponse, plans, response=page.response)
 
 @teacher_router.get("/teaching-plans/{plan_id}", response_model=TeachingPlanResponse)
 async def get_teaching_plan(
     plan_id: int,
+    cache: CacheValidators = Depends(),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取特定教学计划"""
+    """获取特定教学计划（支持 ETag 条件请求）"""
     if current_user.role != "教师":
         raise HTTPException(status_code=403, detail="权限不足")
     
@@ -172,8 +196,37 @@ async def get_teaching_plan(
     if not plan:
         raise HTTPException(status_code=404, detail="教学计划不存在")
     
+    cache.check(current_user.id, plan.id, plan.created_at, last_modified=plan.created_at)
     return TeachingPlanResponse.from_orm(plan)
 
+@teacher_router.get("/teaching-plans/{plan_id}/sections/{section}")
+async def get_teaching_plan_section(
+    plan_id: int,
+    section: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """获取教学计划的某一部分（如 教学目标），只从数据库取出该键的值"""
+    if current_user.role != "教师":
+        raise HTTPException(status_code=403, detail="权限不足")
+    
+    document = type_coerce(TeachingPlan.output_content, JSON)
+    aliases = PLAN_SECTION_ALIASES.get(section, [section])
+    row = db.query(
+        TeachingPlan.id, *[document[key].label(f"section_{i}") for i, key in enumerate(aliases)]
+    ).filter(
+        TeachingPlan.id == plan_id,
+        TeachingPlan.teacher_id == current_user.id
+    ).first()
+    
+    if not row:
+        raise HTTPException(status_code=404, detail="教学计划不存在")
+    
+    value = next((v for v in row[1:] if v not in (None, "")), None)
+    if value is None:
+        raise HTTPException(status_code=404, detail="教学计划中没有该部分")
+    return {"section": section, "content": value}
+
 # 知识图谱相关接口
 @teacher_router.post("/mindmaps", response_model=MindMapResponse)
 async def create_mindmap(
@@ -187,7 +240,7 @@ async def create_mindmap(
     
     try:
         # 调用AI服务生成思维导图
-        mindmap_json = await ai_service.generate_mindmap(
+        mindmap_json = await ai_service.generate_mind_map(
             topic=mindmap_data.topic,
             description=mindmap_data.description
         )
@@ -201,7 +254,7 @@ async def create_mindmap(
         user_id=current_user.id,
         title=mindmap_data.title,
         topic=mindmap_data.topic,
-        data=json.dumps(mindmap_json, ensure_ascii=False),
+        data=mindmap_json,
         description=mindmap_data.description,
         is_public=mindmap_data.is_public
     )
@@ -214,18 +267,54 @@ async def create_mindmap(
 
 @teacher_router.get("/mindmaps", response_model=List[MindMapResponse])
 async def get_mindmaps(
+    page: PageParams = Depends(),
+    cache: CacheValidators = Depends(),
+    data_format: str = "string",
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    获取教师的思维导图列表（游标分页，支持 ETag 条件请求）
+    data_format=object 时 data 直接以 JSON 对象返回（数据库中的 JSON 文本原样嵌入），默认仍为 JSON 字符串
+    """
+    if current_user.role != "教师":
+        raise HTTPException(status_code=403, detail="权限不足")
+    
+    query = db.query(MindMap).filter(MindMap.user_id == current_user.id)
+    cache.check_collection(query, MindMap.id, MindMap.created_at, current_user.id)
+    mindmaps = page.apply(query, MindMap.id, MindMap.created_at)
+    
+    raw_json_fields = ["data"] if data_format == "object" else []
+    return list_response(MindMapResponse, mindmaps, raw_json_fields, response=page.response)
+
+@teacher_router.get("/mindmaps/{mindmap_id}/node")
+async def get_mindmap_node(
+    mindmap_id: int,
+    path: str = "",
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取教师的思维导图列表"""
+    """
+    获取思维导图中的某个节点，path 用点号分隔，数字表示数组下标，
+    如 subtopics.0.concepts；为空时返回整棵树。只从数据库取出该节点
+    """
     if current_user.role != "教师":
         raise HTTPException(status_code=403, detail="权限不足")
     
-    mindmaps = db.query(MindMap).filter(
+    segments = [int(part) if part.isdigit() else part for part in path.split(".") if part]
+    node = type_coerce(MindMap.data, JSON)
+    if segments:
+        node = node[tuple(segments)] if len(segments) > 1 else node[segments[0]]
+    row = db.query(MindMap.id, type_coerce(node, JSON).label("node")).filter(
+        MindMap.id == mindmap_id,
         MindMap.user_id == current_user.id
-    ).order_by(MindMap.created_at.desc()).all()
+    ).first()
     
-    return [MindMapResponse.from_orm(mindmap) for mindmap in mindmaps]
+    if not row:
+        raise HTTPException(status_code=404, detail="思维导图不存在")
+    if row.node is None:
+        raise HTTPException(status_code=404, detail="节点不存在")
+    return {"path": path, "node": row.node}
 
 # 智能出题接口
 @teacher_router.post("/generate-exam")
@@ -278,50 +367,12 @@ async def export_teaching_plan_to_word(
     if not plan:
         raise HTTPException(status_code=404, detail="教学计划不存在")
 
-    # 解析教学计划JSON内容（健壮解析：处理双重JSON、代码块围栏等情况）
-    def robust_parse(content_text: str) -> Dict[str, Any]:
-        if not content_text:
-            return {}
-        try:
-            data = json.loads(content_text)
-            # 如果第一层解析得到的是字符串，再次尝试解析
-            if isinstance(data, str):
-                text = data.strip()
-                # 去除可能的```json或```围栏
-                if text.startswith("```json") and text.endswith("```"):
-                    text = text[7:-3].strip()
-                elif text.startswith("```") and text.endswith("```"):
-                    text = text[3:-3].strip()
-                try:
-                    return json.loads(text)
-                except Exception:
-                    return {"教学内容": text}
-            if isinstance(data, dict):
-                return data
-            return {}
-        except Exception:
-            # 去除可能的```json或```围栏后重试
-            text = content_text.strip()
-            if text.startswith("```json") and text.endswith("```"):
-                text = text[7:-3].strip()
-            elif text.startswith("```") and text.endswith("```"):
-                text = text[3:-3].strip()
-            try:
-                return json.loads(text)
-            except Exception:
-                return {"教学内容": text}
-
-    plan_details = robust_parse(plan.output_content)
-
-    # 兼容老键名（英文）与新键名（中文）
-    key_aliases = {
-        "教学内容": ["教学内容", "teaching_content"],
-        "教学目标": ["教学目标", "teaching_objectives"],
-        "教学重点": ["教学重点", "key_points"],
-        "教学难点": ["教学难点", "teaching_difficulties"],
-        "教学设计": ["教学设计", "teaching_design"],
-        "教学反思与总结": ["教学反思与总结", "teaching_reflection", "reflection"],
-    }
+    # 教学计划在写入时已规范化为 JSON 对象
+    plan_details = json.loads(plan.output_content) if plan.output_content else {}
+    if not isinstance(plan_details, dict):
+        plan_details = {}
+
+    key_aliases = PLAN_SECTION_ALIASES
 
     def get_value(aliases: List[str]) -> str:
         for k in aliases:
@@ -480,25 +531,32 @@ async def ai_diagnostics(
 # 学生疑问处理接口
 @teacher_router.get("/disputes", response_model=List[StudentDisputeResponse])
 async def get_student_disputes(
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取学生疑问列表"""
+    """获取学生疑问列表（游标分页）"""
     if current_user.role != "教师":
         raise HTTPException(status_code=403, detail="权限不足")
     
     # 获取教师所在班级的学生疑问
-    disputes = db.query(StudentDispute).join(User).filter(
-        StudentDispute.class_id == current_user.class_id
-    ).order_by(StudentDispute.created_at.desc()).all()
+    disputes = page.apply(
+        db.query(StudentDispute).filter(StudentDispute.class_id == current_user.class_id),
+        StudentDispute.id, StudentDispute.created_at
+    )
+    
+    # 本页涉及的学生姓名一次查出
+    student_ids = {dispute.student_id for dispute in disputes}
+    student_names = dict(
+        db.query(User.id, User.display_name).filter(User.id.in_(student_ids)).all()
+    ) if student_ids else {}
     
     result = []
     for dispute in disputes:
-        student = db.query(User).filter(User.id == dispute.student_id).first()
         result.append(StudentDisputeResponse(
             id=dispute.id,
             student_id=dispute.student_id,
-            student_name=student.display_name if student else "未知学生",
+            student_name=student_names.get(dispute.student_id, "未知学生"),
             class_id=dispute.class_id,
             question_id=dispute.question_id,
             message=dispute.message,
@@ -564,16 +622,18 @@ async def create_video_resource(
 
 @teacher_router.get("/videos", response_model=List[VideoResourceResponse])
 async def get_video_resources(
+    page: PageParams = Depends(),
+    cache: CacheValidators = Depends(),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取教师的视频资源列表"""
+    """获取教师的视频资源列表（游标分页，支持 ETag 条件请求）"""
     if current_user.role != "教师":
         raise HTTPException(status_code=403, detail="权限不足")
     
-    videos = db.query(VideoResource).filter(
-        VideoResource.teacher_id == current_user.id
-    ).order_by(VideoResource.created_at.desc()).all()
+    query = db.query(VideoResource).filter(VideoResource.teacher_id == current_user.id)
+    cache.check_collection(query, VideoResource.id, VideoResource.created_at, current_user.id)
+    videos = page.apply(query, VideoResource.id, VideoResource.created_at)
     
     return [VideoResourceResponse.from_orm(video) for video in videos]
 
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
+import time
 
 from database import get_db, User, Class
-from api.auth import get_current_user, get_password_hash
+from api.auth import get_current_user, get_password_hash_async, PasswordPoolBusy, user_cache
+from services.pagination import PageParams
+from services.roster_service import RosterFileError, parse_roster, validate_roster, start_import_job, get_import_job
 
 # 创建路由器
 users_router = APIRouter()
@@ -32,14 +36,37 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class RosterRowError(BaseModel):
+    row: int
+    account_id: Optional[str] = None
+    message: str
+
+class RosterImportResponse(BaseModel):
+    success: bool
+    total_rows: int
+    dry_run: bool = False
+    elapsed_seconds: float = 0.0
+    errors: List[RosterRowError] = []
+    job_id: Optional[str] = None  # 校验通过后的后台导入任务，用 GET /import/{job_id} 查询进度
+
+class RosterImportJobResponse(BaseModel):
+    job_id: str
+    status: str  # queued / running / completed / failed
+    total_rows: int
+    created_users: int = 0
+    created_classes: int = 0
+    error: Optional[str] = None
+    elapsed_seconds: float = 0.0
+
 @users_router.get("/", response_model=List[UserResponse])
 async def get_users(
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
     role: Optional[str] = None,
     class_id: Optional[int] = None
 ):
-    """获取用户列表"""
+    """获取用户列表（按ID游标分页）"""
     query = db.query(User)
     
     if role:
@@ -47,7 +74,7 @@ async def get_users(
     if class_id:
         query = query.filter(User.class_id == class_id)
     
-    users = query.all()
+    users = page.apply(query, User.id)
     return [UserResponse.from_orm(user) for user in users]
 
 @users_router.get("/{user_id}", response_model=UserResponse)
@@ -79,12 +106,18 @@ async def create_user(
     if existing_user:
         raise HTTPException(status_code=400, detail="账号已存在")
     
+    # 密码哈希在线程池中计算，不阻塞事件循环
+    try:
+        hashed_password = await get_password_hash_async(user_data.password)
+    except PasswordPoolBusy:
+        raise HTTPException(status_code=503, detail="服务繁忙，请稍后重试", headers={"Retry-After": "1"})
+
     # 创建用户
     new_user = User(
         account_id=user_data.account_id,
         display_name=user_data.display_name,
         role=user_data.role,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=hashed_password,
         class_id=user_data.class_id
     )
     
@@ -94,6 +127,65 @@ async def create_user(
     
     return UserResponse.from_orm(new_user)
 
+@users_router.post("/import", response_model=RosterImportResponse)
+async def import_users(
+    file: UploadFile = File(...),
+    default_password: Optional[str] = Form(None),
+    default_role: str = Form("学生"),
+    create_classes: bool = Form(True),
+    dry_run: bool = Form(False),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    批量导入用户（CSV/XLSX）
+    表头：账号/account_id、姓名/display_name，可选 角色/role、密码/password、班级/class_name；
+    整份文件校验通过才会导入，否则返回逐行错误且不写入任何数据；
+    校验在请求内完成，入库（逐个账号哈希密码，耗时以分钟计）转为后台任务，返回 job_id 供查询进度
+    """
+    # 检查权限
+    if current_user.role != "管理员":
+        raise HTTPException(status_code=403, detail="权限不足")
+
+    started = time.perf_counter()
+    content = await file.read()
+    loop = asyncio.get_event_loop()
+    try:
+        records = await loop.run_in_executor(None, parse_roster, file.filename, content)
+    except RosterFileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 校验要查询数据库，同样放到线程池，不阻塞事件循环
+    errors, class_ids = await loop.run_in_executor(
+        None, validate_roster, db, records, default_password, default_role, create_classes
+    )
+    job_id = None
+    if not errors and not dry_run and records:
+        job_id = start_import_job(records, class_ids)
+
+    return RosterImportResponse(
+        success=not errors,
+        total_rows=len(records),
+        dry_run=dry_run,
+        elapsed_seconds=round(time.perf_counter() - started, 3),
+        errors=errors,
+        job_id=job_id
+    )
+
+@users_router.get("/import/{job_id}", response_model=RosterImportJobResponse)
+async def get_import_status(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """查询名单导入任务的状态与结果"""
+    if current_user.role != "管理员":
+        raise HTTPException(status_code=403, detail="权限不足")
+
+    job = get_import_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="导入任务不存在或已过期")
+    return RosterImportJobResponse(**job)
+
 @users_router.put("/{user_id}", response_model=UserResponse)
 async def update_user(
     user_id: int,
@@ -114,12 +206,16 @@ async def update_user(
     if user_data.display_name is not None:
         user.display_name = user_data.display_name
     if user_data.role is not None and current_user.role == "管理员":
+        if user_data.role != user.role:
+            # 角色变更后，此前签发的令牌全部失效
+            user.token_version = (user.token_version or 0) + 1
         user.role = user_data.role
     if user_data.class_id is not None:
         user.class_id = user_data.class_id
     
     db.commit()
     db.refresh(user)
+    user_cache.invalidate(user_id)
     
     return UserResponse.from_orm(user)
 
@@ -140,5 +236,6 @@ async def delete_user(
     
     db.delete(user)
     db.commit()
+    user_cache.invalidate(user_id)
     
     return {"message": "用户删除成功"} 
\ No newline at end of file
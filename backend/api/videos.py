@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from sqlalchemy import JSON, type_coerce
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional, List
 import asyncio
 from datetime import datetime
 
-from database import get_db, User, VideoAnalysis
+from database import get_db, User, VideoAnalysis, split_markdown_sections
 from api.auth import get_current_user
+from services.pagination import PageParams
 from utilstongyi import analyze_video_with_tongyi, get_video_info
 
 # 创建路由器
@@ -107,6 +109,8 @@ async def perform_video_analysis(
         
         if analysis_record:
             analysis_record.analysis_result = result
+            # 按标题拆分保存一份结构化数据，供按部分查询
+            analysis_record.analysis_sections = split_markdown_sections(result)
             analysis_record.status = "completed"
             db.commit()
             
@@ -132,15 +136,15 @@ async def get_video_information(video_url: str):
 
 @videos_router.get("/history", response_model=List[VideoAnalysisResponse])
 async def get_analysis_history(
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    limit: int = 10,
-    offset: int = 0
+    db: Session = Depends(get_db)
 ):
-    """获取分析历史"""
-    analyses = db.query(VideoAnalysis).filter(
-        VideoAnalysis.analyzed_by == current_user.id
-    ).order_by(VideoAnalysis.analyzed_at.desc()).offset(offset).limit(limit).all()
+    """获取分析历史（游标分页）"""
+    analyses = page.apply(
+        db.query(VideoAnalysis).filter(VideoAnalysis.analyzed_by == current_user.id),
+        VideoAnalysis.id, VideoAnalysis.analyzed_at
+    )
     
     return [
         VideoAnalysisResponse(
@@ -176,6 +180,26 @@ async def get_analysis_result(
         status=analysis.status
     )
 
+@videos_router.get("/{analysis_id}/sections/{name}")
+async def get_analysis_section(
+    analysis_id: int,
+    name: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """获取分析报告的某一部分（如 关键知识点），只从数据库取出该部分"""
+    sections = type_coerce(VideoAnalysis.analysis_sections, JSON)
+    row = db.query(VideoAnalysis.id, sections[name].label("content")).filter(
+        VideoAnalysis.id == analysis_id,
+        VideoAnalysis.analyzed_by == current_user.id
+    ).first()
+    
+    if not row:
+        raise HTTPException(status_code=404, detail="分析记录不存在")
+    if row.content is None:
+        raise HTTPException(status_code=404, detail="分析报告中没有该部分")
+    return {"section": name, "content": row.content}
+
 @videos_router.delete("/{analysis_id}")
 async def delete_analysis(
     analysis_id: int,
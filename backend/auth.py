@@ -1,8 +1,11 @@
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,6 +13,48 @@ load_dotenv()
 # 密码加密上下文
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# 密码哈希线程池配置：bcrypt 计算时会释放 GIL，线程池即可利用多核
+class PasswordHashConfig:
+    WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+    # 排队中的哈希任务上限，超出时直接拒绝（背压），避免请求无限堆积
+    MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "256"))
+    # 名单导入等批量哈希使用独立的小线程池，不与登录请求排同一个队列
+    BULK_WORKERS = int(os.getenv("PASSWORD_HASH_BULK_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+
+class PasswordPoolBusy(Exception):
+    """密码哈希任务排队已满"""
+
+_password_pool = ThreadPoolExecutor(max_workers=PasswordHashConfig.WORKERS, thread_name_prefix="password-hash")
+_bulk_password_pool = ThreadPoolExecutor(
+    max_workers=PasswordHashConfig.BULK_WORKERS, thread_name_prefix="password-hash-bulk"
+)
+_pending_count = 0
+_pending_lock = threading.Lock()
+
+def configure_password_pool(workers: int, bulk_workers: Optional[int] = None):
+    """重新设置密码哈希线程数（基准测试使用）"""
+    global _password_pool, _bulk_password_pool
+    old_pool = _password_pool
+    _password_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+    old_pool.shutdown(wait=False)
+    if bulk_workers is not None:
+        old_bulk_pool = _bulk_password_pool
+        _bulk_password_pool = ThreadPoolExecutor(max_workers=bulk_workers, thread_name_prefix="password-hash-bulk")
+        old_bulk_pool.shutdown(wait=False)
+
+async def _run_in_password_pool(func, *args):
+    """在密码哈希线程池中执行，排队已满时抛出 PasswordPoolBusy"""
+    global _pending_count
+    with _pending_lock:
+        if _pending_count >= PasswordHashConfig.MAX_PENDING:
+            raise PasswordPoolBusy()
+        _pending_count += 1
+    try:
+        return await asyncio.wrap_future(_password_pool.submit(func, *args))
+    finally:
+        with _pending_lock:
+            _pending_count -= 1
+
 # JWT配置
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
@@ -23,6 +68,21 @@ def get_password_hash(password: str) -> str:
     """获取密码哈希值"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """验证密码（在线程池中执行，不阻塞事件循环）"""
+    return await _run_in_password_pool(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """获取密码哈希值（在线程池中执行，不阻塞事件循环）"""
+    return await _run_in_password_pool(get_password_hash, password)
+
+def hash_passwords_bulk(passwords: List[str]) -> List[str]:
+    """
+    批量计算密码哈希（名单导入用），每个账号单独加盐，相同的初始密码也得到不同的哈希值
+    在独立的批量线程池中执行，登录请求仍走 _password_pool，不会排在导入任务之后
+    """
+    return list(_bulk_password_pool.map(get_password_hash, passwords))
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """创建访问令牌"""
     to_encode = data.copy()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+登录风暴基准测试：bcrypt 校验吞吐随线程数的变化
+
+默认在进程内测试：用不同的密码哈希线程数并发执行 verify_password_async，
+输出每秒可完成的登录校验数，用来确认吞吐随 CPU 核数线性增长。
+
+也可以用 --url 对正在运行的服务发起并发登录请求（需要一个已存在的账号）。
+
+用法：
+    python benchmark_login.py
+    python benchmark_login.py --logins 400 --workers 1 2 4 8
+    python benchmark_login.py --url http://localhost:8001 --account admin --password admin123 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from auth import (
+    PasswordHashConfig, PasswordPoolBusy, configure_password_pool,
+    get_password_hash, hash_passwords_bulk, verify_password_async
+)
+
+
+async def storm_in_process(workers: int, logins: int, hashed: str, password: str) -> float:
+    """并发发起 logins 次校验，返回每秒登录数"""
+    configure_password_pool(workers)
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(verify_password_async(password, hashed) for _ in range(logins)),
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - started
+    rejected = sum(1 for result in results if isinstance(result, PasswordPoolBusy))
+    if rejected:
+        print(f"   ⚠️ {rejected} 次校验因排队已满被拒绝（PASSWORD_HASH_MAX_PENDING={PasswordHashConfig.MAX_PENDING}）")
+    return (logins - rejected) / elapsed
+
+
+def run_in_process(args):
+    password = "benchmark-password"
+    hashed = get_password_hash(password)
+    worker_counts = args.workers or sorted({1, 2, 4, os.cpu_count() or 1})
+
+    print(f"🔐 进程内登录风暴：每轮 {args.logins} 次校验，CPU 核数 {os.cpu_count()}")
+    baseline = None
+    for workers in worker_counts:
+        rate = asyncio.run(storm_in_process(workers, args.logins, hashed, password))
+        baseline = baseline or rate
+        print(f"   线程数 {workers:>3}: {rate:>8.1f} 次登录/秒  (加速比 {rate / baseline:.2f}x)")
+
+    # 名单导入的批量哈希路径（独立线程池，每个账号单独加盐）
+    bulk_workers = PasswordHashConfig.BULK_WORKERS
+    configure_password_pool(worker_counts[-1], bulk_workers=bulk_workers)
+    passwords = ["init123"] * args.bulk
+    started = time.perf_counter()
+    hash_passwords_bulk(passwords)
+    elapsed = time.perf_counter() - started
+    print(f"📦 批量哈希 {args.bulk} 个账号: {args.bulk / elapsed:.1f} 个/秒（批量线程数 {bulk_workers}）")
+
+
+async def storm_http(args):
+    import httpx
+
+    url = args.url.rstrip("/") + "/api/auth/login"
+    payload = {"account_id": args.account, "password": args.password}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    status_counts = {}
+
+    async with httpx.AsyncClient(timeout=60) as client:
+        async def one_login():
+            async with semaphore:
+                response = await client.post(url, json=payload)
+                status_counts[response.status_code] = status_counts.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_login() for _ in range(args.logins)))
+        elapsed = time.perf_counter() - started
+
+    ok = status_counts.get(200, 0)
+    print(f"🌐 {url}：{args.logins} 次请求，并发 {args.concurrency}，耗时 {elapsed:.2f}s")
+    print(f"   成功 {ok / elapsed:.1f} 次登录/秒，状态码分布 {status_counts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="登录风暴基准测试")
+    parser.add_argument("--logins", type=int, default=200, help="每轮登录次数")
+    parser.add_argument("--workers", type=int, nargs="*", help="要测试的线程数列表（默认 1 2 4 CPU核数）")
+    parser.add_argument("--bulk", type=int, default=200, help="批量哈希测试的账号数")
+    parser.add_argument("--url", help="对运行中的服务发起登录请求，如 http://localhost:8001")
+    parser.add_argument("--account", default="admin", help="登录账号（--url 模式）")
+    parser.add_argument("--password", default="admin123", help="登录密码（--url 模式）")
+    parser.add_argument("--concurrency", type=int, default=64, help="并发请求数（--url 模式）")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(storm_http(args))
+    else:
+        run_in_process(args)
+
+
+if __name__ == "__main__":
+    main()
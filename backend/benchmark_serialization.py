@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+列表响应序列化基准测试：每 1000 行的序列化耗时
+
+对比：
+- 原路径：逐行 from_orm + jsonable_encoder + json.dumps（FastAPI 默认 JSONResponse）
+- 快速路径：TypeAdapter 批量校验 + pydantic-core 直接输出 JSON（services.fast_json.dump_list）
+- JSON 列：先 json.loads 再整体编码 vs 原样嵌入（orjson.Fragment）
+
+用法：
+    python benchmark_serialization.py
+    python benchmark_serialization.py --rows 1000 --content-chars 4000 --repeat 20
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, List
+
+from fastapi.encoders import jsonable_encoder
+
+from api.teacher import TeachingPlanResponse, MindMapResponse
+from services.fast_json import ORJSON_FRAGMENT_AVAILABLE, dump_list
+
+
+def make_plans(rows: int, content_chars: int) -> List[Any]:
+    """模拟教学计划 ORM 对象（output_content 为长文本）"""
+    paragraph = "本节课围绕机器学习中的过拟合问题展开，结合案例讲解正则化与交叉验证。"
+    content = (paragraph * (content_chars // len(paragraph) + 1))[:content_chars]
+    now = datetime.now()
+    return [
+        SimpleNamespace(
+            id=i, teacher_id=1, input_prompt=f"第{i}课 教学设计",
+            output_content=content, created_at=now - timedelta(minutes=i)
+        )
+        for i in range(rows)
+    ]
+
+
+def make_mindmaps(rows: int) -> List[Any]:
+    """模拟思维导图 ORM 对象（data 为 JSON 文本）"""
+    tree = {"name": "机器学习", "children": [
+        {"name": f"主题{i}", "children": [{"name": f"知识点{i}-{j}"} for j in range(8)]} for i in range(10)
+    ]}
+    data = json.dumps(tree, ensure_ascii=False)
+    now = datetime.now()
+    return [
+        SimpleNamespace(
+            id=i, user_id=1, title=f"导图{i}", topic="机器学习", data=data,
+            description=None, is_public=False, created_at=now
+        )
+        for i in range(rows)
+    ]
+
+
+def baseline(model, rows) -> bytes:
+    items = [model.from_orm(row) for row in rows]
+    return json.dumps(jsonable_encoder(items), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def baseline_parsed_json(model, rows, field) -> bytes:
+    """原路径下返回对象形式的 JSON 列：每行先解析再整体编码"""
+    payload = jsonable_encoder([model.from_orm(row) for row in rows])
+    for data, row in zip(payload, rows):
+        data[field] = json.loads(getattr(row, field))
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def measure(func, repeat: int, rows: int) -> float:
+    """返回每 1000 行的平均耗时（毫秒）"""
+    func()  # 预热（构建 TypeAdapter 等）
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - started) / repeat
+    return elapsed * 1000 * 1000 / rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列表响应序列化基准测试")
+    parser.add_argument("--rows", type=int, default=1000, help="每次序列化的行数")
+    parser.add_argument("--content-chars", type=int, default=4000, help="教学计划正文字数")
+    parser.add_argument("--repeat", type=int, default=20, help="重复次数")
+    args = parser.parse_args()
+
+    plans = make_plans(args.rows, args.content_chars)
+    mindmaps = make_mindmaps(args.rows)
+
+    results = [
+        ("教学计划 原路径", measure(lambda: baseline(TeachingPlanResponse, plans), args.repeat, args.rows)),
+        ("教学计划 快速路径", measure(lambda: dump_list(TeachingPlanResponse, plans), args.repeat, args.rows)),
+        ("思维导图 原路径", measure(lambda: baseline(MindMapResponse, mindmaps), args.repeat, args.rows)),
+        ("思维导图 快速路径", measure(lambda: dump_list(MindMapResponse, mindmaps), args.repeat, args.rows)),
+        ("导图对象 解析再编码", measure(
+            lambda: baseline_parsed_json(MindMapResponse, mindmaps, "data"), args.repeat, args.rows)),
+        ("导图对象 原样嵌入", measure(
+            lambda: dump_list(MindMapResponse, mindmaps, ["data"]), args.repeat, args.rows)),
+    ]
+
+    print(f"📊 每 1000 行序列化耗时（{args.rows} 行 × {args.repeat} 次，正文 {args.content_chars} 字）")
+    if not ORJSON_FRAGMENT_AVAILABLE:
+        print("   ⚠️ 未安装 orjson>=3.10，原样嵌入退回 json.loads")
+    for name, ms in results:
+        print(f"   {name:<12} {ms:>9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Float
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Float, Index, inspect, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.sql import func
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
+from typing import Any, Dict, List, Optional
+import json
 import os
+import re
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -23,6 +28,83 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # 创建基础模型类
 Base = declarative_base()
 
+class JSONText(TypeDecorator):
+    """
+    JSON 列：PostgreSQL 上为 JSONB，SQLite 上为 TEXT（可用 json_extract 查询）
+    写入时校验并规范化（dict/list 直接序列化，字符串必须是合法 JSON），
+    读取时返回 JSON 文本本身，接口可以原样返回或嵌入，不必每次解析
+    """
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(Text())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = json.loads(value)  # 非法 JSON 抛出 ValueError
+        if dialect.name == "postgresql":
+            return value
+        return json.dumps(value, ensure_ascii=False)
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        # PostgreSQL 驱动会解码 JSONB，这里还原为文本
+        return json.dumps(value, ensure_ascii=False)
+
+def parse_json_document(content: Any, fallback_key: Optional[str] = None) -> Any:
+    """
+    把 AI 返回的内容解析为 JSON 对象：兼容 ```json 围栏、被二次编码的 JSON 字符串；
+    无法解析时，指定了 fallback_key 则包装为 {fallback_key: 原文}，否则抛出 ValueError
+    """
+    value = content
+    for _ in range(3):
+        if not isinstance(value, str):
+            return value
+        text_value = value.strip()
+        if text_value.startswith("```json") and text_value.endswith("```"):
+            text_value = text_value[7:-3].strip()
+        elif text_value.startswith("```") and text_value.endswith("```"):
+            text_value = text_value[3:-3].strip()
+        try:
+            value = json.loads(text_value)
+        except ValueError:
+            if fallback_key is None:
+                raise
+            return {fallback_key: text_value}
+    if isinstance(value, str):
+        if fallback_key is None:
+            raise ValueError("JSON 嵌套编码层数过多")
+        return {fallback_key: value}
+    return value
+
+_SECTION_HEADING = re.compile(r"^#{1,6}\s*(.+?)\s*$")
+_HEADING_DECORATION = re.compile(r"^[^\w\u4e00-\u9fff]+")
+
+def split_markdown_sections(markdown: str) -> Dict[str, str]:
+    """按 Markdown 标题把报告拆成 {标题: 内容}（标题去掉前导 emoji 等符号）"""
+    sections: Dict[str, str] = {}
+    current = None
+    lines: List[str] = []
+    for line in (markdown or "").splitlines():
+        match = _SECTION_HEADING.match(line.strip())
+        if match:
+            if current is not None:
+                sections[current] = "\n".join(lines).strip()
+            current = _HEADING_DECORATION.sub("", match.group(1)).strip() or match.group(1)
+            lines = []
+        elif current is not None:
+            lines.append(line)
+    if current is not None:
+        sections[current] = "\n".join(lines).strip()
+    # 只有标题没有内容的（如报告总标题）不作为分节
+    return {title: body for title, body in sections.items() if body}
+
 # 用户模型
 class User(Base):
     __tablename__ = "users"
@@ -33,6 +115,8 @@ class User(Base):
     role = Column(String(20), nullable=False)  # 管理员、教师、学生
     hashed_password = Column(String(255), nullable=False)
     class_id = Column(Integer, ForeignKey("classes.id"), nullable=True)
+    # 令牌版本：递增后此前签发的令牌全部失效（角色变更等场景）
+    token_version = Column(Integer, default=0, server_default="0")
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -42,6 +126,12 @@ class User(Base):
     exams = relationship("Exam", back_populates="creator")
     notes = relationship("Note", back_populates="author")
 
+    __table_args__ = (
+        # 用户列表按ID游标分页，并按角色/班级过滤
+        Index("ix_users_role_id", "role", "id"),
+        Index("ix_users_class_id_id", "class_id", "id"),
+    )
+
 # 班级模型
 class Class(Base):
     __tablename__ = "classes"
@@ -97,6 +187,12 @@ class Exam(Base):
     creator = relationship("User", back_populates="exams")
     class_rel = relationship("Class", back_populates="exams")
 
+    __table_args__ = (
+        # 按创建时间的游标分页（学生按班级、教师按创建者）
+        Index("ix_exams_class_created", "class_id", "created_at", "id"),
+        Index("ix_exams_creator_created", "creator_id", "created_at", "id"),
+    )
+
 # 笔记模型
 class Note(Base):
     __tablename__ = "notes"
@@ -108,10 +204,29 @@ class Note(Base):
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     is_public = Column(Boolean, default=False)
-    tags = Column(String(500), nullable=True)  # 标签，用逗号分隔
+    tags = Column(String(500), nullable=True)  # 标签，用逗号分隔（规范化后的展示值，筛选与统计使用 note_tags）
     
     # 关系
     author = relationship("User", back_populates="notes")
+    tag_rows = relationship("NoteTag", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # 按更新时间的游标分页
+        Index("ix_notes_updated_id", "updated_at", "id"),
+        Index("ix_notes_author_updated", "author_id", "updated_at", "id"),
+    )
+
+# 笔记标签关联模型（每个笔记每个标签一行）
+class NoteTag(Base):
+    __tablename__ = "note_tags"
+
+    note_id = Column(Integer, ForeignKey("notes.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String(50), primary_key=True)
+
+    __table_args__ = (
+        # 按标签查笔记与按标签计数都只走索引
+        Index("ix_note_tags_tag_note", "tag", "note_id"),
+    )
 
 # 视频分析记录模型
 class VideoAnalysis(Base):
@@ -120,6 +235,8 @@ class VideoAnalysis(Base):
     id = Column(Integer, primary_key=True, index=True)
     video_url = Column(String(500), nullable=False)
     analysis_result = Column(Text, nullable=False)
+    # 分析报告按 Markdown 标题拆分的各部分 {标题: 内容}，写入报告时生成
+    analysis_sections = Column(JSONText, nullable=True)
     analyzed_by = Column(Integer, ForeignKey("users.id"), nullable=True)
     analyzed_at = Column(DateTime, default=func.now())
     status = Column(String(20), default="completed")  # completed, failed, processing
@@ -127,6 +244,11 @@ class VideoAnalysis(Base):
     # 关系
     user = relationship("User")
 
+    __table_args__ = (
+        # 分析历史按分析时间的游标分页
+        Index("ix_video_analyses_user_analyzed", "analyzed_by", "analyzed_at", "id"),
+    )
+
 # 教学计划模型
 class TeachingPlan(Base):
     __tablename__ = "teaching_plans"
@@ -134,12 +256,17 @@ class TeachingPlan(Base):
     id = Column(Integer, primary_key=True, index=True)
     teacher_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     input_prompt = Column(Text, nullable=False)
-    output_content = Column(Text, nullable=False)
+    output_content = Column(JSONText, nullable=False)  # 教案各部分 {部分名称: 内容}
     created_at = Column(DateTime, default=func.now())
 
     # 关系
     teacher = relationship("User")
 
+    __table_args__ = (
+        # 按创建时间的游标分页
+        Index("ix_teaching_plans_teacher_created", "teacher_id", "created_at", "id"),
+    )
+
 # 思维导图模型
 class MindMap(Base):
     __tablename__ = "mindmaps"
@@ -148,7 +275,7 @@ class MindMap(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     title = Column(String(200), nullable=False)
     topic = Column(String(200), nullable=False)
-    data = Column(Text, nullable=False)  # JSON格式的思维导图数据
+    data = Column(JSONText, nullable=False)  # 思维导图数据
     description = Column(Text, nullable=True)
     is_public = Column(Boolean, default=False)
     created_at = Column(DateTime, default=func.now())
@@ -156,6 +283,11 @@ class MindMap(Base):
     # 关系
     user = relationship("User")
 
+    __table_args__ = (
+        # 按创建时间的游标分页
+        Index("ix_mindmaps_user_created", "user_id", "created_at", "id"),
+    )
+
 # 聊天历史模型
 class ChatHistory(Base):
     __tablename__ = "chat_history"
@@ -196,6 +328,12 @@ class StudentDispute(Base):
     student = relationship("User", foreign_keys=[student_id])
     class_rel = relationship("Class")
 
+    __table_args__ = (
+        # 按创建时间的游标分页（学生看自己的、教师看本班的）
+        Index("ix_student_disputes_student_created", "student_id", "created_at", "id"),
+        Index("ix_student_disputes_class_created", "class_id", "created_at", "id"),
+    )
+
 # 知识掌握度模型
 class KnowledgeMastery(Base):
     __tablename__ = "knowledge_mastery"
@@ -226,6 +364,38 @@ class VideoResource(Base):
     # 关系
     teacher = relationship("User")
 
+    __table_args__ = (
+        # 按创建时间的游标分页（教师看自己的、学生看已发布的）
+        Index("ix_video_resources_teacher_created", "teacher_id", "created_at", "id"),
+        Index("ix_video_resources_status_created", "status", "created_at", "id"),
+    )
+
+# 文件目录模型（上传文件的元数据索引，避免列表接口每次扫描目录）
+class FileRecord(Base):
+    __tablename__ = "file_records"
+
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String(255), unique=True, nullable=False)  # 存储文件名（唯一）
+    original_filename = Column(String(255), nullable=False)
+    file_path = Column(String(500), nullable=False)  # 本地路径或七牛云key
+    file_size = Column(Integer, default=0)
+    mime_type = Column(String(100), nullable=True)
+    file_type = Column(String(20), nullable=False)  # video、image、document、any
+    storage_type = Column(String(20), default="local")  # local、qiniu
+    url = Column(String(500), nullable=False)
+    uploader_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # 对账发现的文件无上传者
+    upload_time = Column(DateTime, default=func.now(), nullable=False)
+
+    # 关系
+    uploader = relationship("User")
+
+    __table_args__ = (
+        # 支持按上传时间的游标分页，以及按类型/上传者过滤
+        Index("ix_file_records_upload_time_id", "upload_time", "id"),
+        Index("ix_file_records_type_upload_time", "file_type", "upload_time"),
+        Index("ix_file_records_uploader_upload_time", "uploader_id", "upload_time"),
+    )
+
 # 系统配置模型
 class SystemConfig(Base):
     __tablename__ = "system_configs"
@@ -243,6 +413,14 @@ def init_db():
     
     # 创建所有表
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    add_missing_indexes()
+    tags_changed = migrate_note_tags()
+    migrate_json_columns()
+
+    # 笔记全文索引（FTS5）；标签迁移改写了 notes.tags 时全量重建，避免索引中残留旧标签文本
+    from services.note_search import note_search_service
+    note_search_service.init_index(rebuild=tags_changed > 0)
     
     # 创建默认用户和班级
     db = SessionLocal()
@@ -285,6 +463,139 @@ def init_db():
     finally:
         db.close()
 
+def add_missing_columns():
+    """
+    补齐模型中新增但已有表里缺少的列
+    create_all 不会修改已存在的表，这里用 ALTER TABLE 逐列添加（带服务端默认值）
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                default = ""
+                if column.server_default is not None:
+                    default = f" DEFAULT {column.server_default.arg}"
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{default}"))
+                print(f"已添加列 {table.name}.{column.name}")
+
+def add_missing_indexes():
+    """补齐模型中新增但已有表里缺少的索引（create_all 不会给已存在的表建索引）"""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                index.create(conn)
+                print(f"已添加索引 {table.name}.{index.name}")
+
+# 标签分隔符：英文/中文逗号、顿号、分号
+_TAG_SEPARATORS = re.compile(r"[,，、;；]")
+TAG_MAX_LENGTH = 50
+
+def parse_tags(tags: Optional[str]) -> List[str]:
+    """把逗号分隔的标签字符串拆成去重后的标签列表（保持原有顺序）"""
+    result = []
+    for tag in _TAG_SEPARATORS.split(tags or ""):
+        tag = tag.strip()[:TAG_MAX_LENGTH]
+        if tag and tag not in result:
+            result.append(tag)
+    return result
+
+def migrate_note_tags() -> int:
+    """
+    把已有笔记的逗号分隔标签迁移到 note_tags 表（仅在关联表为空时执行一次），
+    同时把 notes.tags 规范化为与写入接口一致的格式（英文逗号分隔、去重）
+
+    :return: notes.tags 被改写的笔记数
+    """
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM note_tags LIMIT 1")).first():
+            return 0
+        rows = conn.execute(text("SELECT id, tags FROM notes WHERE tags IS NOT NULL AND tags != ''")).fetchall()
+        pairs = []
+        updates = []
+        for row in rows:
+            tag_list = parse_tags(row.tags)
+            pairs.extend({"note_id": row.id, "tag": tag} for tag in tag_list)
+            normalized = ",".join(tag_list) or None
+            if normalized != row.tags:
+                updates.append({"id": row.id, "tags": normalized})
+        if pairs:
+            conn.execute(NoteTag.__table__.insert(), pairs)
+            print(f"已迁移笔记标签 {len(pairs)} 条")
+        if updates:
+            conn.execute(text("UPDATE notes SET tags = :tags WHERE id = :id"), updates)
+            print(f"已规范化笔记标签文本 {len(updates)} 条")
+        return len(updates)
+
+def migrate_json_columns():
+    """
+    把旧的文本列迁移为规范化的 JSON：教案中被二次编码/带围栏的内容解析为对象，
+    补齐视频分析报告的分节数据；PostgreSQL 上同时把列类型改为 JSONB
+    """
+    is_sqlite = engine.dialect.name == "sqlite"
+    with engine.begin() as conn:
+        for table_name, column_name, fallback_key in (
+            ("teaching_plans", "output_content", "教学内容"),
+            ("mindmaps", "data", None),
+        ):
+            if is_sqlite:
+                # 只处理不是 JSON 对象/数组的旧数据（非法 JSON 或被编码成字符串的 JSON）
+                rows = conn.execute(text(
+                    f"SELECT id, {column_name} FROM {table_name} "
+                    f"WHERE CASE WHEN json_valid({column_name}) "
+                    f"THEN json_type({column_name}) NOT IN ('object', 'array') ELSE 1 END"
+                )).fetchall()
+            else:
+                column_type = next(
+                    (col["type"] for col in inspect(conn).get_columns(table_name) if col["name"] == column_name), None
+                )
+                if column_type is not None and column_type.__class__.__name__.upper() in ("JSON", "JSONB"):
+                    continue
+                rows = conn.execute(text(f"SELECT id, {column_name} FROM {table_name}")).fetchall()
+
+            updates = []
+            for row_id, content in rows:
+                try:
+                    document = parse_json_document(content, fallback_key)
+                except ValueError:
+                    document = {"raw": content}
+                if not isinstance(document, (dict, list)):
+                    document = {fallback_key or "raw": document}
+                updates.append({"id": row_id, "value": json.dumps(document, ensure_ascii=False)})
+            if updates:
+                conn.execute(text(f"UPDATE {table_name} SET {column_name} = :value WHERE id = :id"), updates)
+                print(f"已规范化 {table_name}.{column_name} {len(updates)} 条")
+            if engine.dialect.name == "postgresql":
+                conn.execute(text(
+                    f"ALTER TABLE {table_name} ALTER COLUMN {column_name} TYPE JSONB USING {column_name}::jsonb"
+                ))
+
+        rows = conn.execute(text(
+            "SELECT id, analysis_result FROM video_analyses "
+            "WHERE analysis_sections IS NULL AND status = 'completed'"
+        )).fetchall()
+        updates = [
+            {"id": row_id, "value": json.dumps(split_markdown_sections(report), ensure_ascii=False)}
+            for row_id, report in rows
+        ]
+        if updates:
+            sections_value = "CAST(:value AS JSONB)" if engine.dialect.name == "postgresql" else ":value"
+            conn.execute(text(f"UPDATE video_analyses SET analysis_sections = {sections_value} WHERE id = :id"), updates)
+            print(f"已生成视频分析分节数据 {len(updates)} 条")
+
 def get_db():
     """获取数据库会话"""
     db = SessionLocal()
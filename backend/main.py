@@ -1,6 +1,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from database import engine, Base, init_db
+from services.fast_json import get_default_response_class
+from services.http_cache import HTTPCacheMiddleware, CachePolicy
 
 # 创建数据库表并初始化数据
 Base.metadata.create_all(bind=engine)
@@ -10,7 +12,9 @@ init_db()  # 初始化默认用户和班级
 app = FastAPI(
     title="EduAGI API",
     description="智能教学系统API",
-    version="1.0.0"
+    version="1.0.0",
+    # FAST_JSON_RESPONSES=true 时使用 orjson 响应类
+    default_response_class=get_default_response_class()
 )
 
 # 配置CORS
@@ -28,6 +32,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link", "ETag", "Last-Modified"],
+)
+
+# 条件请求（ETag / 304）与响应压缩，按路由前缀配置；未列出的路由不经过该中间件
+app.add_middleware(
+    HTTPCacheMiddleware,
+    policies={
+        "/api/teacher": CachePolicy(),
+        "/api/student": CachePolicy(),
+        "/api/notes": CachePolicy(),
+        "/api/resources": CachePolicy(),
+        "/api/files": CachePolicy(),
+        "/api/analytics": CachePolicy(),
+        "/api/videos": CachePolicy(),
+        "/api/exams": CachePolicy(),
+        "/api/classes": CachePolicy(),
+        "/api/users": CachePolicy(),
+        # 批量接口为 POST，只压缩合并后的响应
+        "/api/batch": CachePolicy(etag=False),
+        # 登录/令牌相关响应很小且不应缓存
+        "/api/auth": CachePolicy(etag=False, compress=False),
+    },
 )
 
 # 导入API路由
@@ -45,6 +71,7 @@ from api.manage import manage_router
 from api.teacher import teacher_router
 from api.student import student_router
 from api.files import files_router
+from api.batch import batch_router
 
 # 注册路由
 app.include_router(auth_router, prefix="/api/auth", tags=["认证"])
@@ -61,6 +88,26 @@ app.include_router(manage_router, prefix="/api/manage", tags=["系统管理"])
 app.include_router(teacher_router, prefix="/api/teacher", tags=["教师功能"])
 app.include_router(student_router, prefix="/api/student", tags=["学生功能"])
 app.include_router(files_router, prefix="/api/files", tags=["文件管理"])
+app.include_router(batch_router, prefix="/api/batch", tags=["批量请求"])
+
+@app.on_event("startup")
+async def reconcile_file_catalog():
+    """启动时将文件目录与上传目录对账（在线程池中执行，不阻塞事件循环）"""
+    from fastapi.concurrency import run_in_threadpool
+    from database import SessionLocal
+    from services.file_service import file_service
+
+    def _reconcile():
+        db = SessionLocal()
+        try:
+            stats = file_service.reconcile_catalog(db)
+            print(f"✅ 文件目录对账完成: {stats}")
+        except Exception as e:
+            print(f"❌ 文件目录对账失败: {e}")
+        finally:
+            db.close()
+
+    await run_in_threadpool(_reconcile)
 
 @app.get("/")
 async def root():
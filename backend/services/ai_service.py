@@ -200,8 +200,8 @@ class AIService:
             timestamp=datetime.now()
         )
 
-    async def call_deepseek_api(self, prompt: str) -> AIResponse:
-        """调用DeepSeek API"""
+    async def call_deepseek_api(self, prompt: str, messages: Optional[List[Dict[str, str]]] = None) -> AIResponse:
+        """调用DeepSeek API；传入 messages 时按多轮对话发送（prompt 仅用于模拟回复）"""
         # 如果未配置API密钥，返回模拟回复
         if not AIConfig.DEEPSEEK_API_KEY:
             return self._get_mock_response(prompt)
@@ -213,7 +213,7 @@ class AIService:
 
         payload = {
             "model": AIConfig.DEFAULT_MODEL,
-            "messages": [{"role": "user", "content": prompt}],
+            "messages": messages or [{"role": "user", "content": prompt}],
             "max_tokens": AIConfig.MAX_TOKENS,
             "temperature": AIConfig.TEMPERATURE
         }
@@ -310,8 +310,25 @@ class AIService:
             return self._get_mock_response(prompt)
 
     async def chat_with_student(self, question: str, ai_mode: str = "直接问答", 
-                               chat_history: List = None) -> str:
-        """与学生聊天"""
+                               chat_history: List = None, history_summary: Optional[str] = None) -> str:
+        """
+        与学生聊天
+
+        chat_history 为预算内的最近轮次 [(question, answer), ...]（从旧到新），
+        history_summary 为更早对话的摘要，二者由 services.chat_context 组装
+        """
+        response = await self.chat_with_student_response(question, ai_mode, chat_history, history_summary)
+        return response.content
+
+    @staticmethod
+    def is_mock_response(response: AIResponse) -> bool:
+        """是否为模拟回复（未配置密钥或接口调用失败时的降级结果）"""
+        return response.model == "mock-intelligent-model"
+
+    async def chat_with_student_response(self, question: str, ai_mode: str = "直接问答",
+                                         chat_history: List = None,
+                                         history_summary: Optional[str] = None) -> AIResponse:
+        """与学生聊天，返回完整的 AIResponse（调用方需要区分模拟回复时使用）"""
         if chat_history is None:
             chat_history = []
 
@@ -324,9 +341,17 @@ class AIService:
 
         final_question = mode_prompts.get(ai_mode, question)
 
+        # 按多轮对话发送：摘要作为系统消息，最近轮次作为问答消息
+        messages = []
+        if history_summary:
+            messages.append({"role": "system", "content": f"以下是与该学生此前对话的摘要，回答时可参考：{history_summary}"})
+        for past_question, past_answer in chat_history:
+            messages.append({"role": "user", "content": past_question})
+            messages.append({"role": "assistant", "content": past_answer})
+        messages.append({"role": "user", "content": final_question})
+
         # 调用AI服务
-        response = await self.call_deepseek_api(final_question)
-        return response.content
+        return await self.call_deepseek_api(final_question, messages=messages)
 
     async def generate_practice_question(self, topic: str) -> Dict[str, str]:
         """生成练习题 - 健壮的智能解析逻辑"""
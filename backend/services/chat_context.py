@@ -0,0 +1,123 @@
+"""
+对话上下文组装服务
+在 token 预算内从新到旧打包历史对话，放不下的更早轮次压缩成摘要并按学生缓存，
+让追问能拿到上下文，同时提示词长度（以及延迟与费用）保持有上限
+"""
+
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from services.ai_service import AIConfig, ai_service
+from services.text_utils import build_summary_prompt, estimate_tokens, truncate_to_tokens
+
+
+class ChatContextConfig:
+    # 历史对话（最近轮次）的 token 预算
+    HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+    # 摘要的 token 上限
+    SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", "300"))
+    # 每次从数据库读取的历史条数
+    HISTORY_FETCH_LIMIT = int(os.getenv("CHAT_HISTORY_FETCH_LIMIT", "30"))
+    # 摘要缓存的学生数上限
+    SUMMARY_CACHE_SIZE = int(os.getenv("CHAT_SUMMARY_CACHE_SIZE", "1000"))
+
+
+class ChatContextAssembler:
+    """对话上下文组装器"""
+
+    def __init__(self):
+        # student_id -> {"last_id": 摘要覆盖到的最后一条记录ID, "summary": 摘要}
+        self._summaries: "OrderedDict[int, Dict]" = OrderedDict()
+
+    def invalidate(self, student_id: int):
+        """清空学生的摘要缓存（清空聊天历史时调用）"""
+        self._summaries.pop(student_id, None)
+
+    async def assemble(self, student_id: int, chats: List) -> Tuple[Optional[str], List[Tuple[str, str]]]:
+        """
+        组装对话上下文
+
+        :param chats: ChatHistory 记录，按时间从旧到新排列
+        :return: (更早对话的摘要或None, 预算内的最近轮次 [(question, answer), ...]，从旧到新)
+        """
+        budget = ChatContextConfig.HISTORY_TOKEN_BUDGET
+        recent = []
+        used = 0
+        index = len(chats)
+        # 从新到旧放入预算，最新一轮即使超长也截断后保留
+        while index > 0:
+            chat = chats[index - 1]
+            question = chat.question or ""
+            answer = chat.answer or ""
+            tokens = estimate_tokens(question) + estimate_tokens(answer)
+            if recent and used + tokens > budget:
+                break
+            if not recent and tokens > budget:
+                answer = truncate_to_tokens(answer, max(budget - estimate_tokens(question), 50))
+                tokens = budget
+            recent.insert(0, (question, answer))
+            used += tokens
+            index -= 1
+
+        older = chats[:index]
+        if older:
+            summary = await self._get_summary(student_id, older)
+        else:
+            summary = self._cached_summary(student_id, chats[0].id if chats else None)
+        return summary, recent
+
+    def _cached_summary(self, student_id: int, oldest_id: Optional[int]) -> Optional[str]:
+        """历史全部放得进预算时，只有摘要覆盖的是更早（未读取）的对话才继续使用"""
+        entry = self._summaries.get(student_id)
+        if entry and oldest_id is not None and entry["last_id"] < oldest_id:
+            return entry["summary"]
+        return None
+
+    async def _get_summary(self, student_id: int, older: List) -> Optional[str]:
+        """
+        返回覆盖 older 的摘要：缓存已覆盖时直接复用，
+        否则只把缓存之后新增的旧轮次与已有摘要合并成新摘要（滚动摘要）
+        """
+        entry = self._summaries.get(student_id)
+        newest_id = older[-1].id
+        if entry and entry["last_id"] >= newest_id:
+            self._summaries.move_to_end(student_id)
+            return entry["summary"]
+
+        previous = entry["summary"] if entry else ""
+        pending = [chat for chat in older if not entry or chat.id > entry["last_id"]]
+        summary = await self._summarize(previous, pending)
+        if not summary:
+            return previous or None
+
+        self._summaries[student_id] = {"last_id": newest_id, "summary": summary}
+        self._summaries.move_to_end(student_id)
+        while len(self._summaries) > ChatContextConfig.SUMMARY_CACHE_SIZE:
+            self._summaries.popitem(last=False)
+        return summary
+
+    async def _summarize(self, previous: str, chats: List) -> str:
+        # 未配置密钥时只有模拟回复，摘要没有意义
+        if not AIConfig.DEEPSEEK_API_KEY:
+            return ""
+        limit = ChatContextConfig.SUMMARY_TOKEN_BUDGET
+        # 送去摘要的对话本身也限制长度，避免一次性塞入过多历史
+        dialogue = truncate_to_tokens(
+            "\n".join(f"学生：{chat.question}\nAI导师：{chat.answer}" for chat in chats),
+            ChatContextConfig.HISTORY_TOKEN_BUDGET * 2,
+        )
+        prompt = build_summary_prompt(previous, dialogue, limit)
+        try:
+            response = await ai_service.call_deepseek_api(prompt)
+            # 接口失败时 call_deepseek_api 会退回模拟回复，不能当作摘要缓存
+            if ai_service.is_mock_response(response):
+                return ""
+            return truncate_to_tokens(response.content.strip(), limit)
+        except Exception as e:
+            print(f"对话摘要生成失败: {e}")
+            return ""
+
+
+# 创建全局上下文组装器实例
+chat_context_assembler = ChatContextAssembler()
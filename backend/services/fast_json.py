@@ -0,0 +1,104 @@
+"""
+快速 JSON 序列化
+- FastJSONResponse：基于 orjson 的响应类（未安装 orjson 时退回标准 JSONResponse），
+  设置 FAST_JSON_RESPONSES=true 后作为全局默认响应类
+- list_response：列表接口用 Pydantic v2 TypeAdapter 一次性批量校验整页 ORM 对象，
+  再由 pydantic-core 直接输出 JSON 字节，跳过逐行 from_orm 和 jsonable_encoder
+- 数据库里已是 JSON 文本的列可以原样嵌入响应（orjson.Fragment），不做一次解析再编码
+"""
+
+import json
+import os
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Sequence, Type
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    # orjson.Fragment（3.10+）用于嵌入已序列化好的 JSON
+    ORJSON_FRAGMENT_AVAILABLE = hasattr(orjson, "Fragment")
+except ImportError:
+    ORJSON_AVAILABLE = False
+    ORJSON_FRAGMENT_AVAILABLE = False
+
+
+class FastJSONConfig:
+    # 是否把 FastJSONResponse 设为全局默认响应类
+    DEFAULT_RESPONSE_CLASS = os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson 编码的 JSON 响应（输出与标准 JSONResponse 一致：UTF-8、不转义中文）"""
+
+    def render(self, content: Any) -> bytes:
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return super().render(content)
+
+
+def get_default_response_class():
+    """main.py 创建应用时使用的默认响应类"""
+    if FastJSONConfig.DEFAULT_RESPONSE_CLASS and ORJSON_AVAILABLE:
+        return FastJSONResponse
+    return JSONResponse
+
+
+def embed_json(raw: Any) -> Any:
+    """把已序列化的 JSON 文本包装为可直接嵌入响应的值（orjson.Fragment；不可用时退回解析）"""
+    if raw is None:
+        return None
+    if ORJSON_FRAGMENT_AVAILABLE:
+        return orjson.Fragment(raw)
+    return json.loads(raw)
+
+
+def dumps(payload: Any) -> bytes:
+    """序列化为 UTF-8 JSON 字节（与 FastJSONResponse 输出一致）"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    # TypeAdapter 构建有开销，每个模型只构建一次
+    return TypeAdapter(List[model])
+
+
+def dump_list(model: Type[BaseModel], rows: Iterable[Any], raw_json_fields: Sequence[str] = ()) -> bytes:
+    """
+    把 ORM 对象列表批量校验并序列化为 JSON 字节
+
+    :param raw_json_fields: 值为 JSON 文本的字段，作为 JSON 值原样嵌入（而不是作为字符串）
+    """
+    rows = list(rows)
+    adapter = _list_adapter(model)
+    items = adapter.validate_python(rows, from_attributes=True)
+    if not raw_json_fields:
+        return adapter.dump_json(items)
+
+    # 其余字段交给 pydantic 转成 JSON 兼容的 Python 对象，JSON 文本字段单独拼入
+    payload = adapter.dump_python(items, mode="json", exclude={"__all__": set(raw_json_fields)})
+    for data, row in zip(payload, rows):
+        for field in raw_json_fields:
+            data[field] = embed_json(getattr(row, field))
+    return dumps(payload)
+
+
+def list_response(model: Type[BaseModel], rows: Iterable[Any], raw_json_fields: Sequence[str] = (),
+                  response: Optional[Response] = None) -> Response:
+    """
+    列表接口的快速响应；返回的 Response 不再经过 FastAPI 的 response_model 校验，
+    路由上的 response_model 仍保留用于接口文档
+
+    :param response: 依赖注入的 Response（如分页写入的 X-Next-Cursor），其响应头会复制到结果上
+    """
+    result = Response(content=dump_list(model, rows, raw_json_fields), media_type="application/json")
+    if response is not None:
+        result.headers.raw.extend(
+            (key, value) for key, value in response.headers.raw if key.lower() != b"content-length"
+        )
+    return result
@@ -6,12 +6,16 @@
 import os
 import uuid
 import shutil
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from fastapi import UploadFile, HTTPException
+from sqlalchemy.orm import Session
 from pathlib import Path
 import mimetypes
 from datetime import datetime
 
+from database import FileRecord
+from services.pagination import paginate_query
+
 # 七牛云配置（如果需要）
 try:
     from qiniu import Auth, put_file, put_data
@@ -27,12 +31,20 @@ class FileConfig:
     ALLOWED_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
     ALLOWED_DOCUMENT_EXTENSIONS = {".pdf", ".doc", ".docx", ".ppt", ".pptx", ".txt"}
     
+    # 文件列表分页配置
+    LIST_MAX_LIMIT = 500
+    # 参与目录对账的子目录及其对应的文件类型
+    CATALOG_DIRS = {"videos": "video", "images": "image", "documents": "document"}
+    
     # 七牛云配置
     QINIU_ACCESS_KEY = os.getenv("QINIU_ACCESS_KEY", "")
     QINIU_SECRET_KEY = os.getenv("QINIU_SECRET_KEY", "")
     QINIU_BUCKET_NAME = os.getenv("QINIU_BUCKET_NAME", "")
     QINIU_DOMAIN = os.getenv("QINIU_DOMAIN", "")
 
+# 进入文件目录的本地文件类型
+CATALOG_FILE_TYPES = set(FileConfig.CATALOG_DIRS.values())
+
 class FileService:
     """文件服务类"""
     
@@ -242,30 +254,139 @@ class FileService:
         except Exception:
             return None
     
-    def list_files(self, file_type: str = "any", limit: int = 100) -> List[Dict[str, Any]]:
-        """列出文件"""
-        files = []
-        
-        if file_type == "any":
-            search_dirs = ["videos", "images", "documents"]
-        else:
-            search_dirs = [f"{file_type}s"]
-        
-        for dir_name in search_dirs:
+    # ---------- 文件目录（元数据索引） ----------
+
+    def register_file(self, db: Session, file_info: Dict[str, Any],
+                      uploader_id: Optional[int] = None) -> FileRecord:
+        """上传成功后写入文件目录"""
+        upload_time = file_info.get("upload_time")
+        record = FileRecord(
+            filename=file_info["filename"],
+            original_filename=file_info.get("original_filename") or file_info["filename"],
+            file_path=file_info["file_path"],
+            file_size=file_info.get("file_size") or 0,
+            mime_type=file_info.get("mime_type"),
+            file_type=file_info.get("file_type", "any"),
+            storage_type=file_info.get("storage_type", "local"),
+            url=file_info["url"],
+            uploader_id=uploader_id,
+            upload_time=datetime.fromisoformat(upload_time) if upload_time else datetime.now()
+        )
+        db.add(record)
+        db.commit()
+        db.refresh(record)
+        return record
+
+    def register_upload(self, db: Session, file_info: Dict[str, Any],
+                        uploader_id: Optional[int] = None) -> Optional[FileRecord]:
+        """登记刚上传的文件；登记失败时删除已保存的文件，避免留下目录中查不到的孤儿文件
+
+        本地临时文件（file_type 不在 CATALOG_DIRS 中，保存在 uploads/temp）不进文件目录，返回None
+        """
+        if file_info.get("storage_type") == "local" and file_info.get("file_type") not in CATALOG_FILE_TYPES:
+            return None
+        try:
+            return self.register_file(db, file_info, uploader_id=uploader_id)
+        except Exception:
+            db.rollback()
+            if file_info.get("storage_type") == "qiniu":
+                self.delete_qiniu_file(file_info.get("qiniu_key") or file_info["file_path"])
+            else:
+                self.delete_local_file(file_info["file_path"])
+            raise
+
+    def unregister_file(self, db: Session, filename: str) -> bool:
+        """删除文件后同步移除目录记录"""
+        deleted = db.query(FileRecord).filter(FileRecord.filename == filename).delete()
+        db.commit()
+        return deleted > 0
+
+    @staticmethod
+    def record_to_info(record: FileRecord) -> Dict[str, Any]:
+        """将目录记录转换为接口返回的文件信息"""
+        return {
+            "filename": record.filename,
+            "original_filename": record.original_filename,
+            "file_path": record.file_path,
+            "file_size": record.file_size or 0,
+            "mime_type": record.mime_type,
+            "file_type": record.file_type,
+            "storage_type": record.storage_type,
+            "url": record.url,
+            "upload_time": record.upload_time.isoformat()
+        }
+
+    def list_files(self, db: Session, file_type: str = "any", uploader_id: Optional[int] = None,
+                   limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """列出文件（基于文件目录的游标分页，按上传时间倒序）
+
+        :return: (文件信息列表, 下一页游标；没有更多数据时为None)
+        """
+        limit = max(1, min(limit, FileConfig.LIST_MAX_LIMIT))
+        query = db.query(FileRecord)
+
+        if file_type != "any":
+            query = query.filter(FileRecord.file_type == file_type)
+        if uploader_id is not None:
+            query = query.filter(FileRecord.uploader_id == uploader_id)
+        records, next_cursor = paginate_query(
+            query, FileRecord.id, limit, cursor, sort_column=FileRecord.upload_time
+        )
+        return [self.record_to_info(record) for record in records], next_cursor
+
+    def reconcile_catalog(self, db: Session) -> Dict[str, int]:
+        """对账：将文件目录与本地上传目录同步
+
+        - 磁盘上存在但目录中缺失的文件：补录
+        - 目录中存在但磁盘上已删除的本地文件：移除
+        - 文件大小发生变化：更新
+        - 误登记的本地临时文件（uploads/temp）：移除
+        """
+        stats = {"added": 0, "removed": 0, "updated": 0}
+
+        local_records = {
+            record.filename: record
+            for record in db.query(FileRecord).filter(FileRecord.storage_type == "local").all()
+        }
+        seen = set()
+
+        for dir_name, file_type in FileConfig.CATALOG_DIRS.items():
             dir_path = self.upload_dir / dir_name
-            if dir_path.exists():
-                for file_path in dir_path.iterdir():
-                    if file_path.is_file():
-                        file_info = self.get_file_info(str(file_path))
-                        if file_info:
-                            file_info["file_type"] = dir_name[:-1]  # 去掉复数s
-                            file_info["url"] = f"/uploads/{dir_name}/{file_path.name}"
-                            files.append(file_info)
-        
-        # 按修改时间排序，最新的在前
-        files.sort(key=lambda x: x["modified_time"], reverse=True)
-        
-        return files[:limit]
+            if not dir_path.exists():
+                continue
+            for entry in os.scandir(dir_path):
+                if not entry.is_file():
+                    continue
+                seen.add(entry.name)
+                stat = entry.stat()
+                record = local_records.get(entry.name)
+                if record is None:
+                    db.add(FileRecord(
+                        filename=entry.name,
+                        original_filename=entry.name,
+                        file_path=str(dir_path / entry.name),
+                        file_size=stat.st_size,
+                        mime_type=mimetypes.guess_type(entry.name)[0],
+                        file_type=file_type,
+                        storage_type="local",
+                        url=f"/uploads/{dir_name}/{entry.name}",
+                        upload_time=datetime.fromtimestamp(stat.st_mtime)
+                    ))
+                    stats["added"] += 1
+                elif record.file_size != stat.st_size:
+                    record.file_size = stat.st_size
+                    stats["updated"] += 1
+
+        for filename, record in local_records.items():
+            if record.file_type not in CATALOG_FILE_TYPES:
+                db.delete(record)
+                stats["removed"] += 1
+            elif filename not in seen and not Path(record.file_path).exists():
+                db.delete(record)
+                stats["removed"] += 1
+
+        db.commit()
+        return stats
 
 # 创建全局文件服务实例
 file_service = FileService()
@@ -0,0 +1,264 @@
+"""
+HTTP 条件请求与响应压缩
+- HTTPCacheMiddleware：按路由前缀配置（CachePolicy），对 JSON 响应补齐 ETag（接口未给出时用响应体摘要），
+  命中 If-None-Match / If-Modified-Since 时返回 304；响应体超过阈值且客户端支持时做 brotli / gzip 压缩
+- CacheValidators：接口内的前置校验依赖，用数据行版本（行数、最大ID、最大 updated_at）生成 ETag，
+  未变化时在查询整页数据、序列化之前直接返回 304，同时省下带宽与服务端 CPU
+"""
+
+import asyncio
+import gzip
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import func
+from sqlalchemy.orm import Query
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+
+class HTTPCacheConfig:
+    ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+    # 小于该字节数的响应不压缩（压缩收益抵不过 CPU 开销）
+    COMPRESSION_MIN_SIZE = int(os.getenv("HTTP_COMPRESSION_MIN_SIZE", "1024"))
+    GZIP_LEVEL = int(os.getenv("HTTP_GZIP_LEVEL", "6"))
+    BROTLI_QUALITY = int(os.getenv("HTTP_BROTLI_QUALITY", "5"))
+    # 超过该字节数的响应放到线程池压缩，避免阻塞事件循环
+    THREADPOOL_COMPRESSION_SIZE = int(os.getenv("HTTP_THREADPOOL_COMPRESSION_SIZE", "262144"))
+
+
+class CachePolicy:
+    """
+    单个路由（前缀）的缓存/压缩策略
+
+    :param etag: 是否生成 ETag 并处理条件请求
+    :param compress: 是否压缩响应
+    :param min_size: 压缩阈值（字节），为空时使用 HTTPCacheConfig.COMPRESSION_MIN_SIZE
+    :param cache_control: 带 ETag 的响应默认的 Cache-Control；接口数据按用户区分，
+        默认 private, no-cache（浏览器可缓存，但每次都要带 ETag 回源校验）
+    """
+
+    def __init__(self, etag: bool = True, compress: bool = True, min_size: Optional[int] = None,
+                 cache_control: str = "private, no-cache"):
+        self.etag = etag
+        self.compress = compress
+        self.min_size = min_size
+        self.cache_control = cache_control
+
+
+def _opaque_tags(header_value: Optional[str]) -> List[str]:
+    """解析 If-None-Match，去掉弱校验前缀 W/（条件 GET 使用弱比较）"""
+    if not header_value:
+        return []
+    return [tag.strip().removeprefix("W/") for tag in header_value.split(",") if tag.strip()]
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    tags = _opaque_tags(if_none_match)
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def not_modified_since(last_modified: Optional[str], if_modified_since: Optional[str]) -> bool:
+    if not last_modified or not if_modified_since:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def is_not_modified(request_headers: Headers, etag: Optional[str], last_modified: Optional[str]) -> bool:
+    """按 RFC 9110：有 If-None-Match 时只比较 ETag，否则才看 If-Modified-Since"""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag is not None and etag_matches(etag, if_none_match)
+    return not_modified_since(last_modified, request_headers.get("if-modified-since"))
+
+
+def http_date(value: datetime) -> str:
+    """数据库中的时间按 UTC 存储（func.now()），格式化为 HTTP 日期"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    """从 Accept-Encoding 中选择压缩方式：优先 br，其次 gzip（忽略 q=0）"""
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    if BROTLI_AVAILABLE and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=HTTPCacheConfig.BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=HTTPCacheConfig.GZIP_LEVEL)
+
+
+class HTTPCacheMiddleware:
+    """
+    ASGI 中间件：对匹配路由前缀的 JSON 响应做条件请求处理与压缩
+
+    用法（main.py）：
+        app.add_middleware(HTTPCacheMiddleware, policies={"/api/teacher": CachePolicy(), ...})
+
+    非 JSON 响应（文件下载、流式响应）和已经压缩过的响应原样透传，不做缓冲
+    """
+
+    def __init__(self, app, policies: Optional[Dict[str, CachePolicy]] = None,
+                 default_policy: Optional[CachePolicy] = None):
+        self.app = app
+        # 最长前缀优先匹配
+        self.policies = sorted((policies or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.default_policy = default_policy
+
+    def _policy_for(self, path: str) -> Optional[CachePolicy]:
+        for prefix, policy in self.policies:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return policy
+        return self.default_policy
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not HTTPCacheConfig.ENABLED:
+            await self.app(scope, receive, send)
+            return
+        policy = self._policy_for(scope["path"])
+        if policy is None or not (policy.etag or policy.compress):
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        conditional = policy.etag and scope["method"] in ("GET", "HEAD")
+        start_message: Dict[str, Any] = {}
+        chunks: List[bytes] = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if not content_type.startswith("application/json") or "content-encoding" in headers:
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message.update(message)
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            await self._finish(start_message, b"".join(chunks), request_headers, policy, conditional, send)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _finish(self, start_message: Dict[str, Any], body: bytes, request_headers: Headers,
+                      policy: CachePolicy, conditional: bool, send):
+        status = start_message["status"]
+        headers = MutableHeaders(raw=list(start_message["headers"]))
+
+        if conditional and status == 200:
+            etag = headers.get("etag")
+            if etag is None:
+                etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+                headers["ETag"] = etag
+            if "cache-control" not in headers:
+                headers["Cache-Control"] = policy.cache_control
+            if is_not_modified(request_headers, etag, headers.get("last-modified")):
+                for name in ("content-type", "content-length"):
+                    if name in headers:
+                        del headers[name]
+                if policy.compress:
+                    headers.add_vary_header("Accept-Encoding")
+                await send({"type": "http.response.start", "status": 304, "headers": headers.raw})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        min_size = policy.min_size if policy.min_size is not None else HTTPCacheConfig.COMPRESSION_MIN_SIZE
+        if policy.compress and len(body) >= min_size and status not in (204, 304):
+            encoding = _choose_encoding(request_headers.get("accept-encoding", ""))
+            if encoding:
+                if len(body) >= HTTPCacheConfig.THREADPOOL_COMPRESSION_SIZE:
+                    loop = asyncio.get_event_loop()
+                    body = await loop.run_in_executor(None, compress_body, body, encoding)
+                else:
+                    body = compress_body(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                # 压缩后的表示与原始字节不同，强 ETag 降为弱 ETag
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+
+        await send({"type": "http.response.start", "status": status, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
+
+
+def collection_version(query: Query, id_column, updated_column) -> Tuple[int, Optional[int], Optional[datetime]]:
+    """
+    查询结果集的版本：(行数, 最大ID, 最大更新时间)
+    新增改变最大ID，删除改变行数，修改改变最大更新时间；只有一次聚合查询，走列表的复合索引
+    """
+    count, max_id, last_updated = query.with_entities(
+        func.count(id_column), func.max(id_column), func.max(updated_column)
+    ).order_by(None).one()
+    return count, max_id, last_updated
+
+
+class CacheValidators:
+    """
+    条件 GET 前置校验依赖
+
+    用法：cache: CacheValidators = Depends()，在查询数据之前调用
+        cache.check_collection(query, Model.id, Model.updated_at, current_user.id)
+    或 cache.check(版本数据..., last_modified=row.updated_at)；
+    未变化时抛出 304，否则把 ETag / Last-Modified 写入响应头（HTTPCacheMiddleware 会直接沿用）
+    """
+
+    def __init__(self, request: Request, response: Response):
+        self.request = request
+        self.response = response
+
+    def check(self, *version: Any, last_modified: Optional[datetime] = None):
+        # ETag 包含请求路径与查询参数（分页游标、筛选条件），不同请求的版本互不混淆
+        key = repr((self.request.url.path, str(self.request.url.query), version))
+        etag = '"' + hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + '"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if last_modified is not None:
+            headers["Last-Modified"] = http_date(last_modified)
+
+        if HTTPCacheConfig.ENABLED and is_not_modified(self.request.headers, etag, headers.get("Last-Modified")):
+            raise HTTPException(status_code=304, headers=headers)
+        self.response.headers.update(headers)
+
+    def check_collection(self, query: Query, id_column, updated_column, *scope: Any):
+        """
+        按结果集版本校验列表接口
+        只给出 ETag，不给 Last-Modified：删除行不会改变最大更新时间，
+        只带 If-Modified-Since 的客户端会一直拿到 304 而看不到删除
+
+        :param scope: 额外参与 ETag 的值（如当前用户ID），避免不同用户的相同请求共用 ETag
+        """
+        count, max_id, last_updated = collection_version(query, id_column, updated_column)
+        self.check(scope, count, max_id, last_updated)
@@ -0,0 +1,208 @@
+"""
+笔记全文检索服务
+SQLite FTS5 虚拟表 notes_fts（rowid 即笔记ID）保存经 jieba 分词、以空格分隔的标题/正文/标签，
+查询同样先分词再 MATCH，按 bm25 排序，可见性过滤与分页都在同一条索引查询里完成；
+非 SQLite 数据库或 SQLite 未编译 FTS5 时退回 LIKE 查询
+"""
+
+import base64
+import html
+import re
+from typing import List, Optional, Tuple
+
+import jieba
+from fastapi import HTTPException
+from sqlalchemy import and_, column, func, literal_column, or_, table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Query, Session
+
+from database import engine, Note
+
+NOTE_FTS_TABLE = "notes_fts"
+
+# bm25 列权重：标题、正文、标签
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+TAGS_WEIGHT = 5.0
+
+# 摘要窗口（命中词前后保留的字符数）
+SNIPPET_RADIUS = 60
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+
+# 至少包含一个中文字符、字母或数字的词才进入索引（过滤标点与空白）
+_TOKEN_PATTERN = re.compile(r"[0-9a-zA-Z\u4e00-\u9fff]")
+
+_notes_fts = table(NOTE_FTS_TABLE, column("rowid"))
+
+
+def tokenize(text_value: Optional[str]) -> List[str]:
+    """
+    索引分词：jieba 搜索引擎模式，输出精确模式的词并额外切出其中的短词
+    （如“过拟合” -> “拟合”“过拟合”），过滤标点并转小写
+    """
+    return [
+        token.lower() for token in jieba.lcut_for_search(text_value or "")
+        if _TOKEN_PATTERN.search(token)
+    ]
+
+
+def _segment(text_value: Optional[str]) -> str:
+    return " ".join(tokenize(text_value))
+
+
+def _match_expression(q: str) -> str:
+    """
+    把查询分词后拼成 FTS5 MATCH 表达式：每个词用双引号包裹（转义特殊语法），词之间为 AND
+    查询用精确模式分词：精确模式的每个词都包含在同一文本的搜索引擎模式输出中，
+    因此能命中 tokenize 建立的索引，又不会因切出的短词过多而把 AND 条件收得过紧
+    """
+    terms = list(dict.fromkeys(token for token in jieba.lcut(q or "") if _TOKEN_PATTERN.search(token)))
+    return " ".join('"' + term.lower().replace('"', '""') + '"' for term in terms)
+
+
+class NoteSearchService:
+    """笔记全文检索"""
+
+    def __init__(self):
+        self.available = False
+
+    def init_index(self, rebuild: bool = False):
+        """
+        建立 FTS5 索引表（启动时调用），首次建表或索引条数与笔记不一致时全量重建
+
+        :param rebuild: 强制全量重建（启动迁移批量改写了笔记内容时使用）
+        """
+        if engine.dialect.name != "sqlite":
+            return
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {NOTE_FTS_TABLE} "
+                    f"USING fts5(title, content, tags, tokenize='unicode61')"
+                ))
+                indexed = conn.execute(text(f"SELECT count(*) FROM {NOTE_FTS_TABLE}")).scalar()
+                total = conn.execute(text("SELECT count(*) FROM notes")).scalar()
+                if rebuild or indexed != total:
+                    conn.execute(text(f"DELETE FROM {NOTE_FTS_TABLE}"))
+                    rows = conn.execute(text("SELECT id, title, content, tags FROM notes")).fetchall()
+                    if rows:
+                        conn.execute(
+                            text(f"INSERT INTO {NOTE_FTS_TABLE}(rowid, title, content, tags) "
+                                 f"VALUES (:id, :title, :content, :tags)"),
+                            [
+                                {"id": row.id, "title": _segment(row.title),
+                                 "content": _segment(row.content), "tags": _segment(row.tags)}
+                                for row in rows
+                            ]
+                        )
+                    print(f"已重建笔记全文索引，共 {len(rows)} 条")
+            self.available = True
+        except OperationalError as e:
+            print(f"SQLite 不支持 FTS5，笔记搜索退回 LIKE 查询: {e}")
+            self.available = False
+
+    def index_note(self, db: Session, note: Note):
+        """写入或更新一条笔记的索引（与笔记修改在同一事务中，调用方提交）"""
+        if not self.available:
+            return
+        db.execute(text(f"DELETE FROM {NOTE_FTS_TABLE} WHERE rowid = :id"), {"id": note.id})
+        db.execute(
+            text(f"INSERT INTO {NOTE_FTS_TABLE}(rowid, title, content, tags) VALUES (:id, :title, :content, :tags)"),
+            {"id": note.id, "title": _segment(note.title), "content": _segment(note.content), "tags": _segment(note.tags)}
+        )
+
+    def remove_note(self, db: Session, note_id: int):
+        """删除一条笔记的索引（调用方提交）"""
+        if not self.available:
+            return
+        db.execute(text(f"DELETE FROM {NOTE_FTS_TABLE} WHERE rowid = :id"), {"id": note_id})
+
+    @staticmethod
+    def encode_cursor(score: float, note_id: int) -> str:
+        """生成不透明游标：(相关度分数, 笔记ID)"""
+        raw = f"{score!r}|{note_id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[float, int]:
+        """解析游标，格式错误时抛出400"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            score_text, note_id = raw.rsplit("|", 1)
+            return float(score_text), int(note_id)
+        except Exception:
+            raise HTTPException(status_code=400, detail="无效的分页游标")
+
+    def search(self, query: Query, q: str, limit: int,
+               cursor: Optional[str] = None) -> Tuple[List[Tuple[Note, float]], Optional[str]]:
+        """
+        在已按可见性过滤的笔记查询上执行全文检索
+
+        :param query: db.query(Note) 并已加上可见性过滤
+        :return: ([(笔记, 相关度分数), ...] 按相关度排序, 下一页游标；没有更多数据时为None)
+        """
+        if self.available:
+            match = _match_expression(q)
+            if not match:
+                return [], None
+            # bm25 越小越相关，取相反数作为分数
+            score = (-func.bm25(literal_column(NOTE_FTS_TABLE), TITLE_WEIGHT, CONTENT_WEIGHT, TAGS_WEIGHT)).label("score")
+            query = query.join(_notes_fts, _notes_fts.c.rowid == Note.id).filter(
+                literal_column(NOTE_FTS_TABLE).op("MATCH")(match)
+            ).add_columns(score)
+            score_expr = score.element
+        else:
+            query = query.filter(
+                Note.title.contains(q) | Note.content.contains(q) | Note.tags.contains(q)
+            ).add_columns(literal_column("0.0").label("score"))
+            score_expr = literal_column("0.0")
+
+        if cursor:
+            cursor_score, cursor_id = self.decode_cursor(cursor)
+            query = query.filter(or_(
+                score_expr < cursor_score,
+                and_(score_expr == cursor_score, Note.id < cursor_id)
+            ))
+
+        # 多取一条用于判断是否还有下一页
+        rows = query.order_by(score_expr.desc(), Note.id.desc()).limit(limit + 1).all()
+        results = [(note, float(row_score)) for note, row_score in rows]
+
+        next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            next_cursor = self.encode_cursor(results[-1][1], results[-1][0].id)
+        return results, next_cursor
+
+    @staticmethod
+    def highlight(text_value: Optional[str], q: str, radius: int = SNIPPET_RADIUS) -> str:
+        """在原文中截取第一个命中词附近的片段，并用 <mark> 标出所有命中词"""
+        text_value = text_value or ""
+        # 完整查询串优先匹配，避免“过拟合”被拆成“过”“拟合”两段高亮
+        terms = {token for token in jieba.lcut(q or "") if _TOKEN_PATTERN.search(token)}
+        if terms:
+            terms.add((q or "").strip())
+        terms = sorted(terms, key=len, reverse=True)
+        if not terms:
+            return html.escape(text_value[:radius * 2])
+        pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+        first = pattern.search(text_value)
+        if first is None:
+            return html.escape(text_value[:radius * 2])
+        start = max(0, first.start() - radius)
+        end = min(len(text_value), first.end() + radius)
+        # 原文先转义再加高亮标签，前端可以直接按 HTML 渲染
+        window = text_value[start:end]
+        parts = []
+        position = 0
+        for match in pattern.finditer(window):
+            parts.append(html.escape(window[position:match.start()]))
+            parts.append(f"{HIGHLIGHT_OPEN}{html.escape(match.group(0))}{HIGHLIGHT_CLOSE}")
+            position = match.end()
+        parts.append(html.escape(window[position:]))
+        return ("…" if start > 0 else "") + "".join(parts) + ("…" if end < len(text_value) else "")
+
+
+# 创建全局笔记检索实例
+note_search_service = NoteSearchService()
@@ -0,0 +1,109 @@
+"""
+通用游标分页
+列表接口按 (排序列, id) 做键集分页：游标是不透明的 base64 字符串，记录上一页最后一行的排序值与ID，
+下一页直接从索引位置继续读取，不再 offset 扫描；响应体仍是 JSON 数组，
+下一页游标通过 X-Next-Cursor 响应头返回，同时附带 Link: <...>; rel="next"
+"""
+
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy.orm import Query
+
+
+class PaginationConfig:
+    DEFAULT_LIMIT = int(os.getenv("PAGINATION_DEFAULT_LIMIT", "50"))
+    MAX_LIMIT = int(os.getenv("PAGINATION_MAX_LIMIT", "200"))
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    """生成不透明游标：(排序值, id)"""
+    if isinstance(sort_value, datetime):
+        payload = ["dt", sort_value.isoformat(), row_id]
+    else:
+        payload = ["v", sort_value, row_id]
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """解析游标，格式错误时抛出400"""
+    try:
+        kind, value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if kind == "dt":
+            value = datetime.fromisoformat(value)
+        return value, int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+def paginate_query(query: Query, id_column, limit: int, cursor: Optional[str] = None,
+                   sort_column=None, descending: bool = True) -> Tuple[List[Any], Optional[str]]:
+    """
+    对查询做键集分页
+
+    :param id_column: 主键列（同时作为排序的第二关键字，保证顺序稳定）
+    :param sort_column: 排序列，为空时只按主键排序
+    :return: (本页结果, 下一页游标；没有更多数据时为None)
+    """
+    if cursor:
+        cursor_value, cursor_id = decode_cursor(cursor)
+        if sort_column is None:
+            query = query.filter(id_column < cursor_id if descending else id_column > cursor_id)
+        elif descending:
+            query = query.filter(
+                (sort_column < cursor_value) | ((sort_column == cursor_value) & (id_column < cursor_id))
+            )
+        else:
+            query = query.filter(
+                (sort_column > cursor_value) | ((sort_column == cursor_value) & (id_column > cursor_id))
+            )
+
+    order = [id_column.desc() if descending else id_column.asc()]
+    if sort_column is not None:
+        order.insert(0, sort_column.desc() if descending else sort_column.asc())
+
+    # 多取一条用于判断是否还有下一页
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        last_id = getattr(last, id_column.key)
+        sort_value = getattr(last, sort_column.key) if sort_column is not None else last_id
+        next_cursor = encode_cursor(sort_value, last_id)
+    return rows, next_cursor
+
+
+class PageParams:
+    """
+    分页参数依赖：?limit=&cursor=
+
+    用法：page: PageParams = Depends()，再用 page.apply(query, Model.id, Model.created_at)
+    """
+
+    def __init__(self, request: Request, response: Response,
+                 limit: int = PaginationConfig.DEFAULT_LIMIT, cursor: Optional[str] = None):
+        self.request = request
+        self.response = response
+        self.limit = max(1, min(limit, PaginationConfig.MAX_LIMIT))
+        self.cursor = cursor
+
+    def apply(self, query: Query, id_column, sort_column=None, descending: bool = True) -> List[Any]:
+        """执行分页查询，并把下一页游标写入响应头"""
+        rows, next_cursor = paginate_query(
+            query, id_column, self.limit, self.cursor, sort_column=sort_column, descending=descending
+        )
+        self.set_next_cursor(next_cursor)
+        return rows
+
+    def set_next_cursor(self, next_cursor: Optional[str]):
+        if next_cursor:
+            self.response.headers["X-Next-Cursor"] = next_cursor
+            next_url = self.request.url.include_query_params(cursor=next_cursor, limit=self.limit)
+            self.response.headers["Link"] = f'<{next_url}>; rel="next"'
@@ -94,6 +94,9 @@ ROLE_PERMISSIONS = {
     ]
 }
 
+# 预先计算的角色权限集合（集合查找，随认证缓存一起挂到当前用户上）
+ROLE_PERMISSION_SETS = {role: frozenset(perms) for role, perms in ROLE_PERMISSIONS.items()}
+
 class PermissionService:
     """权限服务类"""
     
@@ -102,22 +105,29 @@ class PermissionService:
         """获取用户权限列表"""
         return ROLE_PERMISSIONS.get(user.role, [])
     
+    @staticmethod
+    def get_permission_set(user: User) -> frozenset:
+        """获取用户权限集合：优先使用认证时挂载的预计算集合"""
+        permissions = getattr(user, "permissions", None)
+        if permissions is None:
+            permissions = ROLE_PERMISSION_SETS.get(user.role, frozenset())
+        return permissions
+    
     @staticmethod
     def has_permission(user: User, permission: str) -> bool:
         """检查用户是否有特定权限"""
-        user_permissions = PermissionService.get_user_permissions(user)
-        return permission in user_permissions
+        return permission in PermissionService.get_permission_set(user)
     
     @staticmethod
     def has_any_permission(user: User, permissions: List[str]) -> bool:
         """检查用户是否有任意一个权限"""
-        user_permissions = PermissionService.get_user_permissions(user)
+        user_permissions = PermissionService.get_permission_set(user)
         return any(perm in user_permissions for perm in permissions)
     
     @staticmethod
     def has_all_permissions(user: User, permissions: List[str]) -> bool:
         """检查用户是否有所有权限"""
-        user_permissions = PermissionService.get_user_permissions(user)
+        user_permissions = PermissionService.get_permission_set(user)
         return all(perm in user_permissions for perm in permissions)
     
     @staticmethod
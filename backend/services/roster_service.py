@@ -0,0 +1,282 @@
+"""
+名单批量导入服务
+解析 CSV/XLSX 名单，整份文件先校验完再入库：每个账号的密码单独加盐哈希（独立的批量线程池），班级按名称匹配或新建，
+用户按批 executemany 写入，全部在一个事务中完成，任何一行有错误时整份文件都不导入
+入库耗时以分钟计（bcrypt 每个核每秒只有几个哈希），由 start_import_job 放到后台执行，按任务ID查询进度
+"""
+
+import csv
+import io
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from auth import hash_passwords_bulk
+from database import SessionLocal, User, Class
+
+try:
+    from openpyxl import load_workbook
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+
+class RosterConfig:
+    MAX_ROWS = int(os.getenv("ROSTER_IMPORT_MAX_ROWS", "20000"))
+    MAX_FILE_SIZE = int(os.getenv("ROSTER_IMPORT_MAX_FILE_SIZE", str(10 * 1024 * 1024)))  # 10MB
+    # 每批 executemany 的行数
+    INSERT_BATCH_SIZE = int(os.getenv("ROSTER_IMPORT_BATCH_SIZE", "1000"))
+    # 已结束的导入任务保留多久（秒）供查询结果
+    JOB_RETENTION_SECONDS = int(os.getenv("ROSTER_IMPORT_JOB_RETENTION", "3600"))
+
+
+VALID_ROLES = {"学生", "教师", "管理员"}
+
+# 表头别名 -> 字段名（中英文表头都支持）
+HEADER_ALIASES = {
+    "account_id": "account_id", "账号": "account_id", "学号": "account_id", "工号": "account_id",
+    "display_name": "display_name", "姓名": "display_name", "名称": "display_name",
+    "role": "role", "角色": "role",
+    "password": "password", "密码": "password",
+    "class_name": "class_name", "class": "class_name", "班级": "class_name",
+}
+
+# 与 database.py 中的列长度保持一致
+ACCOUNT_ID_MAX_LENGTH = 50
+DISPLAY_NAME_MAX_LENGTH = 100
+CLASS_NAME_MAX_LENGTH = 100
+
+
+class RosterFileError(Exception):
+    """名单文件无法解析（格式、表头、大小等问题）"""
+
+
+def _decode_csv(content: bytes) -> str:
+    # Excel 另存的中文 CSV 常是 GBK 编码
+    for encoding in ("utf-8-sig", "gbk"):
+        try:
+            return content.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise RosterFileError("无法识别CSV文件编码，请另存为UTF-8格式")
+
+
+def _read_rows(filename: str, content: bytes) -> List[List[str]]:
+    """读取为二维字符串表（第一行为表头）"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".csv":
+        return [row for row in csv.reader(io.StringIO(_decode_csv(content)))]
+    if extension == ".xlsx":
+        if not OPENPYXL_AVAILABLE:
+            raise RosterFileError("服务器未安装 openpyxl，暂不支持XLSX，请改用CSV")
+        workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            return [
+                ["" if cell is None else str(cell) for cell in row]
+                for row in sheet.iter_rows(values_only=True)
+            ]
+        finally:
+            workbook.close()
+    raise RosterFileError("仅支持 .csv 或 .xlsx 格式的名单文件")
+
+
+def parse_roster(filename: str, content: bytes) -> List[Dict]:
+    """
+    解析名单文件
+
+    :return: [{"row": 行号, "account_id": ..., "display_name": ..., "role": ..., "password": ..., "class_name": ...}, ...]
+    """
+    if len(content) > RosterConfig.MAX_FILE_SIZE:
+        raise RosterFileError("名单文件过大")
+    rows = _read_rows(filename, content)
+    if not rows:
+        raise RosterFileError("名单文件为空")
+
+    columns = {}
+    for index, header in enumerate(rows[0]):
+        field = HEADER_ALIASES.get(str(header).strip().lower())
+        if field and field not in columns:
+            columns[field] = index
+    missing = [field for field in ("account_id", "display_name") if field not in columns]
+    if missing:
+        raise RosterFileError(f"缺少必要的列: {', '.join(missing)}")
+
+    records = []
+    for line_number, row in enumerate(rows[1:], start=2):
+        if not any(str(cell).strip() for cell in row):
+            continue
+        record = {"row": line_number}
+        for field, index in columns.items():
+            record[field] = str(row[index]).strip() if index < len(row) else ""
+        records.append(record)
+        if len(records) > RosterConfig.MAX_ROWS:
+            raise RosterFileError(f"名单行数超过上限 {RosterConfig.MAX_ROWS}")
+    return records
+
+
+def validate_roster(db: Session, records: List[Dict], default_password: Optional[str],
+                    default_role: str, create_classes: bool) -> Tuple[List[Dict], Dict[str, Optional[int]]]:
+    """
+    校验整份名单，不写数据库
+
+    :return: (错误列表 [{"row", "account_id", "message"}], 班级名称 -> 已有班级ID（需新建的为None）)
+    """
+    errors = []
+
+    def error(record, message):
+        errors.append({"row": record["row"], "account_id": record.get("account_id") or None, "message": message})
+
+    # 已有账号与班级各用一次查询取回，避免逐行查询
+    account_ids = [record["account_id"] for record in records if record.get("account_id")]
+    existing_accounts = set()
+    for start in range(0, len(account_ids), 900):
+        chunk = account_ids[start:start + 900]
+        existing_accounts.update(
+            account_id for (account_id,) in db.query(User.account_id).filter(User.account_id.in_(chunk))
+        )
+    class_ids: Dict[str, Optional[int]] = {}
+    for class_id, name in db.query(Class.id, Class.name).order_by(Class.id):
+        class_ids.setdefault(name, class_id)
+
+    seen = set()
+    for record in records:
+        account_id = record.get("account_id", "")
+        display_name = record.get("display_name", "")
+        record["role"] = record.get("role") or default_role
+        record["password"] = record.get("password") or default_password or ""
+
+        if not account_id:
+            error(record, "账号不能为空")
+        elif len(account_id) > ACCOUNT_ID_MAX_LENGTH:
+            error(record, f"账号长度不能超过{ACCOUNT_ID_MAX_LENGTH}个字符")
+        elif account_id in seen:
+            error(record, "账号在文件中重复")
+        elif account_id in existing_accounts:
+            error(record, "账号已存在")
+        seen.add(account_id)
+
+        if not display_name:
+            error(record, "姓名不能为空")
+        elif len(display_name) > DISPLAY_NAME_MAX_LENGTH:
+            error(record, f"姓名长度不能超过{DISPLAY_NAME_MAX_LENGTH}个字符")
+
+        if record["role"] not in VALID_ROLES:
+            error(record, f"角色必须是 {'、'.join(sorted(VALID_ROLES))} 之一")
+
+        if not record["password"]:
+            error(record, "密码为空且未指定默认密码")
+
+        class_name = record.get("class_name", "")
+        if class_name and class_name not in class_ids:
+            if not create_classes:
+                error(record, f"班级不存在: {class_name}")
+            elif len(class_name) > CLASS_NAME_MAX_LENGTH:
+                error(record, f"班级名称长度不能超过{CLASS_NAME_MAX_LENGTH}个字符")
+            else:
+                class_ids[class_name] = None
+    return errors, class_ids
+
+
+def import_roster(db: Session, records: List[Dict], class_ids: Dict[str, Optional[int]]) -> Dict[str, int]:
+    """
+    写入已校验的名单（阻塞调用，在线程池中执行）：逐个账号加盐哈希密码，新建班级，
+    按批 executemany 插入用户，全部在一个事务中提交
+    bcrypt 哈希是主要耗时（默认轮数下每个核每秒只有几个），导入速度取决于 PASSWORD_HASH_BULK_WORKERS
+
+    :return: {"created_users": ..., "created_classes": ...}
+    """
+    hashed_passwords = hash_passwords_bulk([record["password"] for record in records])
+
+    new_class_names = [name for name, class_id in class_ids.items() if class_id is None]
+    try:
+        if new_class_names:
+            db.execute(Class.__table__.insert(), [{"name": name} for name in new_class_names])
+            for class_id, name in db.query(Class.id, Class.name).filter(Class.name.in_(new_class_names)):
+                if class_ids.get(name) is None:
+                    class_ids[name] = class_id
+
+        rows = [
+            {
+                "account_id": record["account_id"],
+                "display_name": record["display_name"],
+                "role": record["role"],
+                "hashed_password": hashed_password,
+                "class_id": class_ids.get(record.get("class_name")) if record.get("class_name") else None,
+            }
+            for record, hashed_password in zip(records, hashed_passwords)
+        ]
+        for start in range(0, len(rows), RosterConfig.INSERT_BATCH_SIZE):
+            db.execute(User.__table__.insert(), rows[start:start + RosterConfig.INSERT_BATCH_SIZE])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {"created_users": len(rows), "created_classes": len(new_class_names)}
+
+
+# 导入任务：同一时间只执行一个，避免并发导入争抢哈希线程池、重复插入同一账号
+_import_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="roster-import")
+_import_jobs: Dict[str, Dict] = {}
+_import_jobs_lock = threading.Lock()
+
+
+def _prune_import_jobs():
+    cutoff = time.time() - RosterConfig.JOB_RETENTION_SECONDS
+    for job_id in [job_id for job_id, job in _import_jobs.items()
+                   if job["finished_at"] is not None and job["finished_at"] < cutoff]:
+        del _import_jobs[job_id]
+
+
+def _run_import_job(job_id: str, records: List[Dict], class_ids: Dict[str, Optional[int]]):
+    with _import_jobs_lock:
+        _import_jobs[job_id]["status"] = "running"
+    db = SessionLocal()
+    try:
+        result = import_roster(db, records, class_ids)
+        update = {"status": "completed", **result}
+    except Exception as e:
+        update = {"status": "failed", "error": str(e)}
+    finally:
+        db.close()
+    with _import_jobs_lock:
+        _import_jobs[job_id].update(update, finished_at=time.time())
+
+
+def start_import_job(records: List[Dict], class_ids: Dict[str, Optional[int]]) -> str:
+    """
+    在后台导入已校验的名单，立即返回任务ID（任务使用独立的数据库会话）
+
+    :return: 任务ID，用 get_import_job 查询状态
+    """
+    job_id = uuid.uuid4().hex
+    with _import_jobs_lock:
+        _prune_import_jobs()
+        _import_jobs[job_id] = {
+            "job_id": job_id, "status": "queued", "total_rows": len(records),
+            "created_users": 0, "created_classes": 0, "error": None,
+            "started_at": time.time(), "finished_at": None,
+        }
+    _import_executor.submit(_run_import_job, job_id, records, class_ids)
+    return job_id
+
+
+def get_import_job(job_id: str) -> Optional[Dict]:
+    """
+    查询导入任务
+
+    :return: {"job_id", "status": queued/running/completed/failed, "total_rows", "created_users",
+              "created_classes", "error", "elapsed_seconds"}，任务不存在或已过期时返回None
+    """
+    with _import_jobs_lock:
+        job = _import_jobs.get(job_id)
+        if job is None:
+            return None
+        job = dict(job)
+    job["elapsed_seconds"] = round((job.pop("finished_at") or time.time()) - job.pop("started_at"), 3)
+    return job
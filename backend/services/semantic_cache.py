@@ -0,0 +1,209 @@
+"""
+语义问答缓存服务
+同一班级、同一AI模式下，意思相同的问题（如“什么是过拟合”与“过拟合是什么意思”）直接复用已有回答，
+用本地向量模型编码问题，在小型内存向量索引中查找相似度超过阈值的近邻，支持过期时间与容量淘汰
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.text_utils import is_follow_up
+
+# 本地向量模型：需要 sentence-transformers 加载中文向量模型；
+# 英文模型对中文问句的相似度不可靠，会把不同的问题判成相同并返回错误回答，因此没有中文模型时禁用语义缓存
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
+DEFAULT_EMBEDDING_MODEL = "BAAI/bge-small-zh-v1.5"
+
+# 模型名称/路径中含这些标记时视为支持中文（bge-*-zh、text2vec-chinese、多语言模型等）
+CHINESE_MODEL_MARKERS = ("zh", "chinese", "multilingual", "bge-m3", "text2vec")
+
+
+def supports_chinese(model_name: str) -> bool:
+    """按模型名称判断是否为中文（或多语言）向量模型；自定义模型可用 SEMANTIC_CACHE_CHINESE_MODEL=true 声明"""
+    if os.getenv("SEMANTIC_CACHE_CHINESE_MODEL", "").lower() == "true":
+        return True
+    name = os.path.basename(model_name.rstrip("/\\")).lower()
+    return any(marker in name for marker in CHINESE_MODEL_MARKERS)
+
+
+def resolve_embedding_model() -> str:
+    """
+    语义缓存使用的向量模型：显式配置的 SEMANTIC_CACHE_EMBEDDING_MODEL 优先，
+    其次复用知识库的 EMBEDDING_MODEL_PATH（是中文模型时，如 bge-large-zh-v1.5），否则用 bge-small-zh
+    """
+    configured = os.getenv("SEMANTIC_CACHE_EMBEDDING_MODEL", "").strip()
+    if configured:
+        return configured
+    shared = os.getenv("EMBEDDING_MODEL_PATH", "").strip()
+    if shared and supports_chinese(shared):
+        return shared
+    return DEFAULT_EMBEDDING_MODEL
+
+
+class SemanticCacheConfig:
+    ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    # sentence-transformers 模型名称或本地路径，见 resolve_embedding_model
+    EMBEDDING_MODEL = resolve_embedding_model()
+    # 余弦相似度阈值，越高越保守
+    SIMILARITY_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    # 缓存条目有效期（秒）
+    TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(24 * 3600)))
+    # 每个（班级, AI模式）分区的最大条目数，超出时淘汰最久未命中的条目
+    MAX_ENTRIES_PER_BUCKET = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+
+
+def is_cacheable_question(question: str) -> bool:
+    """只有不依赖对话上下文的独立问题才参与语义缓存"""
+    text = (question or "").strip()
+    return len(text) >= 4 and not is_follow_up(text)
+
+
+class _Bucket:
+    """一个（班级, AI模式）分区的向量索引：向量矩阵 + 平行的条目列表"""
+
+    def __init__(self, dim: int):
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.entries: List[Dict] = []
+
+    def remove(self, keep_mask: np.ndarray):
+        self.vectors = self.vectors[keep_mask]
+        self.entries = [entry for entry, keep in zip(self.entries, keep_mask) if keep]
+
+
+class SemanticCache:
+    """语义问答缓存"""
+
+    def __init__(self):
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[Optional[int], str], _Bucket] = {}
+        self.enabled = (
+            SemanticCacheConfig.ENABLED
+            and SENTENCE_TRANSFORMERS_AVAILABLE
+            and supports_chinese(SemanticCacheConfig.EMBEDDING_MODEL)
+        )
+        if SemanticCacheConfig.ENABLED and not self.enabled:
+            print(f"语义缓存已禁用：未安装 sentence-transformers 或 {SemanticCacheConfig.EMBEDDING_MODEL} 不是中文向量模型")
+
+    def _get_model(self):
+        """延迟加载向量模型（首次使用时加载，避免拖慢服务启动）；加载失败时禁用语义缓存"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    try:
+                        self._model = SentenceTransformer(SemanticCacheConfig.EMBEDDING_MODEL, device="cpu")
+                    except Exception:
+                        self.enabled = False
+                        raise
+        return self._model
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = self._get_model().encode([text], normalize_embeddings=True)[0]
+        return np.asarray(vector, dtype=np.float32)
+
+    def _expire(self, bucket: _Bucket, now: float):
+        if bucket.entries:
+            keep = np.array([now - entry["created_at"] < SemanticCacheConfig.TTL_SECONDS for entry in bucket.entries])
+            if not keep.all():
+                bucket.remove(keep)
+
+    def _lookup_sync(self, class_id: Optional[int], ai_mode: str, question: str) -> Tuple[Optional[Dict], np.ndarray]:
+        vector = self._embed(question)
+        now = time.time()
+        with self._lock:
+            bucket = self._buckets.get((class_id, ai_mode))
+            if bucket is None or not bucket.entries:
+                return None, vector
+            self._expire(bucket, now)
+            if not bucket.entries:
+                return None, vector
+            scores = bucket.vectors @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < SemanticCacheConfig.SIMILARITY_THRESHOLD:
+                return None, vector
+            entry = bucket.entries[best]
+            entry["last_hit"] = now
+            entry["hits"] += 1
+            return dict(entry, similarity=float(scores[best])), vector
+
+    def _store_sync(self, class_id: Optional[int], ai_mode: str, question: str, answer: str,
+                    vector: Optional[np.ndarray]):
+        if vector is None:
+            vector = self._embed(question)
+        now = time.time()
+        with self._lock:
+            bucket = self._buckets.setdefault((class_id, ai_mode), _Bucket(vector.shape[0]))
+            self._expire(bucket, now)
+            bucket.vectors = np.vstack([bucket.vectors, vector[None, :]])
+            bucket.entries.append({
+                "question": question,
+                "answer": answer,
+                "created_at": now,
+                "last_hit": now,
+                "hits": 0,
+            })
+            overflow = len(bucket.entries) - SemanticCacheConfig.MAX_ENTRIES_PER_BUCKET
+            if overflow > 0:
+                # 淘汰最久未命中的条目
+                order = np.argsort([entry["last_hit"] for entry in bucket.entries])
+                keep = np.ones(len(bucket.entries), dtype=bool)
+                keep[order[:overflow]] = False
+                bucket.remove(keep)
+
+    async def lookup(self, class_id: Optional[int], ai_mode: str, question: str) -> Tuple[Optional[Dict], Optional[np.ndarray]]:
+        """
+        查找语义相近的已缓存回答
+
+        :return: (命中的条目或None, 问题向量)；问题向量可在未命中时传给 store 复用
+        """
+        if not self.enabled or not is_cacheable_question(question):
+            return None, None
+        try:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, self._lookup_sync, class_id, ai_mode, question.strip())
+        except Exception as e:
+            print(f"语义缓存查询失败: {e}")
+            return None, None
+
+    async def store(self, class_id: Optional[int], ai_mode: str, question: str, answer: str,
+                    vector: Optional[np.ndarray] = None):
+        """写入一条问答（追问不写入）"""
+        if not self.enabled or not is_cacheable_question(question):
+            return
+        try:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self._store_sync, class_id, ai_mode, question.strip(), answer, vector)
+        except Exception as e:
+            print(f"语义缓存写入失败: {e}")
+
+    def clear(self, class_id: Optional[int] = None):
+        """清空某个班级（或全部）的缓存"""
+        with self._lock:
+            if class_id is None:
+                self._buckets.clear()
+            else:
+                for key in [key for key in self._buckets if key[0] == class_id]:
+                    del self._buckets[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "buckets": len(self._buckets),
+                "entries": sum(len(bucket.entries) for bucket in self._buckets.values()),
+            }
+
+
+# 创建全局语义缓存实例
+semantic_cache = SemanticCache()
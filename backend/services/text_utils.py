@@ -0,0 +1,51 @@
+"""
+文本工具：本地 token 估算与截断、追问识别、对话摘要提示词
+对话上下文组装（chat_context）与语义缓存（semantic_cache）共用，规则只在这里维护一份
+"""
+
+import re
+
+_CJK_PATTERN = re.compile(r"[\u4e00-\u9fff\u3000-\u303f\uff00-\uffef]")
+
+# 追问特征：含指代/承接词的问题依赖对话上下文才能理解
+FOLLOW_UP_PATTERN = re.compile(
+    r"(它|它们|他们|她们|这个|那个|这些|那些|这种|那种|这里|那里|上面|上述|前面|之前|刚才|刚刚|"
+    r"继续|接着|还有呢|然后呢|为什么呢|怎么说|再讲|再说|展开|详细|举个例子|举例|换个|另一个|"
+    r"第[一二三四五六七八九十\d]+[个点条步]|\b(it|this|that|these|those|above|previous|again|more)\b)",
+    re.IGNORECASE,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """本地快速估算 token 数：中文约一字一个 token，其他字符约四个一个 token"""
+    text = text or ""
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """把文本截断到大约 max_tokens 个 token"""
+    text = text or ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] + "……"
+
+
+def is_follow_up(text: str) -> bool:
+    """问题中是否含指代/承接词"""
+    return bool(FOLLOW_UP_PATTERN.search(text or ""))
+
+
+def build_summary_prompt(previous: str, dialogue: str, max_chars: int) -> str:
+    """把已有摘要与新增对话合并成新摘要（滚动摘要）的提示词"""
+    return (
+        f"请把下面的已有摘要和新增对话合并成一段简洁的中文摘要，保留学生问过的问题、关键结论和尚未解决的疑问，"
+        f"不超过{max_chars}字，只输出摘要本身。\n\n已有摘要：{previous or '无'}\n\n新增对话：\n{dialogue}"
+    )
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+测试条件请求与响应压缩中间件（services/http_cache.py）
+"""
+
+import gzip
+from datetime import datetime
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import Column, DateTime, Integer, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from services import http_cache
+from services.http_cache import (
+    CachePolicy, CacheValidators, HTTPCacheMiddleware, _choose_encoding, etag_matches
+)
+
+LARGE_PAYLOAD = {"items": ["教学计划内容" * 10 for _ in range(100)]}
+
+RowBase = declarative_base()
+
+
+class Row(RowBase):
+    __tablename__ = "rows"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False)
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(
+        HTTPCacheMiddleware,
+        policies={
+            "/cached": CachePolicy(),
+            "/cached/plain": CachePolicy(compress=False),
+        },
+    )
+    calls = {"validated": 0}
+
+    @app.get("/cached/large")
+    def large():
+        return LARGE_PAYLOAD
+
+    @app.get("/cached/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/cached/plain/large")
+    def plain_large():
+        return LARGE_PAYLOAD
+
+    @app.get("/cached/text")
+    def text():
+        return PlainTextResponse("x" * 5000)
+
+    @app.get("/cached/validated")
+    def validated(cache: CacheValidators = Depends()):
+        cache.check("v1")
+        calls["validated"] += 1
+        return {"ok": True}
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    RowBase.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([Row(id=1, created_at=datetime(2025, 1, 1)), Row(id=2, created_at=datetime(2025, 1, 2))])
+    session.commit()
+
+    @app.get("/cached/rows")
+    def rows(cache: CacheValidators = Depends()):
+        query = session.query(Row)
+        cache.check_collection(query, Row.id, Row.created_at)
+        return [row.id for row in query.order_by(Row.id)]
+
+    @app.get("/other")
+    def other():
+        return LARGE_PAYLOAD
+
+    test_client = TestClient(app)
+    test_client.calls = calls
+    test_client.session = session
+    return test_client
+
+
+def test_etag_matches_weak_comparison():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"abc"', 'W/"abc", "def"')
+    assert etag_matches('"abc"', "*")
+    assert not etag_matches('"abc"', '"abd"')
+    assert not etag_matches('"abc"', None)
+
+
+def test_choose_encoding(monkeypatch):
+    monkeypatch.setattr(http_cache, "BROTLI_AVAILABLE", True)
+    assert _choose_encoding("gzip, deflate, br") == "br"
+    assert _choose_encoding("br;q=0, gzip") == "gzip"
+    assert _choose_encoding("gzip;q=0") is None
+    assert _choose_encoding("gzip; q=0.0, identity") is None
+    assert _choose_encoding("*") == "gzip"
+    assert _choose_encoding("") is None
+    monkeypatch.setattr(http_cache, "BROTLI_AVAILABLE", False)
+    assert _choose_encoding("br, gzip") == "gzip"
+
+
+def test_etag_and_304(client):
+    response = client.get("/cached/small", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag.startswith('"')
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    response = client.get("/cached/small", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert "content-type" not in response.headers
+
+
+def test_compression_downgrades_etag_to_weak(client):
+    response = client.get("/cached/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+    # httpx 已自动解压，内容与原始 JSON 一致
+    assert response.json() == LARGE_PAYLOAD
+
+    # 弱 ETag 回传后仍能命中 304
+    response = client.get("/cached/large", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+    assert "Accept-Encoding" in response.headers["vary"]
+
+
+def test_raw_gzip_body(client):
+    with client.stream("GET", "/cached/large", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+    assert int(response.headers["content-length"]) == len(raw)
+    assert len(raw) < len(gzip.decompress(raw))
+
+
+def test_small_and_uncompressed_policies(client):
+    response = client.get("/cached/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    response = client.get("/cached/plain/large", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"].startswith('"')
+
+
+def test_non_json_and_unlisted_routes_pass_through(client):
+    response = client.get("/cached/text", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert "etag" not in response.headers
+    response = client.get("/other", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert "etag" not in response.headers
+
+
+def test_cache_validators_short_circuit(client):
+    response = client.get("/cached/validated", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert client.calls["validated"] == 1
+    etag = response.headers["etag"]
+
+    response = client.get("/cached/validated", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert response.status_code == 304
+    # 前置校验命中时接口主体不再执行
+    assert client.calls["validated"] == 1
+
+
+def test_collection_sees_deletes(client):
+    """列表只靠 ETag 校验：删除旧行后 If-None-Match / If-Modified-Since 都不能返回 304"""
+    headers = {"Accept-Encoding": "identity"}
+    response = client.get("/cached/rows", headers=headers)
+    assert response.json() == [1, 2]
+    assert "last-modified" not in response.headers
+    etag = response.headers["etag"]
+
+    client.session.query(Row).filter(Row.id == 1).delete()
+    client.session.commit()
+
+    response = client.get("/cached/rows", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200 and response.json() == [2]
+    response = client.get("/cached/rows", headers={**headers, "If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"})
+    assert response.status_code == 200 and response.json() == [2]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+测试通用游标分页（encode_cursor / decode_cursor / paginate_query）
+使用内存 SQLite 和独立的测试模型
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, DateTime, Integer, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from services.pagination import decode_cursor, encode_cursor, paginate_query
+
+ItemBase = declarative_base()
+
+
+class Item(ItemBase):
+    __tablename__ = "items"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False)
+
+
+BASE_TIME = datetime(2025, 3, 1, 8, 30, 15, 123456)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    ItemBase.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    # 每个时间点三行，用于验证同一排序值下按 id 拆分
+    session.add_all(
+        Item(id=i, created_at=BASE_TIME + timedelta(minutes=(i - 1) // 3)) for i in range(1, 11)
+    )
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def walk(db, limit, **kwargs):
+    """按游标依次取完所有页，返回每页的 id 列表"""
+    pages, cursor = [], None
+    while True:
+        rows, cursor = paginate_query(db.query(Item), Item.id, limit, cursor, **kwargs)
+        pages.append([row.id for row in rows])
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip_datetime():
+    """datetime 排序值按 isoformat 往返，保留微秒"""
+    value, row_id = decode_cursor(encode_cursor(BASE_TIME, 42))
+    assert value == BASE_TIME and isinstance(value, datetime)
+    assert row_id == 42
+
+
+def test_cursor_round_trip_plain_values():
+    assert decode_cursor(encode_cursor("张三", 7)) == ("张三", 7)
+    assert decode_cursor(encode_cursor(3.5, 1)) == (3.5, 1)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", "WyJ2IiwxXQ==", "eyJhIjoxfQ=="])
+def test_bad_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor)
+    assert exc_info.value.status_code == 400
+
+
+def test_descending_with_ties_on_sort_column(db):
+    """排序值相同的行按 id 拆分，跨页不重复、不遗漏"""
+    pages = walk(db, 4, sort_column=Item.created_at)
+    assert pages == [[10, 9, 8, 7], [6, 5, 4, 3], [2, 1]]
+
+
+def test_ascending_with_ties_on_sort_column(db):
+    pages = walk(db, 4, sort_column=Item.created_at, descending=False)
+    assert pages == [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]]
+
+
+def test_id_only_pagination(db):
+    assert walk(db, 3) == [[10, 9, 8], [7, 6, 5], [4, 3, 2], [1]]
+    assert walk(db, 5, descending=False) == [[1, 2, 3, 4, 5], [6, 7, 8, 9, 10]]
+
+
+def test_exact_last_page_has_no_next_cursor(db):
+    rows, cursor = paginate_query(db.query(Item), Item.id, 10, None, sort_column=Item.created_at)
+    assert len(rows) == 10 and cursor is None
+
+
+def test_cursor_respects_query_filters(db):
+    query = db.query(Item).filter(Item.id % 2 == 0)
+    rows, cursor = paginate_query(query, Item.id, 2, None, sort_column=Item.created_at)
+    assert [row.id for row in rows] == [10, 8]
+    rows, cursor = paginate_query(query, Item.id, 2, cursor, sort_column=Item.created_at)
+    assert [row.id for row in rows] == [6, 4]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
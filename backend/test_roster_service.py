@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+测试名单导入的解析、校验与后台导入任务（parse_roster / validate_roster / start_import_job）
+使用内存 SQLite 数据库，不依赖 data/teaching.db
+"""
+
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base, Class, User
+from services import roster_service
+from services.roster_service import (
+    RosterFileError, get_import_job, parse_roster, start_import_job, validate_roster
+)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # 后台导入任务在另一个线程里打开会话，内存库需共用同一连接
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(roster_service, "SessionLocal", session_factory)
+    session = session_factory()
+    session.add(Class(id=1, name="计算机1班"))
+    session.add(User(account_id="2024001", display_name="已有学生", role="学生", hashed_password="x"))
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def test_parse_roster_header_aliases():
+    """中英文表头都能识别，空行跳过，行号按文件行计算"""
+    content = "学号,姓名,Role,班级\n2024101,张三,学生,计算机1班\n,,,\n2024102,李四,,\n".encode("utf-8")
+    records = parse_roster("名单.csv", content)
+    assert records == [
+        {"row": 2, "account_id": "2024101", "display_name": "张三", "role": "学生", "class_name": "计算机1班"},
+        {"row": 4, "account_id": "2024102", "display_name": "李四", "role": "", "class_name": ""},
+    ]
+
+
+def test_parse_roster_gbk_and_bom():
+    """Excel 另存的 GBK 编码与带 BOM 的 UTF-8 都能解析"""
+    text = "账号,姓名\n2024101,张三\n"
+    assert parse_roster("a.csv", text.encode("gbk"))[0]["display_name"] == "张三"
+    assert parse_roster("a.csv", text.encode("utf-8-sig"))[0]["account_id"] == "2024101"
+
+
+def test_parse_roster_rejects_bad_files():
+    with pytest.raises(RosterFileError):
+        parse_roster("名单.csv", "姓名\n张三\n".encode("utf-8"))  # 缺少账号列
+    with pytest.raises(RosterFileError):
+        parse_roster("名单.txt", b"account_id,display_name\n1,a\n")
+    with pytest.raises(RosterFileError):
+        parse_roster("名单.csv", b"")
+
+
+def test_validate_roster_valid_rows(db):
+    records = [
+        {"row": 2, "account_id": "2024101", "display_name": "张三", "role": "", "class_name": "计算机1班"},
+        {"row": 3, "account_id": "T001", "display_name": "王老师", "role": "教师", "password": "secret"},
+    ]
+    errors, class_ids = validate_roster(db, records, "init123", "学生", create_classes=False)
+    assert errors == []
+    assert class_ids["计算机1班"] == 1
+    # 空角色/密码用默认值补齐
+    assert records[0]["role"] == "学生" and records[0]["password"] == "init123"
+    assert records[1]["password"] == "secret"
+
+
+def test_validate_roster_duplicates_and_existing_accounts(db):
+    records = [
+        {"row": 2, "account_id": "2024101", "display_name": "张三"},
+        {"row": 3, "account_id": "2024101", "display_name": "张三"},
+        {"row": 4, "account_id": "2024001", "display_name": "重复"},
+    ]
+    errors, _ = validate_roster(db, records, "init123", "学生", create_classes=False)
+    assert [(e["row"], e["message"]) for e in errors] == [(3, "账号在文件中重复"), (4, "账号已存在")]
+
+
+def test_validate_roster_field_errors(db):
+    records = [
+        {"row": 2, "account_id": "", "display_name": ""},
+        {"row": 3, "account_id": "2024102", "display_name": "李四", "role": "家长"},
+        {"row": 4, "account_id": "2024103", "display_name": "王五"},
+    ]
+    errors, _ = validate_roster(db, records, None, "学生", create_classes=False)
+    messages = {(e["row"], e["message"]) for e in errors}
+    assert (2, "账号不能为空") in messages
+    assert (2, "姓名不能为空") in messages
+    assert any(row == 3 and message.startswith("角色必须是") for row, message in messages)
+    assert (4, "密码为空且未指定默认密码") in messages
+
+
+def test_validate_roster_new_classes(db):
+    records = [{"row": 2, "account_id": "2024101", "display_name": "张三", "class_name": "人工智能2班"}]
+    errors, _ = validate_roster(db, records, "init123", "学生", create_classes=False)
+    assert [e["message"] for e in errors] == ["班级不存在: 人工智能2班"]
+
+    errors, class_ids = validate_roster(db, records, "init123", "学生", create_classes=True)
+    assert errors == []
+    # 需新建的班级对应 None，已有班级保留其ID
+    assert class_ids == {"计算机1班": 1, "人工智能2班": None}
+
+
+
+def wait_for_job(job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = get_import_job(job_id)
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("导入任务超时")
+
+
+def test_import_job_runs_in_background(db):
+    records = [{"row": 2, "account_id": "2024101", "display_name": "张三", "class_name": "人工智能2班"}]
+    errors, class_ids = validate_roster(db, records, "init123", "学生", create_classes=True)
+    assert errors == []
+
+    job = wait_for_job(start_import_job(records, class_ids))
+    assert job["status"] == "completed" and job["error"] is None
+    assert (job["total_rows"], job["created_users"], job["created_classes"]) == (1, 1, 1)
+    user = db.query(User).filter(User.account_id == "2024101").one()
+    assert user.class_id == db.query(Class.id).filter(Class.name == "人工智能2班").scalar()
+
+
+def test_import_job_failure_is_reported(db):
+    """校验之后账号被占用时，整个事务回滚，任务标记为失败"""
+    records = [{"row": 2, "account_id": "2024001", "display_name": "重复", "role": "学生", "password": "x"}]
+    job = wait_for_job(start_import_job(records, {}))
+    assert job["status"] == "failed" and job["error"]
+    assert db.query(User).count() == 1
+
+
+def test_unknown_import_job():
+    assert get_import_job("missing") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+测试语义缓存的模型选择：只使用中文向量模型，没有时禁用缓存
+"""
+
+import pytest
+
+from services import semantic_cache
+from services.semantic_cache import SemanticCache, resolve_embedding_model, supports_chinese
+
+
+@pytest.mark.parametrize("model", ["BAAI/bge-small-zh-v1.5", "D:/bge-large-zh-v1.5", "shibing624/text2vec-base-chinese",
+                                   "paraphrase-multilingual-MiniLM-L12-v2"])
+def test_chinese_models(model):
+    assert supports_chinese(model)
+
+
+def test_english_model_is_rejected(monkeypatch):
+    monkeypatch.delenv("SEMANTIC_CACHE_CHINESE_MODEL", raising=False)
+    assert not supports_chinese("sentence-transformers/all-MiniLM-L6-v2")
+    monkeypatch.setenv("SEMANTIC_CACHE_CHINESE_MODEL", "true")
+    assert supports_chinese("/models/custom-encoder")
+
+
+def test_resolve_embedding_model(monkeypatch):
+    monkeypatch.delenv("SEMANTIC_CACHE_EMBEDDING_MODEL", raising=False)
+    monkeypatch.delenv("SEMANTIC_CACHE_CHINESE_MODEL", raising=False)
+    # 知识库用的是中文模型时复用，英文模型时改用默认中文模型
+    monkeypatch.setenv("EMBEDDING_MODEL_PATH", "D:/bge-large-zh-v1.5")
+    assert resolve_embedding_model() == "D:/bge-large-zh-v1.5"
+    monkeypatch.setenv("EMBEDDING_MODEL_PATH", "sentence-transformers/all-MiniLM-L6-v2")
+    assert resolve_embedding_model() == semantic_cache.DEFAULT_EMBEDDING_MODEL
+    monkeypatch.setenv("SEMANTIC_CACHE_EMBEDDING_MODEL", "BAAI/bge-base-zh-v1.5")
+    assert resolve_embedding_model() == "BAAI/bge-base-zh-v1.5"
+
+
+def test_disabled_without_chinese_model(monkeypatch):
+    monkeypatch.delenv("SEMANTIC_CACHE_CHINESE_MODEL", raising=False)
+    monkeypatch.setattr(semantic_cache.SemanticCacheConfig, "ENABLED", True)
+    monkeypatch.setattr(semantic_cache, "SENTENCE_TRANSFORMERS_AVAILABLE", True)
+    monkeypatch.setattr(semantic_cache.SemanticCacheConfig, "EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    assert not SemanticCache().enabled
+    monkeypatch.setattr(semantic_cache, "SENTENCE_TRANSFORMERS_AVAILABLE", False)
+    monkeypatch.setattr(semantic_cache.SemanticCacheConfig, "EMBEDDING_MODEL", "BAAI/bge-small-zh-v1.5")
+    assert not SemanticCache().enabled
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
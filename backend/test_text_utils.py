@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+测试文本工具（services/text_utils.py）：token 估算与截断、追问识别
+"""
+
+import pytest
+
+from services.text_utils import estimate_tokens, is_follow_up, truncate_to_tokens
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens(None) == 1
+    # 中文一字一个 token，英文约四个字符一个 token
+    assert estimate_tokens("过拟合") == 4
+    assert estimate_tokens("abcdefgh") == 3
+
+
+def test_truncate_to_tokens():
+    text = "梯度下降" * 50
+    assert truncate_to_tokens("短文本", 100) == "短文本"
+    truncated = truncate_to_tokens(text, 20)
+    assert truncated.endswith("……")
+    assert estimate_tokens(truncated[:-2]) <= 20
+
+
+@pytest.mark.parametrize("question", ["它的原理是什么", "举个例子", "第二点再讲一下", "Can you explain that again"])
+def test_follow_up_questions(question):
+    assert is_follow_up(question)
+
+
+@pytest.mark.parametrize("question", ["什么是过拟合", "梯度下降法的基本步骤", "What is overfitting"])
+def test_standalone_questions(question):
+    assert not is_follow_up(question)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,140 @@
+"""Embedding 后端基准测试：召回率 vs 延迟
+
+从现有 Chroma 知识库中抽取文本块作为语料，分别用 PyTorch 后端与 ONNX int8 后端编码，
+以 PyTorch 后端的检索结果为基准，比较 ONNX 后端的 recall@k、查询延迟与语料编码吞吐。
+
+查询默认取自语料本身（每个抽样文本块的第一句），也可以用 --queries 指定一个每行一个问题的文件。
+
+用法：
+    python benchmark_embeddings.py --db data/chroma --model sentence-transformers/all-MiniLM-L6-v2
+    python benchmark_embeddings.py --db E:/chroma_db --model D:/bge-large-zh-v1.5 --bge
+"""
+
+import argparse
+import random
+import re
+import time
+
+import numpy as np
+from langchain_chroma import Chroma
+
+from embedding_utils import BGE_QUERY_INSTRUCTION_ZH, OnnxEmbeddings
+
+
+def load_corpus(db_path, sample_size, seed):
+    """从向量库中读取文本块（不需要加载 Embedding 模型）"""
+    documents = Chroma(persist_directory=db_path).get(include=["documents"])["documents"]
+    documents = [doc for doc in documents if doc and doc.strip()]
+    random.Random(seed).shuffle(documents)
+    return documents[:sample_size]
+
+
+def build_queries(corpus, query_file, query_count, seed):
+    """
+    构造查询；从语料生成时同时返回每个查询的来源文本块下标
+
+    :return: (queries, source_indices 或 None)
+    """
+    if query_file:
+        with open(query_file, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()][:query_count], None
+
+    rng = random.Random(seed)
+    indices = rng.sample(range(len(corpus)), min(query_count, len(corpus)))
+    queries = []
+    for index in indices:
+        first_sentence = re.split(r"[。！？.!?\n]", corpus[index].strip())[0]
+        queries.append(first_sentence[:100] or corpus[index][:100])
+    return queries, indices
+
+
+def load_torch_backend(model, bge):
+    if bge:
+        from langchain_community.embeddings import HuggingFaceBgeEmbeddings
+        return HuggingFaceBgeEmbeddings(
+            model_name=model,
+            model_kwargs={"device": "cpu"},
+            encode_kwargs={"normalize_embeddings": True},
+        )
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model, encode_kwargs={"normalize_embeddings": True})
+
+
+def run_backend(name, embeddings, corpus, queries, k):
+    """编码语料与查询，返回检索结果与计时"""
+    started = time.perf_counter()
+    corpus_vectors = np.asarray(embeddings.embed_documents(corpus), dtype=np.float32)
+    corpus_seconds = time.perf_counter() - started
+
+    # 逐条编码查询，模拟在线检索的单次延迟
+    latencies = []
+    query_vectors = []
+    for query in queries:
+        started = time.perf_counter()
+        query_vectors.append(embeddings.embed_query(query))
+        latencies.append((time.perf_counter() - started) * 1000)
+    query_vectors = np.asarray(query_vectors, dtype=np.float32)
+
+    scores = query_vectors @ corpus_vectors.T
+    top_k = np.argsort(-scores, axis=1)[:, :k]
+    return {
+        "name": name,
+        "top_k": top_k,
+        "docs_per_second": len(corpus) / corpus_seconds if corpus_seconds > 0 else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def recall_at_k(result_top_k, reference_top_k):
+    """以基准后端的 top-k 为标准，计算平均重合比例"""
+    hits = [len(set(row) & set(ref)) / len(ref) for row, ref in zip(result_top_k, reference_top_k)]
+    return float(np.mean(hits))
+
+
+def source_hit_rate(result_top_k, source_indices):
+    """查询来源文本块出现在 top-k 中的比例"""
+    return float(np.mean([source in row for row, source in zip(result_top_k, source_indices)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较 PyTorch 与 ONNX int8 Embedding 后端的召回率与延迟")
+    parser.add_argument("--db", default="data/chroma", help="Chroma 向量库目录")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2", help="Embedding 模型路径或名称")
+    parser.add_argument("--bge", action="store_true", help="模型为 bge 系列（查询时添加检索指令）")
+    parser.add_argument("--sample", type=int, default=2000, help="抽样的文本块数量")
+    parser.add_argument("--queries", help="查询文件（每行一个问题），不指定时从语料生成")
+    parser.add_argument("--query-count", type=int, default=200, help="查询数量")
+    parser.add_argument("--k", type=int, default=4, help="检索条数（与 RETRIEVER_TOP_K 保持一致）")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.db, args.sample, args.seed)
+    if not corpus:
+        print(f"错误：向量库 {args.db} 中没有文本块，请先运行 build_knowledge_base.py")
+        return
+    queries, source_indices = build_queries(corpus, args.queries, args.query_count, args.seed)
+    print(f"语料 {len(corpus)} 个文本块，查询 {len(queries)} 条，k={args.k}")
+
+    query_instruction = BGE_QUERY_INSTRUCTION_ZH if args.bge else ""
+    results = [
+        run_backend("torch", load_torch_backend(args.model, args.bge), corpus, queries, args.k),
+        run_backend("onnx-int8", OnnxEmbeddings(args.model, query_instruction=query_instruction), corpus, queries, args.k),
+    ]
+
+    reference = results[0]["top_k"]
+    print(f"\n{'后端':<10}{'recall@k':>10}{'来源命中率':>12}{'查询p50(ms)':>14}{'查询p95(ms)':>14}{'编码(块/秒)':>14}")
+    for result in results:
+        hit_rate = source_hit_rate(result["top_k"], source_indices) if source_indices else float("nan")
+        print(
+            f"{result['name']:<10}"
+            f"{recall_at_k(result['top_k'], reference):>10.3f}"
+            f"{hit_rate:>12.3f}"
+            f"{result['p50_ms']:>14.1f}"
+            f"{result['p95_ms']:>14.1f}"
+            f"{result['docs_per_second']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
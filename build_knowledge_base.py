@@ -1,63 +1,393 @@
 # 引入所有我们需要的库
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_community.document_loaders import TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceBgeEmbeddings
 from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader
+from retrieval_utils import MANIFEST_NAME, BM25_INDEX_NAME, build_bm25_index, CLASS_COLLECTIONS_DIR, get_collection_path, save_bm25_index
+from embedding_utils import BGE_QUERY_INSTRUCTION_ZH, EMBEDDING_BACKEND, OnnxEmbeddings, use_onnx_backend
+import argparse
+import hashlib
+import json
 import os
+import time
 
 # --- 配置区 ---
-# PDF文件路径 (请替换为你自己的真实路径)
-# 提示：如果PDF文件和这个脚本在同一个文件夹，可以直接写文件名 "嵌入式Linux开发实践教程.pdf"
-PDF_PATH = "D:/eduagi/upload/d2l-zh.pdf"
+# 课程资料目录：目录下的所有 PDF/TXT/Markdown 文件都会被纳入知识库（支持子目录）
+SOURCE_DIR = os.getenv("KB_SOURCE_DIR", "D:/eduagi/upload")
 
 # Embedding 模型路径 (之后我们会下载模型到这个路径)
 # 推荐使用 BAAI/bge-large-zh-v1.5
-EMBEDDING_MODEL_PATH = "D:/bge-large-zh-v1.5"
+EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH", "D:/bge-large-zh-v1.5")
 
 # 向量数据库存储路径
-DB_PATH = "E:/chroma_db"
+DB_PATH = os.getenv("DB_PATH", "E:/chroma_db")
 
+# 每批写入向量库的文本块数量（每批完成后写一次检查点）
+EMBED_BATCH_SIZE = int(os.getenv("KB_EMBED_BATCH_SIZE", "256"))
 
-# --- 主程序 ---
-def create_vector_db():
+# 模型前向计算的批大小（CPU 上 32~128 之间吞吐最好，可按机器调整）
+ENCODE_BATCH_SIZE = int(os.getenv("KB_ENCODE_BATCH_SIZE", "64"))
+
+# Embedding 计算线程数，固定下来避免与解析进程争抢CPU
+EMBED_THREADS = int(os.getenv("KB_EMBED_THREADS", str(os.cpu_count() or 1)))
+
+# PDF 解析进程数与每个解析任务的页数
+PARSE_WORKERS = int(os.getenv("KB_PARSE_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_TASK = int(os.getenv("KB_PAGES_PER_TASK", "32"))
+
+# 支持的文件类型
+SUPPORTED_EXTENSIONS = {".pdf", ".txt", ".md"}
+
+
+# --- 入库清单（检查点） ---
+# 入库清单（MANIFEST_NAME）记录每个文档的内容哈希与已写入的文本块ID，用于增量更新与断点续传；
+# 其中的 version 字段在每次向量库变化时递增，检索缓存据此失效（见 retrieval_utils）
+def manifest_path(db_path):
+    return os.path.join(db_path, MANIFEST_NAME)
+
+
+def load_manifest(db_path):
+    """读取入库清单，不存在时返回空清单"""
+    try:
+        with open(manifest_path(db_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"documents": {}}
+
+
+def save_manifest(manifest, db_path):
+    """原子写入入库清单，避免中途崩溃留下半个文件；每次写入都代表向量库发生了变化，版本号递增"""
+    os.makedirs(db_path, exist_ok=True)
+    manifest["version"] = manifest.get("version", 0) + 1
+    tmp_path = manifest_path(db_path) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path(db_path))
+
+
+# --- 文档处理 ---
+def file_sha1(path):
+    """计算文件内容哈希，用于判断文档是否发生变化"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def discover_documents(source_dir, skip_class_dirs=False):
     """
-    函数：读取PDF，分割文本，创建并持久化向量数据库
+    列出资料目录下所有支持的文档（返回相对路径，作为文档的唯一标识）
+
+    :param skip_class_dirs: 同步公共知识库时跳过 classes/ 子目录（那里是各班级的独立资料）
     """
-    print("开始处理知识库文档...")
+    documents = []
+    for root, dirs, files in os.walk(source_dir):
+        if skip_class_dirs and os.path.abspath(root) == os.path.abspath(source_dir):
+            dirs[:] = [name for name in dirs if name != CLASS_COLLECTIONS_DIR]
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                full_path = os.path.join(root, name)
+                documents.append(os.path.relpath(full_path, source_dir).replace(os.sep, "/"))
+    return sorted(documents)
 
-    # 1. 加载PDF
-    if not os.path.exists(PDF_PATH):
-        print(f"错误：找不到PDF文件，请检查路径配置：{PDF_PATH}")
-        return
 
-    loader = PyPDFLoader(PDF_PATH)
-    documents = loader.load()
-    print(f"成功加载 {len(documents)} 页文档。")
+def _parse_pdf_pages(full_path, start, end):
+    """解析进程：提取 PDF 中 [start, end) 页的文本"""
+    reader = PdfReader(full_path)
+    return [(i, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def _load_text_document(full_path):
+    """解析进程：读取纯文本/Markdown 文档"""
+    return [(0, TextLoader(full_path, encoding="utf-8").load()[0].page_content)]
+
 
-    # 2. 文本分割
+def submit_document_parse(pool, full_path):
+    """
+    把文档解析任务提交到进程池，PDF 按页段拆成多个任务并行解析
+
+    :return: 解析任务列表，交给 collect_document_pages 汇总
+    """
+    if not full_path.lower().endswith(".pdf"):
+        return [pool.submit(_load_text_document, full_path)]
+
+    page_count = len(PdfReader(full_path).pages)
+    return [
+        pool.submit(_parse_pdf_pages, full_path, start, min(start + PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PAGES_PER_TASK)
+    ]
+
+
+def collect_document_pages(full_path, futures):
+    """按页码顺序汇总解析结果"""
+    pages = []
+    for future in futures:
+        for page_no, text in future.result():
+            pages.append(Document(page_content=text, metadata={"source": full_path, "page": page_no}))
+    return pages
+
+
+def split_document(doc_id, pages):
+    """
+    分割文档并为每个文本块计算内容哈希ID
+
+    :return: [(chunk_id, Document), ...]，同一文档内重复的文本块只保留一份
+    """
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    texts = text_splitter.split_documents(documents)
-    print(f"文档被分割成 {len(texts)} 个文本块。")
+    chunks = []
+    seen = set()
+    for chunk in text_splitter.split_documents(pages):
+        chunk_id = hashlib.sha1(f"{doc_id}\n{chunk.page_content}".encode("utf-8")).hexdigest()
+        if chunk_id in seen:
+            continue
+        seen.add(chunk_id)
+        chunk.metadata["source"] = doc_id
+        chunk.metadata["chunk_hash"] = chunk_id
+        chunks.append((chunk_id, chunk))
+    return chunks
+
+
+# --- 吞吐统计 ---
+class IngestStats:
+    """统计解析与嵌入的吞吐量（页/秒、文本块/秒、向量/秒）"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.pages = 0
+        self.chunks = 0
+        self.embeddings = 0
+        self.embed_seconds = 0.0
+
+    @staticmethod
+    def _rate(count, seconds):
+        return count / seconds if seconds > 0 else 0.0
 
-    # 3. 初始化并加载Embedding模型
+    def report(self, prefix="进度"):
+        elapsed = time.perf_counter() - self.started
+        print(
+            f"{prefix}：{self.pages} 页（{self._rate(self.pages, elapsed):.1f} 页/秒），"
+            f"{self.chunks} 个文本块（{self._rate(self.chunks, elapsed):.1f} 块/秒），"
+            f"{self.embeddings} 个向量（{self._rate(self.embeddings, self.embed_seconds):.1f} 向量/秒），"
+            f"总耗时 {elapsed:.1f} 秒"
+        )
+
+
+# --- 向量库操作 ---
+def load_vectordb(db_path):
+    """加载Embedding模型并打开（或创建）向量数据库"""
     print(f"正在加载Embedding模型，路径：{EMBEDDING_MODEL_PATH}")
     if not os.path.exists(EMBEDDING_MODEL_PATH):
         print(f"错误：找不到Embedding模型，请先下载模型并配置正确路径：{EMBEDDING_MODEL_PATH}")
         print("你可以从 Hugging Face 下载 'BAAI/bge-large-zh-v1.5'")
+        return None
+
+    if use_onnx_backend():
+        embedding_model = OnnxEmbeddings(
+            EMBEDDING_MODEL_PATH,
+            query_instruction=BGE_QUERY_INSTRUCTION_ZH,
+            batch_size=ENCODE_BATCH_SIZE,
+            num_threads=EMBED_THREADS,
+        )
+    else:
+        # 固定计算线程数，避免默认线程数与解析进程相互抢占
+        import torch
+        torch.set_num_threads(EMBED_THREADS)
+
+        embedding_model = HuggingFaceBgeEmbeddings(
+            model_name=EMBEDDING_MODEL_PATH,
+            model_kwargs={"device": "cpu"},
+            encode_kwargs={"batch_size": ENCODE_BATCH_SIZE, "normalize_embeddings": True},
+        )
+    print(f"Embedding模型加载成功（后端 {EMBEDDING_BACKEND}，线程数 {EMBED_THREADS}，批大小 {ENCODE_BATCH_SIZE}）。")
+    return Chroma(persist_directory=db_path, embedding_function=embedding_model)
+
+
+def existing_chunk_ids(vectordb, chunk_ids):
+    """查询哪些文本块ID已经在向量库中"""
+    existing = set()
+    for i in range(0, len(chunk_ids), 500):
+        result = vectordb.get(ids=chunk_ids[i:i + 500], include=[])
+        existing.update(result.get("ids", []))
+    return existing
+
+
+def delete_chunks(vectordb, chunk_ids):
+    """按ID分批删除文本块"""
+    for i in range(0, len(chunk_ids), 500):
+        vectordb.delete(ids=chunk_ids[i:i + 500])
+
+
+def ingest_document(vectordb, manifest, db_path, doc_id, pages, content_hash, stats):
+    """
+    增量写入单个文档：跳过已存在的文本块，分批写入并在每批之后保存检查点，
+    最后删除该文档旧版本中已不存在的文本块。
+    """
+    chunks = split_document(doc_id, pages)
+    chunk_ids = [chunk_id for chunk_id, _ in chunks]
+    stats.pages += len(pages)
+    stats.chunks += len(chunks)
+    print(f"[{doc_id}] 加载 {len(pages)} 页，分割为 {len(chunks)} 个文本块。")
+
+    entry = manifest["documents"].get(doc_id, {})
+    old_ids = set(entry.get("chunk_ids", []))
+
+    already = existing_chunk_ids(vectordb, chunk_ids)
+    pending = [(chunk_id, chunk) for chunk_id, chunk in chunks if chunk_id not in already]
+    print(f"[{doc_id}] 已存在 {len(already)} 个，需要写入 {len(pending)} 个文本块。")
+
+    # 记录进行中的状态：崩溃后重跑时，已写入的文本块会被跳过
+    manifest["documents"][doc_id] = {
+        "content_hash": content_hash,
+        "chunk_ids": sorted(old_ids | already),
+        "completed": False,
+    }
+    save_manifest(manifest, db_path)
+
+    for i in range(0, len(pending), EMBED_BATCH_SIZE):
+        batch = pending[i:i + EMBED_BATCH_SIZE]
+        batch_started = time.perf_counter()
+        vectordb.add_documents(
+            documents=[chunk for _, chunk in batch],
+            ids=[chunk_id for chunk_id, _ in batch],
+        )
+        stats.embed_seconds += time.perf_counter() - batch_started
+        stats.embeddings += len(batch)
+        manifest["documents"][doc_id]["chunk_ids"] = sorted(
+            set(manifest["documents"][doc_id]["chunk_ids"]) | {chunk_id for chunk_id, _ in batch}
+        )
+        save_manifest(manifest, db_path)
+        print(f"[{doc_id}] 已写入 {min(i + EMBED_BATCH_SIZE, len(pending))}/{len(pending)}")
+        stats.report()
+
+    # 文档被替换时，删除旧版本独有的文本块
+    stale_ids = sorted(old_ids - set(chunk_ids))
+    if stale_ids:
+        delete_chunks(vectordb, stale_ids)
+        print(f"[{doc_id}] 删除旧版本文本块 {len(stale_ids)} 个。")
+
+    manifest["documents"][doc_id] = {
+        "content_hash": content_hash,
+        "chunk_ids": sorted(chunk_ids),
+        "completed": True,
+    }
+    save_manifest(manifest, db_path)
+
+
+def rebuild_bm25_index(vectordb, manifest, db_path):
+    """
+    根据向量库中的全部文本块重建 BM25 倒排索引（jieba 分词），保存在向量库目录旁。
+    索引写完后再保存一次清单使版本号递增，让检索缓存不会混用新旧索引的结果。
+    """
+    started = time.perf_counter()
+    data = vectordb.get(include=["documents"])
+    index_data = build_bm25_index(data["ids"], data["documents"])
+    save_bm25_index(db_path, index_data)
+    save_manifest(manifest, db_path)
+    print(
+        f"BM25索引已更新：{len(index_data['ids'])} 个文本块，{len(index_data['postings'])} 个词项，"
+        f"耗时 {time.perf_counter() - started:.1f} 秒"
+    )
+
+
+def remove_document(vectordb, manifest, db_path, doc_id):
+    """从知识库中删除单个文档的全部文本块"""
+    entry = manifest["documents"].pop(doc_id, None)
+    if entry is None:
+        print(f"知识库中没有文档：{doc_id}")
+        return False
+    delete_chunks(vectordb, entry.get("chunk_ids", []))
+    save_manifest(manifest, db_path)
+    print(f"已删除文档 {doc_id} 的 {len(entry.get('chunk_ids', []))} 个文本块。")
+    return True
+
+
+# --- 主程序 ---
+def create_vector_db(prune=False, class_id=None, source_dir=None):
+    """
+    函数：增量同步资料目录到向量数据库
+
+    - 新文档：分割后分批写入
+    - 内容变化的文档：只写入新增文本块，并删除旧版本中已不存在的文本块
+    - 未变化且已完成的文档：直接跳过，不重新嵌入
+    - prune=True 时，删除资料目录中已不存在的文档
+    - 指定 class_id 时写入该班级的独立知识库，资料目录默认为 SOURCE_DIR/classes/<class_id>
+    """
+    db_path = get_collection_path(DB_PATH, class_id)
+    if source_dir is None:
+        source_dir = get_collection_path(SOURCE_DIR, class_id)
+    print(f"开始处理知识库文档（{'班级 ' + str(class_id) if class_id is not None else '公共知识库'}）...")
+
+    if not os.path.isdir(source_dir):
+        print(f"错误：找不到课程资料目录，请检查路径配置：{source_dir}")
+        return
+
+    doc_ids = discover_documents(source_dir, skip_class_dirs=class_id is None)
+    print(f"在 {source_dir} 中发现 {len(doc_ids)} 个文档。")
+
+    vectordb = load_vectordb(db_path)
+    if vectordb is None:
         return
 
-    embedding_model = HuggingFaceBgeEmbeddings(model_name=EMBEDDING_MODEL_PATH)
-    print("Embedding模型加载成功。")
+    manifest = load_manifest(db_path)
+    changed = []
+    for doc_id in doc_ids:
+        content_hash = file_sha1(os.path.join(source_dir, doc_id))
+        entry = manifest["documents"].get(doc_id)
+        if entry and entry.get("completed") and entry.get("content_hash") == content_hash:
+            print(f"[{doc_id}] 未变化，跳过。")
+            continue
+        changed.append((doc_id, content_hash))
+
+    # 所有待处理文档的解析任务一次性提交到进程池，
+    # 主进程按顺序嵌入已解析完的文档，解析与嵌入相互重叠
+    stats = IngestStats()
+    with ProcessPoolExecutor(max_workers=PARSE_WORKERS) as pool:
+        parse_jobs = [
+            (doc_id, content_hash, submit_document_parse(pool, os.path.join(source_dir, doc_id)))
+            for doc_id, content_hash in changed
+        ]
+        for doc_id, content_hash, futures in parse_jobs:
+            pages = collect_document_pages(os.path.join(source_dir, doc_id), futures)
+            ingest_document(vectordb, manifest, db_path, doc_id, pages, content_hash, stats)
+    stats.report(prefix="完成")
+
+    removed = []
+    if prune:
+        for doc_id in sorted(set(manifest["documents"]) - set(doc_ids)):
+            if remove_document(vectordb, manifest, db_path, doc_id):
+                removed.append(doc_id)
+
+    if changed or removed or not os.path.exists(os.path.join(db_path, BM25_INDEX_NAME)):
+        rebuild_bm25_index(vectordb, manifest, db_path)
 
-    # 4. 创建并持久化向量数据库
-    print("正在创建向量数据库...")
-    vectordb = Chroma.from_documents(documents=texts,
-                                     embedding=embedding_model,
-                                     persist_directory=DB_PATH)
-    vectordb.persist()
-    print(f"向量数据库创建成功，并已保存至：{DB_PATH}")
+    print(f"向量数据库同步完成，并已保存至：{db_path}")
+
+
+def delete_document(doc_id, class_id=None):
+    """删除单个文档（doc_id 为相对资料目录的路径）"""
+    db_path = get_collection_path(DB_PATH, class_id)
+    vectordb = load_vectordb(db_path)
+    if vectordb is None:
+        return
+    manifest = load_manifest(db_path)
+    if remove_document(vectordb, manifest, db_path, doc_id):
+        rebuild_bm25_index(vectordb, manifest, db_path)
 
 
 if __name__ == "__main__":
-    # 当直接运行这个脚本时，执行create_vector_db函数
-    create_vector_db()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="增量构建课程知识库")
+    parser.add_argument("--delete", metavar="DOC", help="删除指定文档（相对资料目录的路径）的全部文本块")
+    parser.add_argument("--prune", action="store_true", help="同步时删除资料目录中已不存在的文档")
+    parser.add_argument("--class-id", type=int, help="写入指定班级的独立知识库（不指定时为公共知识库）")
+    parser.add_argument("--source", help="资料目录（默认 KB_SOURCE_DIR，指定班级时为 KB_SOURCE_DIR/classes/<班级ID>）")
+    args = parser.parse_args()
+
+    if args.delete:
+        delete_document(args.delete, class_id=args.class_id)
+    else:
+        # 当直接运行这个脚本时，执行create_vector_db函数
+        create_vector_db(prune=args.prune, class_id=args.class_id, source_dir=args.source)
@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Float, inspect, text
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -152,6 +152,14 @@ class VideoResource(Base):
     path = Column(String, nullable=False)
     timestamp = Column(DateTime, default=datetime.now)
     status = Column(String, default="草稿")
+    # 视频元数据：创建时探测一次并由后台任务定期刷新，避免每次渲染都去探测视频
+    duration_seconds = Column(Float)
+    fps = Column(Float)
+    width = Column(Integer)
+    height = Column(Integer)
+    size_bytes = Column(Integer)
+    accessible = Column(Boolean)
+    meta_updated_at = Column(DateTime)
 
     # 添加唯一约束，确保每个学生对每个知识点只有一条记录
     __table_args__ = (
@@ -197,8 +205,29 @@ def init_db():
     if not os.path.exists('data'):
         os.makedirs('data')
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
     print("Database and tables created/verified successfully.")
 
+def add_missing_columns():
+    """Adds columns declared on the models but missing from existing tables.
+
+    `create_all` never alters existing tables, so new nullable columns are
+    added here with plain ALTER TABLE statements.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                print(f"Added column {table.name}.{column.name}")
+
 def get_db():
     """Generator function to get a database session."""
     db = SessionLocal()
@@ -9,7 +9,7 @@ import {
   SendOutlined, VideoCameraOutlined, BulbOutlined, NodeIndexOutlined,
   CheckCircleOutlined, ReloadOutlined
 } from '@ant-design/icons'
-import { studentAPI } from '../../services/api'
+import { studentAPI, batchAPI } from '../../services/api'
 import D3KnowledgeGraph from '../../components/D3KnowledgeGraph'
 import LearningAnalysis from '../../components/LearningAnalysis'
 import WordCloudChart from '../../components/WordCloudChart'
@@ -88,10 +88,11 @@ const StudentDashboardPage: React.FC = () => {
   const [videosLoading, setVideosLoading] = useState(false)
 
   // 数据获取函数
-  const fetchChatHistory = async () => {
+  // preloaded：批量请求已取到的数据，为空时单独请求
+  const fetchChatHistory = async (preloaded?: any[]) => {
     try {
-      const response = await studentAPI.getChatHistory()
-      const history = response.data.map((item: any) => [
+      const data = preloaded ?? (await studentAPI.getChatHistory()).data
+      const history = data.map((item: any) => [
         { role: 'user', content: item.question, timestamp: item.timestamp },
         { role: 'assistant', content: item.answer, timestamp: item.timestamp }
       ]).flat()
@@ -106,11 +107,10 @@ const StudentDashboardPage: React.FC = () => {
     }
   }
 
-  const fetchDisputes = async () => {
+  const fetchDisputes = async (preloaded?: any[]) => {
     setDisputesLoading(true)
     try {
-      const response = await studentAPI.getMyDisputes()
-      setDisputes(response.data)
+      setDisputes(preloaded ?? (await studentAPI.getMyDisputes()).data)
     } catch (error) {
       console.warn('API不可用，使用模拟数据:', error)
       // 使用模拟疑问数据
@@ -136,11 +136,10 @@ const StudentDashboardPage: React.FC = () => {
     }
   }
 
-  const fetchKnowledgeMastery = async () => {
+  const fetchKnowledgeMastery = async (preloaded?: any[]) => {
     setMasteryLoading(true)
     try {
-      const response = await studentAPI.getKnowledgeMastery()
-      setKnowledgeMastery(response.data)
+      setKnowledgeMastery(preloaded ?? (await studentAPI.getKnowledgeMastery()).data)
     } catch (error) {
       console.warn('API不可用，使用模拟数据:', error)
       // 使用模拟知识掌握数据
@@ -176,11 +175,10 @@ const StudentDashboardPage: React.FC = () => {
     }
   }
 
-  const fetchVideos = async () => {
+  const fetchVideos = async (preloaded?: any[]) => {
     setVideosLoading(true)
     try {
-      const response = await studentAPI.getAvailableVideos()
-      setVideos(response.data)
+      setVideos(preloaded ?? (await studentAPI.getAvailableVideos()).data)
     } catch (error) {
       console.warn('API不可用，使用模拟数据:', error)
       // 使用模拟视频数据
@@ -216,12 +214,42 @@ const StudentDashboardPage: React.FC = () => {
     }
   }
 
-  // 组件挂载时获取数据
+  // 组件挂载时通过一次批量请求获取数据；某个子请求失败时该部分单独重试（并沿用模拟数据兜底）
+  const loadDashboard = async () => {
+    const loaders: Record<string, (preloaded?: any[]) => Promise<void>> = {
+      chatHistory: fetchChatHistory,
+      disputes: fetchDisputes,
+      knowledgeMastery: fetchKnowledgeMastery,
+      videos: fetchVideos,
+    }
+    // 批量请求期间各面板先显示加载状态（各 fetch 函数结束时会复位）
+    setDisputesLoading(true)
+    setMasteryLoading(true)
+    setVideosLoading(true)
+    let results: Record<string, any> = {}
+    try {
+      const response = await batchAPI.get([
+        { id: 'chatHistory', path: '/student/chat/history', params: { limit: 50 } },
+        { id: 'disputes', path: '/student/disputes' },
+        { id: 'knowledgeMastery', path: '/student/knowledge-mastery' },
+        { id: 'videos', path: '/student/videos' },
+      ])
+      results = Object.fromEntries(
+        response.data.responses.map((item: any) => [item.id, item])
+      )
+    } catch (error) {
+      console.warn('批量请求不可用，改为逐个请求:', error)
+    }
+    Object.entries(loaders).forEach(([id, load]) => {
+      const result = results[id]
+      // 批量结果只含第一页；还有下一页时改为单独请求以取完整列表
+      const complete = result?.status === 200 && !result.headers?.['x-next-cursor']
+      load(complete ? result.body : undefined)
+    })
+  }
+
   useEffect(() => {
-    fetchChatHistory()
-    fetchDisputes()
-    fetchKnowledgeMastery()
-    fetchVideos()
+    loadDashboard()
   }, [])
 
   // AI聊天功能
@@ -9,6 +9,7 @@ import {
   EyeOutlined, DeleteOutlined, EditOutlined
 } from '@ant-design/icons'
 import axios from 'axios'
+import { teacherAPI } from '../../services/api'
 
 const { Title, Text, Paragraph } = Typography
 const { TextArea } = Input
@@ -77,7 +78,7 @@ const TeacherDashboardPage: React.FC = () => {
   const fetchTeachingPlans = async () => {
     setPlansLoading(true)
     try {
-      const response = await axios.get('/api/teacher/teaching-plans')
+      const response = await teacherAPI.getTeachingPlans()
       setTeachingPlans(response.data)
     } catch (error) {
       message.error('获取教学计划失败')
@@ -89,7 +90,7 @@ const TeacherDashboardPage: React.FC = () => {
   const fetchMindMaps = async () => {
     setMindMapsLoading(true)
     try {
-      const response = await axios.get('/api/teacher/mindmaps')
+      const response = await teacherAPI.getMindMaps()
       setMindMaps(response.data)
     } catch (error) {
       message.error('获取思维导图失败')
@@ -101,7 +102,7 @@ const TeacherDashboardPage: React.FC = () => {
   const fetchVideos = async () => {
     setVideosLoading(true)
     try {
-      const response = await axios.get('/api/teacher/videos')
+      const response = await teacherAPI.getVideos()
       setVideos(response.data)
     } catch (error) {
       message.error('获取视频资源失败')
@@ -113,7 +114,7 @@ const TeacherDashboardPage: React.FC = () => {
   const fetchDisputes = async () => {
     setDisputesLoading(true)
     try {
-      const response = await axios.get('/api/teacher/disputes')
+      const response = await teacherAPI.getStudentDisputes()
       setDisputes(response.data)
     } catch (error) {
       message.error('获取学生疑问失败')
@@ -36,6 +36,21 @@ api.interceptors.response.use(
   }
 )
 
+// 列表接口为游标分页（每页最多 200 条，下一页游标在 X-Next-Cursor 响应头中）
+// 需要完整列表的调用方用 getAllPages 依次取完所有页，返回值与 api.get 相同，data 为合并后的数组
+export const getAllPages = async (url: string, params?: Record<string, any>) => {
+  const pageParams = { limit: 200, ...params }
+  let response = await api.get(url, { params: pageParams })
+  const rows = [...response.data]
+  let cursor = response.headers['x-next-cursor']
+  while (cursor) {
+    response = await api.get(url, { params: { ...pageParams, cursor } })
+    rows.push(...response.data)
+    cursor = response.headers['x-next-cursor']
+  }
+  return { ...response, data: rows }
+}
+
 // 认证相关API
 export const authAPI = {
   login: (account_id: string, password: string) =>
@@ -49,7 +64,7 @@ export const authAPI = {
 export const teacherAPI = {
   // 智能教学设计
   createTeachingPlan: (data: any) => api.post('/teacher/teaching-plans', data),
-  getTeachingPlans: () => api.get('/teacher/teaching-plans'),
+  getTeachingPlans: () => getAllPages('/teacher/teaching-plans'),
   getTeachingPlan: (id: number) => api.get(`/teacher/teaching-plans/${id}`),
   exportTeachingPlan: (id: number) =>
     api.get(`/teacher/teaching-plans/${id}/export`, { responseType: 'blob' }),
@@ -59,19 +74,19 @@ export const teacherAPI = {
 
   // AI知识图谱
   createMindMap: (data: any) => api.post('/teacher/mindmaps', data),
-  getMindMaps: () => api.get('/teacher/mindmaps'),
+  getMindMaps: () => getAllPages('/teacher/mindmaps'),
 
   // 智能出题
   generateExam: (data: any) => api.post('/teacher/generate-exam', data),
 
   // 学生疑问处理
-  getStudentDisputes: () => api.get('/teacher/disputes'),
+  getStudentDisputes: () => getAllPages('/teacher/disputes'),
   replyToDispute: (disputeId: number, reply: string) =>
     api.post(`/teacher/disputes/${disputeId}/reply`, { reply }),
 
   // 视频管理
   createVideo: (data: any) => api.post('/teacher/videos', data),
-  getVideos: () => api.get('/teacher/videos'),
+  getVideos: () => getAllPages('/teacher/videos'),
   analyzeVideo: (videoId: number) => api.post(`/teacher/videos/${videoId}/analyze`),
 }
 
@@ -93,7 +108,7 @@ export const studentAPI = {
   // 向老师提问
   createDispute: (message: string) =>
     api.post('/student/disputes', { message }),
-  getMyDisputes: () => api.get('/student/disputes'),
+  getMyDisputes: () => getAllPages('/student/disputes'),
 
   // 知识掌握评估
   createKnowledgeMastery: (data: any) =>
@@ -101,10 +116,21 @@ export const studentAPI = {
   getKnowledgeMastery: () => api.get('/student/knowledge-mastery'),
 
   // 视频学习
-  getAvailableVideos: () => api.get('/student/videos'),
+  getAvailableVideos: () => getAllPages('/student/videos'),
   getVideoDetail: (videoId: number) => api.get(`/student/videos/${videoId}`),
 }
 
+// 批量请求API：一次往返获取多个只读接口，返回 { responses: [{ id, status, headers, body }] }
+export interface BatchSubRequest {
+  id: string
+  path: string
+  params?: Record<string, any>
+}
+
+export const batchAPI = {
+  get: (requests: BatchSubRequest[]) => api.post('/batch', { requests }),
+}
+
 // 管理员端API
 export const adminAPI = {
   // 数据分析
@@ -127,7 +153,7 @@ const mockUsers = [
 export const userAPI = {
   getUsers: async (params?: any) => {
     try {
-      return await api.get('/users', { params })
+      return await getAllPages('/users', params)
     } catch (error) {
       console.warn('用户API不可用，使用模拟数据:', error)
       return { data: mockUsers }
@@ -303,7 +329,7 @@ export const videoAPI = {
   },
   getAnalysisHistory: async (params?: any) => {
     try {
-      return await api.get('/videos/history', { params })
+      return await getAllPages('/videos/history', params)
     } catch (error) {
       console.warn('视频API不可用，使用模拟数据:', error)
       return { data: mockVideos }
@@ -334,7 +360,7 @@ export const videoAPI = {
 
 // 考试管理API
 export const examAPI = {
-  getExams: (params?: any) => api.get('/api/exams', { params }),
+  getExams: (params?: any) => getAllPages('/api/exams', params),
   getExam: (id: number) => api.get(`/api/exams/${id}`),
   createExam: (data: any) => api.post('/api/exams', data),
   updateExam: (id: number, data: any) => api.put(`/api/exams/${id}`, data),
@@ -343,7 +369,7 @@ export const examAPI = {
 
 // 笔记管理API
 export const noteAPI = {
-  getNotes: (params?: any) => api.get('/api/notes', { params }),
+  getNotes: (params?: any) => getAllPages('/api/notes', params),
   getNote: (id: number) => api.get(`/api/notes/${id}`),
   createNote: (data: any) => api.post('/api/notes', data),
   updateNote: (id: number, data: any) => api.put(`/api/notes/${id}`, data),
@@ -405,7 +431,7 @@ export const manageAPI = {
 // 旧版API（保留兼容性）
 export const teacherAPILegacy = {
   // 教学计划
-  getTeachingPlans: () => api.get('/api/teacher/teaching-plans'),
+  getTeachingPlans: () => getAllPages('/api/teacher/teaching-plans'),
   createTeachingPlan: (data: any) => api.post('/api/teacher/teaching-plans', data),
   getTeachingPlan: (id: number) => api.get(`/api/teacher/teaching-plans/${id}`),
   updateTeachingPlan: (id: number, data: any) => api.put(`/api/teacher/teaching-plans/${id}`, data),
@@ -419,7 +445,7 @@ export const teacherAPILegacy = {
   deleteExam: (id: number) => api.delete(`/api/teacher/exams/${id}`),
   
   // 思维导图
-  getMindMaps: () => api.get('/api/teacher/mindmaps'),
+  getMindMaps: () => getAllPages('/api/teacher/mindmaps'),
   createMindMap: (data: any) => api.post('/api/teacher/mindmaps', data),
   getMindMap: (id: number) => api.get(`/api/teacher/mindmaps/${id}`),
   updateMindMap: (id: number, data: any) => api.put(`/api/teacher/mindmaps/${id}`, data),
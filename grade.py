@@ -218,7 +218,7 @@ def grade_exam(questions, user_answers, qa_chain):
 请直接返回JSON数组：
         """
         try:
-            response = qa_chain.invoke({"question": prompt})
+            response = qa_chain.invoke({"question": prompt, "chat_history": []})
             result_text = response.get('answer', '').strip()
 
             # 使用强化版JSON数组解析
@@ -5,14 +5,14 @@ import re
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime
-from utils import load_conversational_chain
+from utils import get_session_class_id, load_conversational_chain
 from database import SessionLocal, Exam, ExamQuestion, Submission, SubmissionAnswer,StudentDispute, User
 from grade import grade_exam
 
 
 def render():
     """渲染包含正确批改逻辑的学生在线考试页面"""
-    qa_chain = load_conversational_chain()
+    qa_chain = load_conversational_chain(class_id=get_session_class_id())
     st.title("✍️ 我的考试与成绩分析")
 
     tab_new_exam, tab_history = st.tabs(["**开始新考试**", "**历史成绩与分析**"])
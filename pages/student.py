@@ -2,14 +2,14 @@
 import streamlit as st
 import json
 import re
-from utils import load_conversational_chain
+from utils import get_session_class_id, get_session_memory, load_conversational_chain
 from database import SessionLocal, ChatHistory, KnowledgePoint, StudentDispute, User, Class, KnowledgeMastery
 from datetime import datetime
 
 
 def render():
     """渲染最终版的、包含两大对话模块的学生学习页面"""
-    qa_chain = load_conversational_chain()
+    qa_chain = load_conversational_chain(class_id=get_session_class_id())
     st.title("👨‍🎓 AI智能学习伙伴")
 
     # --- 使用Tabs来分离两种不同的对话体验 ---
@@ -37,8 +37,9 @@ def render():
                     # 1. 清空数据库
                     db.query(ChatHistory).filter(ChatHistory.student_id == student_id).delete()
                     db.commit()
-                    # --- 核心修复：同时清空当前会话的显示列表 ---
+                    # --- 核心修复：同时清空当前会话的显示列表与对话记忆 ---
                     st.session_state.chat_messages = []
+                    get_session_memory().clear()
                     st.success("对话历史已清空！")
                     st.rerun()  # 刷新页面
                 finally:
@@ -88,16 +89,20 @@ def render():
             # 调用带记忆的AI链
             with st.chat_message("assistant"):
                 with st.spinner("AI导师正在思考..."):
-                    conversation_chain = load_conversational_chain()
+                    conversation_chain = load_conversational_chain(class_id=get_session_class_id())
 
                     # 1. 准备历史记录 (供AI“记忆”使用)
-                    chat_history_for_chain = []
-                    for msg in st.session_state.chat_messages[-10:-1]:  # 取最近5轮对话作为记忆
-                        if msg["role"] == "user":
-                            chat_history_for_chain.append((msg["content"], ""))
-                        elif msg["role"] == "assistant" and chat_history_for_chain:
-                            question, _ = chat_history_for_chain[-1]
-                            chat_history_for_chain[-1] = (question, msg["content"])
+                    # 会话记忆按 token 预算保留最近几轮并滚动摘要更早的对话；
+                    # 本会话首次提问时，用页面上已加载的历史记录初始化记忆
+                    if conversation_chain.memory.is_empty():
+                        chat_history_for_chain = []
+                        for msg in st.session_state.chat_messages[:-1]:
+                            if msg["role"] == "user":
+                                chat_history_for_chain.append((msg["content"], ""))
+                            elif msg["role"] == "assistant" and chat_history_for_chain:
+                                question, _ = chat_history_for_chain[-1]
+                                chat_history_for_chain[-1] = (question, msg["content"])
+                        conversation_chain.memory.load_turns(chat_history_for_chain)
 
                     # 2. 根据用户选择的“模式”，构造当前问题的Prompt
                     mode_prompts = {
@@ -107,11 +112,12 @@ def render():
                     }
                     final_question_for_chain = mode_prompts.get(st.session_state.ai_mode, prompt)
 
-                    # 3. 调用AI，同时传入“新问题”和“旧历史”
-                    response = conversation_chain.invoke({
-                        "question": final_question_for_chain,
-                        "chat_history": chat_history_for_chain
-                    })
+                    # 3. 调用AI，历史由会话记忆提供，本轮问答会自动记入记忆；
+                    #    用原始问题判断是否为独立问题，独立问题直接检索，不再先让AI改写问题
+                    response = conversation_chain.invoke(
+                        {"question": final_question_for_chain},
+                        raw_question=prompt,
+                    )
                     ai_message = response['answer']
 
                     st.markdown(ai_message)
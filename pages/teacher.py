@@ -8,8 +8,9 @@ from streamlit_echarts import st_echarts
 from io import BytesIO
 from docx import Document
 # --- The fix is here: import the alignment enum ---/
-from utils import load_conversational_chain
+from utils import get_session_class_id, load_conversational_chain
 from database import SessionLocal, TeachingPlan, Exam, ExamQuestion, StudentDispute, User, Class, MindMap,VideoResource
+from video_utils import prerender_video_thumbnail, schedule_video_metadata_probe
 try:
     from uil.file_utils import upload_to_qiniu
 except ImportError as e:
@@ -365,7 +366,7 @@ def write_content_to_docx(document, content, level=0):
 
 def render():
     """渲染教师工作台页面的所有UI和逻辑"""
-    qa_chain = load_conversational_chain()
+    qa_chain = load_conversational_chain(class_id=get_session_class_id())
 
     st.title("👨‍🏫 教师工作台")
 
@@ -420,7 +421,7 @@ def render():
             q           -重点内容：加粗
                     """
 
-                    response = qa_chain.invoke({"question": prompt_template})
+                    response = qa_chain.invoke({"question": prompt_template, "chat_history": []})
                     result_text = response.get('answer', '').strip()
 
                     # 使用强化版JSON解析
@@ -565,7 +566,7 @@ def render():
                             您是JSON格式专家，请为主题 “{topic_input_mindmap}” 创建一个符合ECharts树图的、语法完全正确的JSON。
                             规则：根节点必须有 'name' 键，子节点在 'children' 数组中。请创建一个层次丰富的知识图谱，至少包含3-4层节点。回复中只能包含纯JSON。
                             """
-                            response = qa_chain.invoke({"question": prompt_template_json})
+                            response = qa_chain.invoke({"question": prompt_template_json, "chat_history": []})
                             # ConversationalRetrievalChain 返回的是 'answer' 而不是 'result'
                             result_text = response.get('answer', '').strip()
 
@@ -990,7 +991,7 @@ def render():
                         prompt_template_md = f"""
                         您是知识结构专家，请为主题 “{topic_input_markdown}” 生成一份层级清晰的Markdown文本。
                         """
-                        response = qa_chain.invoke({"question": prompt_template_md})
+                        response = qa_chain.invoke({"question": prompt_template_md, "chat_history": []})
                         st.session_state.markdown_text = response.get('answer', '')
                         st.success("Markdown大纲已生成！")
                     except Exception as e:
@@ -1065,7 +1066,7 @@ def render():
 
 请严格按照上述JSON格式生成{num_mcq + num_saq + num_code}道题目，直接返回JSON，不要包含其他内容。
                         """
-                        response = qa_chain.invoke({"question": prompt_template})
+                        response = qa_chain.invoke({"question": prompt_template, "chat_history": []})
                         result_text = response.get('answer', '').strip()
 
                         # 使用强化版JSON解析
@@ -1400,6 +1401,8 @@ def render():
                                             )
                                             db.add(new_video)
                                             db.commit()
+                                            prerender_video_thumbnail(new_video.path, new_video.title)
+                                            schedule_video_metadata_probe(new_video.id)
 
                                             progress_bar.progress(100)
                                             progress_text.text("🎉 完成！")
@@ -1583,6 +1586,8 @@ def render():
                                 )
                                 db.add(new_video)
                                 db.commit()
+                                prerender_video_thumbnail(new_video.path, new_video.title)
+                                schedule_video_metadata_probe(new_video.id)
                                 st.success(f"✅ 视频链接 '{video_title_link}' 添加成功！")
                                 st.balloons()
                             except Exception as e:
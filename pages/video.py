@@ -3,19 +3,21 @@ import streamlit as st
 from database import SessionLocal, VideoResource, User
 from utilstongyi import analyze_video_with_tongyi, analyze_video_with_tongyi_stream
 from video_utils import (
-    get_random_video_thumbnail,
-    get_video_thumbnail_from_url,
+    get_cached_thumbnail,
     create_default_thumbnail,
-    get_video_info_simple,
-    image_to_base64
+    format_video_info,
+    schedule_video_metadata_probe,
+    start_video_metadata_refresher
 )
-import validators
 import random
 
 
 def render():
+    # 后台定期刷新缺失或过期的视频元数据（每个进程只启动一次）
+    start_video_metadata_refresher()
+
     st.title("🎬 视频学习中心")
-    st.info("🎯 点击视频封面，即可展开播放器进行学习。AI随机生成封面，每次刷新都有惊喜！")
+    st.info("🎯 点击视频封面，即可展开播放器进行学习。")
     st.markdown("---")
 
     # 创建标签页
@@ -48,7 +50,7 @@ def render_video_wall():
             help="选择每行显示的视频数量"
         )
     with col_refresh:
-        if st.button("🔄 刷新封面", help="重新生成随机封面"):
+        if st.button("🔄 刷新", help="重新加载视频列表"):
             st.rerun()
 
     db = SessionLocal()
@@ -86,24 +88,14 @@ def render_video_wall():
 def render_video_card(video, teacher_name, unique_key):
     """渲染单个视频卡片"""
     with st.container(border=True):
-        # --- 生成并显示封面 ---
-        thumbnail = None
-        is_url = validators.url(video.path)
-
-        # 尝试生成缩略图
-        if not is_url:  # 本地文件
-            thumbnail = get_random_video_thumbnail(video.path)
-        else:  # URL链接
-            # 对于URL，可以尝试获取缩略图（可能失败）
-            thumbnail = get_video_thumbnail_from_url(video.path)
+        # --- 显示封面（读取缩略图缓存，未命中时仅生成一次） ---
+        thumbnail = get_cached_thumbnail(video.path, video.title)
 
         # 如果没有成功生成缩略图，使用默认封面
         if thumbnail is None:
             thumbnail = create_default_thumbnail(video.title)
 
-        # 显示缩略图
-        if thumbnail:
-            st.image(thumbnail, use_container_width=True)
+        st.image(thumbnail, use_container_width=True)
 
         # --- 视频信息 ---
         st.markdown(f"**🎬 {video.title}**")
@@ -133,8 +125,10 @@ def render_video_card(video, teacher_name, unique_key):
                     st.error(f"❌ 视频加载失败: {e}")
                     st.info(f"🔗 视频链接: {video.path}")
 
-                # 视频信息
-                video_info = get_video_info_simple(video.path)
+                # 视频信息（读取创建时探测并缓存在记录上的元数据）
+                if video.meta_updated_at is None:
+                    schedule_video_metadata_probe(video.id)
+                video_info = format_video_info(video)
                 if video_info["accessible"]:
                     info_cols = st.columns(4)
                     with info_cols[0]:
@@ -197,6 +191,10 @@ def render_video_list():
             VideoResource.id, VideoResource.title,
             VideoResource.description, VideoResource.path,
             VideoResource.timestamp, VideoResource.status,
+            VideoResource.duration_seconds, VideoResource.fps,
+            VideoResource.width, VideoResource.height,
+            VideoResource.size_bytes, VideoResource.accessible,
+            VideoResource.meta_updated_at,
             User.display_name
         ).join(User, User.id == VideoResource.teacher_id).filter(
             VideoResource.status == "已发布"
@@ -258,13 +256,11 @@ def render_video_list():
 
                 with col_info_btn:
                     if st.button("ℹ️ 视频信息", key=f"list_video_info_{video.id}"):
-                        with st.spinner("🔍 获取视频信息..."):
-                            try:
-                                video_info = get_video_info_simple(video.path)
-                                with st.expander("📊 视频详细信息", expanded=True):
-                                    st.json(video_info)
-                            except Exception as e:
-                                st.error(f"❌ 获取视频信息失败: {e}")
+                        if video.meta_updated_at is None:
+                            schedule_video_metadata_probe(video.id)
+                            st.info("🔍 视频信息正在后台获取，请稍后刷新查看")
+                        with st.expander("📊 视频详细信息", expanded=True):
+                            st.json(format_video_info(video))
 
                 st.markdown("---")
     finally:
@@ -0,0 +1,321 @@
+"""检索工具
+
+为 RAG 对话链提供进程级缓存：
+- 查询向量缓存：按规范化后的问题文本缓存 embed_query 结果（LRU）
+- 检索结果缓存：按 (知识库, 知识库版本, 问题哈希, k) 缓存相似度检索结果（LRU）
+
+知识库版本由 build_knowledge_base.py 写入的入库清单维护，每次入库/删除文档都会递增，
+版本变化时两个缓存会自动清空，保证重新入库后不会返回旧结果。
+
+另外提供混合检索：入库脚本在向量库旁生成 jieba 分词的 BM25 倒排索引，
+检索时把向量检索与 BM25 的排名用倒数排名融合（RRF）合并，专有名词和 API 名称更容易命中。
+
+环境变量：
+- QUERY_EMBEDDING_CACHE_SIZE: 查询向量缓存条数（默认 1024）
+- RETRIEVAL_CACHE_SIZE: 检索结果缓存条数（默认 512）
+- RETRIEVER_MODE: hybrid（默认，索引不存在时退回纯向量检索）或 dense
+- HYBRID_CANDIDATES: 每路检索参与融合的候选数（默认 20）
+- RRF_K: 倒数排名融合常数（默认 60）
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, List
+
+import jieba
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "512"))
+
+RETRIEVER_MODE = os.getenv("RETRIEVER_MODE", "hybrid").strip().lower() or "hybrid"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# 入库清单与 BM25 索引文件名（位于向量库目录下，由 build_knowledge_base.py 维护）
+MANIFEST_NAME = "ingest_manifest.json"
+BM25_INDEX_NAME = "bm25_index.json"
+
+# 班级独立知识库所在的子目录：<DB_PATH>/classes/<class_id>
+CLASS_COLLECTIONS_DIR = "classes"
+
+# BM25 参数
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+class LRUCache:
+    """线程安全的 LRU 缓存（Streamlit 会在多个线程中同时处理会话）"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_query_embedding_cache = LRUCache(QUERY_EMBEDDING_CACHE_SIZE)
+_retrieval_cache = LRUCache(RETRIEVAL_CACHE_SIZE)
+
+# 知识库目录 -> (清单修改时间, 版本号)
+_collection_versions = {}
+_version_lock = threading.Lock()
+
+# 知识库目录 -> (索引修改时间, BM25Index)
+_bm25_indexes = {}
+_bm25_lock = threading.Lock()
+
+# 至少包含一个中文字符、字母或数字的词才进入索引（过滤标点与空白）
+_TOKEN_PATTERN = re.compile(r"[0-9a-z\u4e00-\u9fff]")
+
+
+def normalize_query(text):
+    """规范化问题文本：全半角统一、大小写统一、合并空白"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def query_hash(text):
+    return hashlib.sha1(normalize_query(text).encode("utf-8")).hexdigest()
+
+
+def get_collection_path(root, class_id=None):
+    """班级知识库（或资料）目录；class_id 为空时即公共知识库根目录"""
+    if class_id is None:
+        return str(root)
+    return os.path.join(str(root), CLASS_COLLECTIONS_DIR, str(class_id))
+
+
+def resolve_collection_path(root, class_id=None):
+    """
+    按班级路由知识库：班级已建立独立知识库时只检索该班级的资料，
+    否则退回公共知识库
+    """
+    if class_id is not None:
+        class_path = get_collection_path(root, class_id)
+        if os.path.exists(os.path.join(class_path, MANIFEST_NAME)):
+            return class_path
+    return str(root)
+
+
+def clear_retrieval_caches():
+    """清空查询向量缓存与检索结果缓存"""
+    _query_embedding_cache.clear()
+    _retrieval_cache.clear()
+
+
+def get_collection_version(db_path):
+    """
+    读取知识库版本号；只有清单文件修改时间变化时才重新读取文件。
+    发现版本变化（重新入库）时自动清空缓存。
+    """
+    manifest_file = os.path.join(str(db_path), MANIFEST_NAME)
+    try:
+        mtime = os.stat(manifest_file).st_mtime_ns
+    except OSError:
+        mtime = None
+
+    with _version_lock:
+        cached = _collection_versions.get(str(db_path))
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        version = 0
+        if mtime is not None:
+            try:
+                with open(manifest_file, "r", encoding="utf-8") as f:
+                    version = json.load(f).get("version", 0)
+            except (OSError, ValueError):
+                version = cached[1] if cached else 0
+
+        if cached is not None and cached[1] != version:
+            clear_retrieval_caches()
+        _collection_versions[str(db_path)] = (mtime, version)
+        return version
+
+
+# --- BM25 倒排索引 ---
+def tokenize_for_bm25(text):
+    """jieba 搜索引擎模式分词，入库与查询使用同一套规则"""
+    return [token for token in jieba.lcut_for_search(normalize_query(text)) if _TOKEN_PATTERN.search(token)]
+
+
+def build_bm25_index(chunk_ids, texts):
+    """
+    构建倒排索引
+
+    :return: {"ids": [...], "doc_lens": [...], "postings": {词: [文档下标, 词频, 文档下标, 词频, ...]}}
+    """
+    postings = {}
+    doc_lens = []
+    for position, text in enumerate(texts):
+        counts = Counter(tokenize_for_bm25(text))
+        doc_lens.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings.setdefault(term, []).extend((position, tf))
+    return {"ids": list(chunk_ids), "doc_lens": doc_lens, "postings": postings}
+
+
+def save_bm25_index(db_path, index_data):
+    """原子写入 BM25 索引"""
+    index_file = os.path.join(str(db_path), BM25_INDEX_NAME)
+    tmp_path = index_file + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index_data, f, ensure_ascii=False)
+    os.replace(tmp_path, index_file)
+
+
+class BM25Index:
+    """内存中的 BM25 索引，构造时预先计算 idf"""
+
+    def __init__(self, index_data):
+        self.ids = index_data["ids"]
+        self.doc_lens = index_data["doc_lens"]
+        self.postings = index_data["postings"]
+        total = len(self.ids)
+        self.avgdl = (sum(self.doc_lens) / total) if total else 0.0
+        self.idf = {
+            term: math.log(1 + (total - len(posting) / 2 + 0.5) / (len(posting) / 2 + 0.5))
+            for term, posting in self.postings.items()
+        }
+
+    def search(self, query, k):
+        """返回 [(chunk_id, score), ...]，按分数降序"""
+        scores = {}
+        for term in set(tokenize_for_bm25(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf[term]
+            for i in range(0, len(posting), 2):
+                position, tf = posting[i], posting[i + 1]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lens[position] / self.avgdl)
+                scores[position] = scores.get(position, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.ids[position], score) for position, score in ranked]
+
+
+def load_bm25_index(db_path):
+    """加载 BM25 索引（按文件修改时间缓存），不存在时返回 None"""
+    index_file = os.path.join(str(db_path), BM25_INDEX_NAME)
+    try:
+        mtime = os.stat(index_file).st_mtime_ns
+    except OSError:
+        return None
+
+    with _bm25_lock:
+        cached = _bm25_indexes.get(str(db_path))
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(index_file, "r", encoding="utf-8") as f:
+                index = BM25Index(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return cached[1] if cached else None
+        _bm25_indexes[str(db_path)] = (mtime, index)
+        return index
+
+
+def _chunk_key(document):
+    """文本块的唯一标识：优先使用入库时写入的内容哈希（即向量库中的ID）"""
+    return document.metadata.get("chunk_hash") or getattr(document, "id", None) or document.page_content
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """为 embed_query 加上 LRU 缓存的 Embeddings 包装，embed_documents 直接透传"""
+
+    def __init__(self, embeddings, model_name):
+        self.embeddings = embeddings
+        self.model_name = model_name
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        key = (self.model_name, normalize_query(text))
+        vector = _query_embedding_cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            _query_embedding_cache.put(key, vector)
+        return vector
+
+
+class CachedRetriever(BaseRetriever):
+    """带结果缓存的检索器，缓存键为 (知识库, 版本, 检索模式, 问题哈希, k)"""
+
+    vectorstore: Any
+    db_path: str
+    k: int = 4
+    mode: str = RETRIEVER_MODE
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        key = (self.db_path, get_collection_version(self.db_path), self.mode, query_hash(query), self.k)
+        documents = _retrieval_cache.get(key)
+        if documents is None:
+            if self.mode == "hybrid":
+                documents = self._hybrid_search(query)
+            else:
+                documents = self.vectorstore.similarity_search(query, k=self.k)
+            _retrieval_cache.put(key, documents)
+        return list(documents)
+
+    def _hybrid_search(self, query):
+        """向量检索与 BM25 各取候选，按倒数排名融合后取前 k 个"""
+        candidates = max(self.k, HYBRID_CANDIDATES)
+        dense = self.vectorstore.similarity_search(query, k=candidates)
+        index = load_bm25_index(self.db_path)
+        if index is None:
+            return dense[:self.k]
+
+        scores = {}
+        documents = {}
+        for rank, document in enumerate(dense):
+            key = _chunk_key(document)
+            documents[key] = document
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+        for rank, (chunk_id, _) in enumerate(index.search(query, candidates)):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+
+        top_keys = sorted(scores, key=scores.get, reverse=True)[:self.k]
+
+        # 只由 BM25 命中的文本块需要从向量库按ID取回内容
+        missing = [key for key in top_keys if key not in documents]
+        if missing:
+            fetched = self.vectorstore.get(ids=missing, include=["documents", "metadatas"])
+            for chunk_id, text, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"]):
+                documents[chunk_id] = Document(page_content=text, metadata=metadata or {})
+        return [documents[key] for key in top_keys if key in documents]
@@ -140,6 +140,7 @@ def login_page():
                                 st.session_state["account_id"] = user.account_id
                                 st.session_state["display_name"] = user.display_name  # 存储显示名称
                                 st.session_state["user_role"] = user.role
+                                st.session_state["class_id"] = user.class_id  # 用于按班级路由知识库
 
                                 # ... (设置默认页面的逻辑不变) ...
                                 st.rerun()
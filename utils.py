@@ -2,48 +2,235 @@
 
 提供一个带记忆的 ConversationalRetrievalChain，自动处理环境变量兜底、
 向量库目录创建与更清晰的错误提示。
+
+大模型、向量模型与检索链在所有会话之间共用（st.cache_resource），
+对话记忆则按会话保存在 st.session_state 中：按 token 预算保留最近几轮，
+超出预算的旧轮次滚动压缩进摘要，每轮提示词长度不随会话变长而增长。
 """
 
 import os
 import pathlib
+import re
 import streamlit as st
 from dotenv import load_dotenv
 from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferMemory
+from langchain_core.messages import SystemMessage
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 from langchain_openai import ChatOpenAI
 
+from database import SessionLocal, User
+from embedding_utils import EMBEDDING_BACKEND, OnnxEmbeddings, use_onnx_backend
+from retrieval_utils import CachedQueryEmbeddings, CachedRetriever, resolve_collection_path
+
 
 load_dotenv()
 
+# 对话记忆预算：最近轮次的 token 上限与摘要的 token 上限
+CHAT_MEMORY_TOKEN_BUDGET = int(os.getenv("CHAT_MEMORY_TOKEN_BUDGET", "1500"))
+CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", "300"))
 
-@st.cache_resource
-def load_conversational_chain():
-    """加载并缓存带记忆的RAG对话链。
+# token 估算与追问规则与 backend/services/text_utils.py 相同；Streamlit 应用不随后端部署，修改时两处同步
+_CJK_PATTERN = re.compile(r"[\u4e00-\u9fff\u3000-\u303f\uff00-\uffef]")
 
-    环境变量（支持兜底）：
-    - DEEPSEEK_API_KEY: DeepSeek 密钥（必须）
-    - EMBEDDING_MODEL_PATH: HuggingFace 向量模型（默认 all-MiniLM-L6-v2）
-    - DB_PATH: Chroma 向量库目录（默认 ./data/chroma）
-    - RETRIEVER_TOP_K: 检索条数（默认 4）
-    - LLM_TEMPERATURE: 生成温度（默认 0.7）
-    - LLM_MAX_TOKENS: 最大生成长度（可选）
+
+# 追问特征：指代词、承接词等出现时，问题需要结合历史改写后再检索
+_FOLLOW_UP_PATTERN = re.compile(
+    r"(它|它们|他们|她们|这个|那个|这些|那些|这种|那种|这里|那里|上面|上述|前面|之前|刚才|刚刚|"
+    r"继续|接着|还有呢|然后呢|为什么呢|怎么说|再讲|再说|展开|详细|举个例子|举例|换个|另一个|"
+    r"第[一二三四五六七八九十\d]+[个点条步]|\b(it|this|that|these|those|above|previous|again|more)\b)",
+    re.IGNORECASE,
+)
+
+# 过短的问题（如“为什么？”）通常是追问
+STANDALONE_MIN_CHARS = int(os.getenv("STANDALONE_MIN_CHARS", "8"))
+
+
+def is_standalone_question(question, chat_history):
+    """
+    本地判断问题是否可以脱离上下文理解：没有历史，或问题足够完整且不含指代/承接词。
+    判定为独立问题时跳过“结合历史改写问题”的大模型调用，直接检索。
+    """
+    if not chat_history:
+        return True
+    text = (question or "").strip()
+    if len(re.sub(r"[\s\W_]+", "", text)) < STANDALONE_MIN_CHARS:
+        return False
+    return not _FOLLOW_UP_PATTERN.search(text)
+
+
+def estimate_tokens(text):
+    """本地估算 token 数：中文约一字一个 token，其他字符约四个一个 token"""
+    text = text or ""
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def _truncate_to_tokens(text, max_tokens):
+    """把文本截断到大约 max_tokens 个 token"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] + "……"
+
+
+class TokenWindowMemory:
     """
-    print("--- 正在加载带记忆的AI核心组件... ---")
+    按 token 预算保留最近的对话轮次；超出预算时把最旧的若干轮连同已有摘要
+    一起交给大模型压缩成新摘要（滚动摘要），记忆总长度始终有上限。
+    """
+
+    def __init__(self, llm, max_tokens=CHAT_MEMORY_TOKEN_BUDGET, summary_max_tokens=CHAT_SUMMARY_TOKEN_BUDGET):
+        self.llm = llm
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.summary = ""
+        self.turns = []  # [(question, answer), ...]
+
+    @staticmethod
+    def _turn_tokens(turn):
+        return estimate_tokens(turn[0]) + estimate_tokens(turn[1])
+
+    def is_empty(self):
+        return not self.turns and not self.summary
+
+    def clear(self):
+        self.summary = ""
+        self.turns = []
+
+    def load_turns(self, turns):
+        """用已有的对话记录（如数据库中的历史）初始化记忆"""
+        for question, answer in turns:
+            self.add_turn(question, answer, summarize=False)
+        self._compact()
+
+    def add_turn(self, question, answer, summarize=True):
+        # 单轮过长时截断回答，保证至少能放下最近一轮
+        answer = _truncate_to_tokens(answer, max(self.max_tokens - estimate_tokens(question), 50))
+        self.turns.append((question, answer))
+        if summarize:
+            self._compact()
+
+    def _compact(self):
+        """超出预算时，把旧轮次一直挪到预算的一半以下再摘要，减少摘要调用次数"""
+        if sum(self._turn_tokens(turn) for turn in self.turns) <= self.max_tokens:
+            return
+        evicted = []
+        while len(self.turns) > 1 and sum(self._turn_tokens(turn) for turn in self.turns) > self.max_tokens // 2:
+            evicted.append(self.turns.pop(0))
+        if evicted:
+            self.summary = self._summarize(evicted)
+
+    def _summarize(self, evicted):
+        dialogue = "\n".join(f"学生：{question}\n导师：{answer}" for question, answer in evicted)
+        prompt = (
+            f"请把下面的已有摘要和新增对话合并成一段简洁的中文摘要，保留学生的问题、关键结论和尚未解决的疑问，"
+            f"不超过{self.summary_max_tokens}字。\n\n已有摘要：{self.summary or '无'}\n\n新增对话：\n{dialogue}"
+        )
+        try:
+            summary = self.llm.invoke(prompt).content.strip()
+        except Exception as e:
+            # 摘要失败时退化为截断拼接，不影响本轮回答
+            print(f"对话摘要失败：{e}")
+            summary = f"{self.summary}\n{dialogue}".strip()
+        return _truncate_to_tokens(summary, self.summary_max_tokens)
+
+    def fit(self, chat_history):
+        """把调用方传入的历史裁剪到 token 预算内（保留最近的轮次）"""
+        fitted = []
+        used = 0
+        for turn in reversed(list(chat_history)):
+            tokens = self._turn_tokens(turn) if isinstance(turn, tuple) else estimate_tokens(turn.content)
+            if fitted and used + tokens > self.max_tokens:
+                break
+            fitted.insert(0, turn)
+            used += tokens
+        return fitted
+
+    def as_chat_history(self):
+        history = []
+        if self.summary:
+            history.append(SystemMessage(content=f"此前对话摘要：{self.summary}"))
+        history.extend(self.turns)
+        return history
+
+
+class SessionConversationalChain:
+    """
+    会话级对话链：底层 ConversationalRetrievalChain 在会话间共用且不带记忆，
+    本对象只持有当前会话的记忆。
+
+    - 不传 chat_history 时使用会话记忆，并把本轮问答记入记忆
+    - 显式传入 chat_history（如练习题生成传入 []）时按预算裁剪后直接使用，不写入记忆
+    - 独立问题不传历史给底层链，省掉改写问题的那次大模型调用
+      （底层链的回答提示词只用检索内容和问题，不使用历史，因此回答不受影响）
+    """
+
+    def __init__(self, chain, memory):
+        self.chain = chain
+        self.memory = memory
+
+    def invoke(self, inputs, raw_question=None):
+        """
+        :param inputs: {"question": ..., "chat_history": 可选}
+        :param raw_question: 用户原始问题；question 被模式模板包装过时，用它判断是否为独立问题
+        """
+        inputs = dict(inputs)
+        use_memory = "chat_history" not in inputs
+        if use_memory:
+            inputs["chat_history"] = self.memory.as_chat_history()
+        else:
+            inputs["chat_history"] = self.memory.fit(inputs["chat_history"])
+
+        chain_inputs = inputs
+        if is_standalone_question(raw_question or inputs["question"], inputs["chat_history"]):
+            chain_inputs = dict(inputs, chat_history=[])
+
+        result = self.chain.invoke(chain_inputs)
+        if use_memory:
+            # 记忆中保存用户原话，不保存模式模板包装后的问题（模板文本会挤占历史预算并干扰后续改写）
+            self.memory.add_turn(raw_question or inputs["question"], result["answer"])
+        return result
+
 
-    # 读取配置并提供兜底
+def get_db_root():
+    """公共知识库根目录（班级知识库位于其下的 classes/<class_id>）"""
+    db_root = pathlib.Path(os.getenv("DB_PATH", "data/chroma").strip() or "data/chroma")
+    db_root.mkdir(parents=True, exist_ok=True)
+    return db_root
+
+
+@st.cache_resource
+def load_embedding_model():
+    """加载并缓存向量模型，所有知识库共用一份，查询向量带 LRU 缓存"""
+    embedding_model_name = (
+        os.getenv("EMBEDDING_MODEL_PATH", "sentence-transformers/all-MiniLM-L6-v2").strip()
+    )
+    if use_onnx_backend():
+        embedding_model = OnnxEmbeddings(embedding_model_name)
+    else:
+        embedding_model = HuggingFaceEmbeddings(
+            model_name=embedding_model_name,
+            encode_kwargs={"normalize_embeddings": True},
+        )
+    print(f"--- 向量模型加载完毕 | emb='{embedding_model_name}' ({EMBEDDING_BACKEND}) ---")
+    return CachedQueryEmbeddings(embedding_model, embedding_model_name)
+
+
+@st.cache_resource
+def load_llm():
+    """加载并缓存对话大模型客户端"""
     deepseek_api_key = os.getenv("DEEPSEEK_API_KEY", "").strip()
     if not deepseek_api_key:
         st.error("未配置 DEEPSEEK_API_KEY，请在 backend/.env 中设置后重试。")
         raise RuntimeError("DEEPSEEK_API_KEY missing")
 
-    embedding_model_name = (
-        os.getenv("EMBEDDING_MODEL_PATH", "sentence-transformers/all-MiniLM-L6-v2").strip()
-    )
-    db_path = pathlib.Path(os.getenv("DB_PATH", "data/chroma").strip() or "data/chroma")
-    db_path.mkdir(parents=True, exist_ok=True)
-    retriever_top_k = int(os.getenv("RETRIEVER_TOP_K", "4"))
     llm_temperature = float(os.getenv("LLM_TEMPERATURE", "0.7"))
     llm_max_tokens_env = os.getenv("LLM_MAX_TOKENS")
     llm_kwargs = {
@@ -56,29 +243,90 @@ def load_conversational_chain():
     }
     if llm_max_tokens_env and llm_max_tokens_env.isdigit():
         llm_kwargs["max_tokens"] = int(llm_max_tokens_env)
+    return ChatOpenAI(**llm_kwargs)
 
-    # 构建组件
-    embedding_model = HuggingFaceEmbeddings(
-        model_name=embedding_model_name,
-        encode_kwargs={"normalize_embeddings": True},
-    )
-    vectordb = Chroma(
-        persist_directory=str(db_path),
-        embedding_function=embedding_model,
+
+def get_session_class_id():
+    """当前登录用户的班级ID：登录时写入 session_state，登录较早的会话从数据库补查一次"""
+    if "class_id" not in st.session_state and st.session_state.get("user_id"):
+        db = SessionLocal()
+        try:
+            user = db.query(User).filter(User.id == st.session_state["user_id"]).first()
+            st.session_state["class_id"] = user.class_id if user else None
+        finally:
+            db.close()
+    return st.session_state.get("class_id")
+
+
+@st.cache_resource
+def load_condense_llm():
+    """
+    加载用于“结合历史改写问题”的模型；配置 CONDENSE_MODEL 时使用更小更快的模型，
+    否则与回答共用同一个模型
+    """
+    condense_model = os.getenv("CONDENSE_MODEL", "").strip()
+    if not condense_model:
+        return load_llm()
+    return ChatOpenAI(
+        model_name=condense_model,
+        temperature=0,
+        openai_api_base=os.getenv("CONDENSE_API_BASE", "https://api.deepseek.com/v1").strip(),
+        openai_api_key=(os.getenv("CONDENSE_API_KEY") or os.getenv("DEEPSEEK_API_KEY", "")).strip(),
+        max_tokens=256,
+        max_retries=2,
+        request_timeout=30,
     )
-    llm = ChatOpenAI(**llm_kwargs)
 
-    memory = ConversationBufferMemory(
-        memory_key="chat_history",
-        return_messages=True,
+
+def get_session_memory():
+    """当前会话的对话记忆（每个 Streamlit 会话一份，互不串话）"""
+    if "_rag_memory" not in st.session_state:
+        st.session_state["_rag_memory"] = TokenWindowMemory(load_llm())
+    return st.session_state["_rag_memory"]
+
+
+def load_conversational_chain(class_id=None):
+    """加载带记忆的RAG对话链，并按班级路由知识库。
+
+    班级已建立独立知识库（build_knowledge_base.py --class-id）时只检索该班级的资料，
+    检索量只与本课程资料规模相关；否则使用公共知识库。
+
+    环境变量（支持兜底）：
+    - DEEPSEEK_API_KEY: DeepSeek 密钥（必须）
+    - EMBEDDING_MODEL_PATH: HuggingFace 向量模型（默认 all-MiniLM-L6-v2）
+    - EMBEDDING_BACKEND: torch（默认）或 onnx（int8 量化，见 embedding_utils）
+    - DB_PATH: Chroma 向量库目录（默认 ./data/chroma）
+    - RETRIEVER_TOP_K: 检索条数（默认 4）
+    - QUERY_EMBEDDING_CACHE_SIZE / RETRIEVAL_CACHE_SIZE: 查询向量与检索结果缓存条数（见 retrieval_utils）
+    - RETRIEVER_MODE: hybrid（向量 + BM25 融合，默认）或 dense（见 retrieval_utils）
+    - LLM_TEMPERATURE: 生成温度（默认 0.7）
+    - LLM_MAX_TOKENS: 最大生成长度（可选）
+    - CHAT_MEMORY_TOKEN_BUDGET: 会话记忆中最近轮次的 token 上限（默认 1500）
+    - CHAT_SUMMARY_TOKEN_BUDGET: 滚动摘要的 token 上限（默认 300）
+    - CONDENSE_MODEL / CONDENSE_API_BASE / CONDENSE_API_KEY: 改写追问所用的小模型（可选，默认与回答共用模型）
+
+    :param class_id: 学生所在班级ID，为空时使用公共知识库
+    :return: SessionConversationalChain，用法与 ConversationalRetrievalChain.invoke 相同
+    """
+    db_path = resolve_collection_path(get_db_root(), class_id)
+    return SessionConversationalChain(_load_chain_for_collection(db_path), get_session_memory())
+
+
+@st.cache_resource
+def _load_chain_for_collection(db_path):
+    """按知识库目录加载并缓存不带记忆的对话链（向量模型与大模型在各知识库之间共用）"""
+    print(f"--- 正在加载AI核心组件 | db='{db_path}' ---")
+    retriever_top_k = int(os.getenv("RETRIEVER_TOP_K", "4"))
+
+    vectordb = Chroma(
+        persist_directory=db_path,
+        embedding_function=load_embedding_model(),
     )
 
     chain = ConversationalRetrievalChain.from_llm(
-        llm=llm,
-        retriever=vectordb.as_retriever(search_kwargs={"k": retriever_top_k}),
-        memory=memory,
-    )
-    print(
-        f"--- 带记忆的AI核心组件加载完毕 | emb='{embedding_model_name}' | db='{db_path}' | top_k={retriever_top_k} ---"
+        llm=load_llm(),
+        retriever=CachedRetriever(vectorstore=vectordb, db_path=db_path, k=retriever_top_k),
+        condense_question_llm=load_condense_llm(),
     )
-    return chain
\ No newline at end of file
+    print(f"--- AI核心组件加载完毕 | db='{db_path}' | top_k={retriever_top_k} ---")
+    return chain
@@ -1,6 +1,9 @@
 # tongyi_utils.py (v3.0 修复版 - 基于testtongyi.py的成功实现)
 import os
+import json
+import hashlib
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from openai import OpenAI
 
@@ -13,11 +16,275 @@ TONGYI_API_ENDPOINT = os.getenv(
 )
 TONGYI_API_KEY = os.getenv("TONGYI_API_KEY", "").strip()
 
+# 长视频分段分析配置
+VIDEO_SEGMENT_SECONDS = int(os.getenv("VIDEO_SEGMENT_SECONDS", "300"))      # 每段时长（秒）
+VIDEO_SEGMENT_FRAMES = int(os.getenv("VIDEO_SEGMENT_FRAMES", "8"))          # 每段抽帧数
+VIDEO_ANALYSIS_WORKERS = int(os.getenv("VIDEO_ANALYSIS_WORKERS", "3"))      # 并发分析的段数
+VIDEO_ANALYSIS_CACHE_DIR = os.getenv("VIDEO_ANALYSIS_CACHE_DIR", "data/video_analysis_cache")
+VIDEO_MERGE_MODEL = os.getenv("VIDEO_MERGE_MODEL", "qwen-plus")             # 合并分段报告的文本模型
 
-def analyze_video_with_tongyi_stream(video_url: str):
+# 分析模式：video 上传整段视频；keyframes 在本地按场景切换提取关键帧，只发送图片
+VIDEO_ANALYSIS_MODE = os.getenv("VIDEO_ANALYSIS_MODE", "video")
+VIDEO_KEYFRAME_MAX = int(os.getenv("VIDEO_KEYFRAME_MAX", "16"))
+
+VIDEO_REPORT_SYSTEM_PROMPT = (
+    "你是一位专业的教育内容分析师，擅长分析教学视频并生成详细的学习指导报告。请按照以下结构分析视频：\n\n"
+    "## 📹 视频内容分析报告\n### 🎯 核心主题\n### 📋 内容大纲\n### 🔑 关键知识点\n### 📚 学习建议\n### 🎓 教学评价"
+)
+
+
+def _format_timestamp(seconds: float) -> str:
+    """将秒数格式化为 mm:ss 或 h:mm:ss"""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def _video_identity(video_url: str) -> str:
+    """视频身份标识：本地文件包含修改时间和大小，文件变化后缓存自动失效"""
+    if os.path.isfile(video_url):
+        stat = os.stat(video_url)
+        return f"{os.path.abspath(video_url)}|{stat.st_mtime_ns}|{stat.st_size}"
+    return video_url
+
+
+def _segment_cache_path(video_url: str, start: float, end: float) -> str:
+    raw = f"{_video_identity(video_url)}|{start:.1f}|{end:.1f}|{VIDEO_SEGMENT_FRAMES}|qwen-vl-plus"
+    key = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    return os.path.join(VIDEO_ANALYSIS_CACHE_DIR, f"{key}.json")
+
+
+def _load_segment_cache(cache_path: str):
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("report")
+    except (OSError, ValueError):
+        return None
+
+
+def _save_segment_cache(cache_path: str, start: float, end: float, report: str):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"start": start, "end": end, "report": report,
+                   "created_at": datetime.now().isoformat()}, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+
+
+def _analyze_segment(client: OpenAI, video_url: str, start: float, end: float) -> str:
+    """分析单个时间窗口（优先读取缓存，成功后写入缓存）"""
+    from video_utils import extract_segment_frames
+
+    cache_path = _segment_cache_path(video_url, start, end)
+    cached = _load_segment_cache(cache_path)
+    if cached:
+        return cached
+
+    frames = extract_segment_frames(video_url, start, end, num_frames=VIDEO_SEGMENT_FRAMES)
+    if not frames:
+        raise RuntimeError(f"无法从 {_format_timestamp(start)}-{_format_timestamp(end)} 抽取视频帧")
+
+    response = client.chat.completions.create(
+        model="qwen-vl-plus",
+        messages=[
+            {
+                "role": "system",
+                "content": "你是一位专业的教育内容分析师。你将看到一段教学视频片段按时间顺序抽取的画面，请简明总结该片段讲解的内容。"
+            },
+            {
+                "role": "user",
+                "content": [
+                    {"type": "video", "video": frames},
+                    {"type": "text", "text": (
+                        f"这是视频 {_format_timestamp(start)} 至 {_format_timestamp(end)} 的片段。"
+                        "请用Markdown列出：本段主题、讲解的主要内容、出现的关键知识点（包括板书/幻灯片上的术语和公式）。"
+                    )}
+                ]
+            }
+        ],
+        temperature=0.3,
+    )
+    report = (response.choices[0].message.content or "").strip()
+    if not report:
+        raise RuntimeError("API返回内容为空")
+
+    _save_segment_cache(cache_path, start, end, report)
+    return report
+
+
+def _merge_segment_reports(client: OpenAI, segment_reports) -> str:
+    """将各片段摘要合并为一份结构化报告；合并调用失败时按时间顺序拼接"""
+    sections = "\n\n".join(
+        f"### 片段 {_format_timestamp(start)} - {_format_timestamp(end)}\n{report}"
+        for start, end, report in segment_reports
+    )
+    try:
+        response = client.chat.completions.create(
+            model=VIDEO_MERGE_MODEL,
+            messages=[
+                {"role": "system", "content": VIDEO_REPORT_SYSTEM_PROMPT},
+                {"role": "user", "content": (
+                    "以下是同一个教学视频按时间顺序分段分析得到的片段摘要，"
+                    "请整合为一份完整、结构化的学习指导报告，内容大纲中请标注对应的时间段：\n\n" + sections
+                )}
+            ],
+            temperature=0.5,
+        )
+        merged = (response.choices[0].message.content or "").strip()
+        if merged:
+            return merged
+    except Exception as e:
+        print(f"⚠️ 合并分段报告失败，改为按时间顺序拼接: {e}")
+
+    return "## 📹 视频内容分析报告\n\n### 📋 分段内容\n\n" + sections
+
+
+def _run_segmented_analysis(video_url: str):
+    """
+    分段并行分析长视频的生成器。
+
+    依次产出 ("progress", 已完成段数, 总段数)，最后产出 ("result", 报告文本)。
+    已完成的片段会被缓存，部分失败后重新分析只会补齐缺失的片段。
+    """
+    from video_utils import get_video_duration, split_time_windows
+
+    duration = get_video_duration(video_url)
+    if not duration:
+        raise RuntimeError("无法读取视频时长，无法进行分段分析")
+
+    windows = split_time_windows(duration, VIDEO_SEGMENT_SECONDS)
+    client = OpenAI(api_key=TONGYI_API_KEY, base_url=TONGYI_API_ENDPOINT)
+    results = {}
+    failures = {}
+
+    yield ("progress", 0, len(windows))
+    with ThreadPoolExecutor(max_workers=VIDEO_ANALYSIS_WORKERS) as executor:
+        futures = {
+            executor.submit(_analyze_segment, client, video_url, start, end): (start, end)
+            for start, end in windows
+        }
+        for future in as_completed(futures):
+            window = futures[future]
+            try:
+                results[window] = future.result()
+            except Exception as e:
+                print(f"❌ 片段 {_format_timestamp(window[0])}-{_format_timestamp(window[1])} 分析失败: {e}")
+                failures[window] = str(e)
+            yield ("progress", len(results) + len(failures), len(windows))
+
+    if not results:
+        raise RuntimeError(f"所有 {len(windows)} 个片段均分析失败：{next(iter(failures.values()))}")
+
+    segment_reports = [(start, end, results[(start, end)]) for start, end in windows if (start, end) in results]
+    report = _merge_segment_reports(client, segment_reports)
+
+    if failures:
+        missing = "、".join(f"{_format_timestamp(s)}-{_format_timestamp(e)}" for s, e in sorted(failures))
+        report += (
+            "\n\n---\n"
+            f"⚠️ 以下片段分析失败，报告未覆盖：{missing}。"
+            "重新分析时将复用已完成片段的结果，只补齐缺失部分。"
+        )
+
+    yield ("result", report)
+
+
+def analyze_video_segmented(video_url: str) -> str:
+    """分段并行分析长视频，返回合并后的结构化报告"""
+    report = ""
+    for event in _run_segmented_analysis(video_url):
+        if event[0] == "result":
+            report = event[1]
+    return report
+
+
+def analyze_video_segmented_stream(video_url: str):
+    """分段并行分析长视频，流式返回进度与最终报告（供Streamlit显示）"""
+    for event in _run_segmented_analysis(video_url):
+        if event[0] == "progress":
+            _, done, total = event
+            yield f"### 🔄 长视频分段分析中...\n\n已完成 **{done}/{total}** 个片段（每段约 {VIDEO_SEGMENT_SECONDS // 60} 分钟）"
+        else:
+            yield event[1]
+
+
+def _build_keyframe_messages(video_url: str):
+    """提取关键帧并构造多图输入（每张图前标注时间点）"""
+    from video_utils import extract_keyframes
+
+    keyframes = extract_keyframes(video_url, max_keyframes=VIDEO_KEYFRAME_MAX)
+    if not keyframes:
+        raise RuntimeError("未能从视频中提取关键帧")
+    print(f"提取到 {len(keyframes)} 张关键帧")
+
+    content = [{"type": "text", "text": (
+        "以下是从教学视频中按场景切换（如课件翻页）提取的关键帧，按时间顺序排列。"
+        "请据此详细分析这个教学视频的内容，生成结构化的学习指导报告："
+    )}]
+    for timestamp, data_url in keyframes:
+        content.append({"type": "text", "text": f"[{_format_timestamp(timestamp)}]"})
+        content.append({"type": "image_url", "image_url": {"url": data_url}})
+
+    return [
+        {"role": "system", "content": VIDEO_REPORT_SYSTEM_PROMPT},
+        {"role": "user", "content": content}
+    ]
+
+
+def analyze_video_keyframes(video_url: str) -> str:
+    """关键帧模式：只把场景切换处的关键帧发送给视觉模型"""
+    client = OpenAI(api_key=TONGYI_API_KEY, base_url=TONGYI_API_ENDPOINT)
+    response = client.chat.completions.create(
+        model="qwen-vl-plus",
+        messages=_build_keyframe_messages(video_url),
+        temperature=0.5,
+    )
+    result = (response.choices[0].message.content or "").strip()
+    if not result:
+        raise RuntimeError("API返回内容为空")
+    return result
+
+
+def analyze_video_keyframes_stream(video_url: str):
+    """关键帧模式的流式版本"""
+    yield "### 🖼️ 正在提取关键帧..."
+    messages = _build_keyframe_messages(video_url)
+    client = OpenAI(api_key=TONGYI_API_KEY, base_url=TONGYI_API_ENDPOINT)
+    stream = client.chat.completions.create(
+        model="qwen-vl-plus",
+        messages=messages,
+        temperature=0.5,
+        stream=True,
+    )
+    full_content = ""
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content is not None:
+            full_content += chunk.choices[0].delta.content
+            yield full_content
+
+
+def _segmentation_failed_message(video_url: str, error: Exception) -> str:
+    return (
+        "## ⏱️ 视频时长超限\n\n"
+        f"**视频链接**: {video_url}\n"
+        "**错误信息**: 视频文件过长，超出了API单次处理限制，自动分段分析也未能完成\n\n"
+        f"**分段分析错误**: {error}\n\n"
+        "### 可能原因\n"
+        "1. **视频无法解码**：服务器无法读取该视频的画面（请使用MP4/H.264格式）\n"
+        "2. **网络访问受限**：服务器无法直接读取该视频链接\n\n"
+        "已完成的片段结果会被缓存，稍后重试只会补齐失败的片段。"
+    )
+
+
+def analyze_video_with_tongyi_stream(video_url: str, use_keyframes: bool = None):
     """
     调用通义千问 qwen-vl-plus 模型分析视频内容，返回流式生成器。
     用于Streamlit的流式输出显示。
+
+    use_keyframes 为 True 时使用关键帧模式，为 None 时取 VIDEO_ANALYSIS_MODE 配置。
     """
     if not TONGYI_API_KEY:
         yield (
@@ -30,6 +297,19 @@ def analyze_video_with_tongyi_stream(video_url: str):
     try:
         print(f"开始分析视频: {video_url}")
 
+        if use_keyframes is None:
+            use_keyframes = VIDEO_ANALYSIS_MODE == "keyframes"
+
+        # 关键帧模式：本地提取关键帧，只发送图片
+        if use_keyframes:
+            yield from analyze_video_keyframes_stream(video_url)
+            return
+
+        # 本地视频文件：在本地切分后分段分析
+        if video_url and os.path.isfile(video_url):
+            yield from analyze_video_segmented_stream(video_url)
+            return
+
         # 预检查视频URL
         if not video_url or not video_url.startswith(('http://', 'https://')):
             yield (
@@ -51,7 +331,7 @@ def analyze_video_with_tongyi_stream(video_url: str):
             messages=[
                 {
                     "role": "system",
-                    "content": "你是一位专业的教育内容分析师，擅长分析教学视频并生成详细的学习指导报告。请按照以下结构分析视频：\n\n## 📹 视频内容分析报告\n### 🎯 核心主题\n### 📋 内容大纲\n### 🔑 关键知识点\n### 📚 学习建议\n### 🎓 教学评价"
+                    "content": VIDEO_REPORT_SYSTEM_PROMPT
                 },
                 {
                     "role": "user",
@@ -79,22 +359,13 @@ def analyze_video_with_tongyi_stream(video_url: str):
         error_str = str(e)
         print(f"❌ 流式视频分析异常: {error_str}")
 
-        # 特殊错误处理
+        # 特殊错误处理：视频过长时自动切换为分段分析
         if "too long" in error_str.lower():
-            yield (
-                "## ⏱️ 视频时长超限\n\n"
-                f"**视频链接**: {video_url}\n"
-                f"**错误信息**: 视频文件过长，超出了API处理限制\n\n"
-                "### 解决方案\n"
-                "1. **视频剪辑**：将视频分割成较短的片段（建议每段5-10分钟）\n"
-                "2. **关键片段**：选择视频中最重要的部分进行分析\n"
-                "3. **压缩处理**：降低视频分辨率和码率\n\n"
-                "### 建议的视频规格\n"
-                "- **时长**：5-15分钟为最佳\n"
-                "- **格式**：MP4格式\n"
-                "- **分辨率**：720p或1080p\n"
-                "- **文件大小**：小于100MB"
-            )
+            try:
+                yield from analyze_video_segmented_stream(video_url)
+            except Exception as seg_error:
+                print(f"❌ 分段分析失败: {seg_error}")
+                yield _segmentation_failed_message(video_url, seg_error)
         elif "download" in error_str.lower() or "access" in error_str.lower():
             yield (
                 "## 🌐 视频访问失败\n\n"
@@ -128,10 +399,12 @@ def analyze_video_with_tongyi_stream(video_url: str):
             )
 
 
-def analyze_video_with_tongyi(video_url: str) -> str:
+def analyze_video_with_tongyi(video_url: str, use_keyframes: bool = None) -> str:
     """
     调用通义千问 qwen-vl-plus 模型分析视频内容，并返回结构化Markdown文本。
     基于testtongyi.py的成功实现方式。
+
+    use_keyframes 为 True 时使用关键帧模式，为 None 时取 VIDEO_ANALYSIS_MODE 配置。
     """
     if not TONGYI_API_KEY:
         return (
@@ -143,6 +416,17 @@ def analyze_video_with_tongyi(video_url: str) -> str:
     try:
         print(f"开始分析视频: {video_url}")
 
+        if use_keyframes is None:
+            use_keyframes = VIDEO_ANALYSIS_MODE == "keyframes"
+
+        # 关键帧模式：本地提取关键帧，只发送图片
+        if use_keyframes:
+            return analyze_video_keyframes(video_url)
+
+        # 本地视频文件：在本地切分后分段分析
+        if video_url and os.path.isfile(video_url):
+            return analyze_video_segmented(video_url)
+
         # 预检查视频URL
         if not video_url or not video_url.startswith(('http://', 'https://')):
             return (
@@ -166,7 +450,7 @@ def analyze_video_with_tongyi(video_url: str) -> str:
             messages=[
                 {
                     "role": "system",
-                    "content": "你是一位专业的教育内容分析师，擅长分析教学视频并生成详细的学习指导报告。请按照以下结构分析视频：\n\n## 📹 视频内容分析报告\n### 🎯 核心主题\n### 📋 内容大纲\n### 🔑 关键知识点\n### 📚 学习建议\n### 🎓 教学评价"
+                    "content": VIDEO_REPORT_SYSTEM_PROMPT
                 },
                 {
                     "role": "user",
@@ -211,22 +495,13 @@ def analyze_video_with_tongyi(video_url: str) -> str:
         error_str = str(e)
         print(f"❌ 视频分析异常: {error_str}")
 
-        # 特殊错误处理
+        # 特殊错误处理：视频过长时自动切换为分段分析
         if "too long" in error_str.lower():
-            return (
-                "## ⏱️ 视频时长超限\n\n"
-                f"**视频链接**: {video_url}\n"
-                f"**错误信息**: 视频文件过长，超出了API处理限制\n\n"
-                "### 解决方案\n"
-                "1. **视频剪辑**：将视频分割成较短的片段（建议每段5-10分钟）\n"
-                "2. **关键片段**：选择视频中最重要的部分进行分析\n"
-                "3. **压缩处理**：降低视频分辨率和码率\n\n"
-                "### 建议的视频规格\n"
-                "- **时长**：5-15分钟为最佳\n"
-                "- **格式**：MP4格式\n"
-                "- **分辨率**：720p或1080p\n"
-                "- **文件大小**：小于100MB"
-            )
+            try:
+                return analyze_video_segmented(video_url)
+            except Exception as seg_error:
+                print(f"❌ 分段分析失败: {seg_error}")
+                return _segmentation_failed_message(video_url, seg_error)
         elif "download" in error_str.lower() or "access" in error_str.lower():
             return (
                 "## 🌐 视频访问失败\n\n"
@@ -1,5 +1,6 @@
 # video_utils.py - 视频处理工具模块
 import cv2
+import numpy as np
 import random
 import requests
 from PIL import Image
@@ -11,60 +12,103 @@ from urllib.parse import urlparse, quote, unquote
 import validators
 import threading
 import time
+import hashlib
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+# 缩略图缓存配置：按 (路径, 修改时间) 生成一次，保存为小尺寸JPEG，超出容量按最近访问时间淘汰
+THUMBNAIL_CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", "data/thumbnails")
+THUMBNAIL_CACHE_MAX_MB = int(os.getenv("THUMBNAIL_CACHE_MAX_MB", "200"))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+THUMBNAIL_SIZE = (400, 225)
+
+_thumbnail_pool = None
+_thumbnail_pool_lock = threading.Lock()
+
+# 视频元数据探测配置：所有探测共享一个有界线程池，避免每次探测都新建线程
+VIDEO_PROBE_WORKERS = int(os.getenv("VIDEO_PROBE_WORKERS", "4"))
+VIDEO_PROBE_TIMEOUT = int(os.getenv("VIDEO_PROBE_TIMEOUT", "15"))
+VIDEO_META_MAX_AGE_HOURS = int(os.getenv("VIDEO_META_MAX_AGE_HOURS", "24"))
+VIDEO_META_REFRESH_INTERVAL = int(os.getenv("VIDEO_META_REFRESH_INTERVAL", "600"))
+
+_probe_pool = ThreadPoolExecutor(max_workers=VIDEO_PROBE_WORKERS, thread_name_prefix="video-probe")
+# 进行中的探测任务（video_id -> Future），Streamlit 重跑时复用，避免重复提交
+_probe_inflight = {}
+_probe_inflight_lock = threading.Lock()
+_meta_refresher_started = False
+_meta_refresher_lock = threading.Lock()
+
+def _normalize_video_url(video_url):
+    """对URL路径部分重新编码（处理空格等特殊字符），本地路径原样返回"""
+    if not validators.url(video_url):
+        return video_url
+    decoded_url = unquote(video_url)
+    if '://' in decoded_url:
+        protocol_domain, path = decoded_url.split('://', 1)
+        if '/' in path:
+            domain, file_path = path.split('/', 1)
+            encoded_path = '/'.join(quote(part, safe='') for part in file_path.split('/'))
+            return f"{protocol_domain}://{domain}/{encoded_path}"
+    return video_url
+
+
+def _open_video_capture(video_url, timeout_seconds):
+    """打开视频，超时参数在打开时生效（打开之后再设置超时无效）"""
+    params = [
+        cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_seconds * 1000,
+        cv2.CAP_PROP_READ_TIMEOUT_MSEC, 5000,  # 5秒读取超时
+    ]
+    try:
+        return cv2.VideoCapture(video_url, cv2.CAP_ANY, params)
+    except (TypeError, cv2.error):
+        # 旧版OpenCV不支持打开参数
+        return cv2.VideoCapture(video_url)
+
+
+def _release_abandoned_capture(future):
+    """超时后任务才完成时，释放无人接收的视频句柄"""
+    if future.cancelled() or future.exception() is not None:
+        return
+    cap = future.result()
+    if cap is not None:
+        cap.release()
+
 
 def safe_video_capture_with_timeout(video_url, timeout_seconds=15):
     """
     安全的视频捕获函数，带超时控制
 
+    在共享的有界线程池中打开视频；超时后任务若尚未开始则取消，
+    若稍后才打开成功则自动释放句柄，不会泄漏。
+
     :param video_url: 视频URL或路径
     :param timeout_seconds: 超时时间（秒）
     :return: (success, cap) 元组
     """
-    result = {'cap': None, 'success': False}
-
     def capture_video():
+        cap = None
         try:
-            # URL预处理
-            processed_url = video_url
-            if validators.url(video_url):
-                decoded_url = unquote(video_url)
-                if '://' in decoded_url:
-                    protocol_domain, path = decoded_url.split('://', 1)
-                    if '/' in path:
-                        domain, file_path = path.split('/', 1)
-                        encoded_path = '/'.join(quote(part, safe='') for part in file_path.split('/'))
-                        processed_url = f"{protocol_domain}://{domain}/{encoded_path}"
-
-            cap = cv2.VideoCapture(processed_url)
-            cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_seconds * 1000)
-            cap.set(cv2.CAP_PROP_READ_TIMEOUT_MSEC, 5000)  # 5秒读取超时
-
+            cap = _open_video_capture(_normalize_video_url(video_url), timeout_seconds)
             if cap.isOpened():
-                result['cap'] = cap
-                result['success'] = True
-            else:
-                if cap:
-                    cap.release()
-
+                return cap
+            cap.release()
+            return None
         except Exception as e:
             print(f"❌ 视频捕获异常: {e}")
-            if result['cap']:
-                result['cap'].release()
-                result['cap'] = None
-
-    # 使用线程执行，避免阻塞
-    thread = threading.Thread(target=capture_video)
-    thread.daemon = True
-    thread.start()
-    thread.join(timeout=timeout_seconds)
+            if cap is not None:
+                cap.release()
+            return None
 
-    if thread.is_alive():
+    future = _probe_pool.submit(capture_video)
+    try:
+        cap = future.result(timeout=timeout_seconds)
+    except FuturesTimeoutError:
         print(f"⚠️ 视频捕获超时 ({timeout_seconds}秒)")
-        if result['cap']:
-            result['cap'].release()
+        future.cancel()
+        future.add_done_callback(_release_abandoned_capture)
         return False, None
 
-    return result['success'], result['cap']
+    return cap is not None, cap
 
 def get_random_video_thumbnail(video_path, max_size=(400, 225)):
     """
@@ -320,74 +364,440 @@ def create_default_thumbnail(title, subtitle=None, size=(400, 225)):
         img = Image.new('RGB', size, color='#374151')
         return img
 
-def get_video_info_simple(video_path_or_url):
+def probe_video_metadata(video_path_or_url, timeout_seconds=VIDEO_PROBE_TIMEOUT):
     """
-    获取视频的基本信息（改进版）
+    探测视频元数据（数值形式，供写入 VideoResource）
 
     :param video_path_or_url: 视频路径或URL
-    :return: 包含视频信息的字典
+    :param timeout_seconds: 网络请求超时时间（秒）
+    :return: 包含 duration_seconds、fps、width、height、size_bytes、accessible 的字典
     """
-    info = {
-        "duration": "未知",
-        "fps": "未知",
-        "resolution": "未知",
-        "size": "未知",
+    meta = {
+        "duration_seconds": None,
+        "fps": None,
+        "width": None,
+        "height": None,
+        "size_bytes": None,
         "accessible": False
     }
 
     try:
         if validators.url(video_path_or_url):
-            # 对于URL，先检查可访问性
+            # 对于网络视频，只通过HTTP头获取可访问性和大小，避免拉流超时
             try:
-                response = requests.head(video_path_or_url, timeout=15)
-                info["accessible"] = response.status_code == 200
-
-                # 获取文件大小
+                response = requests.head(video_path_or_url, timeout=timeout_seconds, allow_redirects=True)
+                meta["accessible"] = response.status_code == 200
                 content_length = response.headers.get("Content-Length")
-                if content_length:
-                    size_mb = int(content_length) / (1024 * 1024)
-                    info["size"] = f"{size_mb:.1f} MB"
-                else:
-                    info["size"] = "未知"
-
-                # 对于网络视频，我们不尝试获取详细信息以避免超时问题
-                # 只保留基本的可访问性和大小信息
-                if info["accessible"]:
-                    print(f"✅ 网络视频可访问，跳过详细信息获取以避免超时")
-
+                if content_length and content_length.isdigit():
+                    meta["size_bytes"] = int(content_length)
             except requests.RequestException as e:
                 print(f"❌ 网络请求失败: {e}")
-                info["accessible"] = False
 
-        else:
-            # 对于本地文件
-            if os.path.exists(video_path_or_url):
-                info["accessible"] = True
-                info["size"] = f"{os.path.getsize(video_path_or_url) / (1024*1024):.1f} MB"
+        elif os.path.exists(video_path_or_url):
+            meta["accessible"] = True
+            meta["size_bytes"] = os.path.getsize(video_path_or_url)
 
-                # 尝试获取视频信息
-                cap = cv2.VideoCapture(video_path_or_url)
+            cap = cv2.VideoCapture(video_path_or_url)
+            try:
                 if cap.isOpened():
                     fps = cap.get(cv2.CAP_PROP_FPS)
                     frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
-                    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-
                     if fps > 0:
-                        duration_seconds = frame_count / fps
-                        minutes = int(duration_seconds // 60)
-                        seconds = int(duration_seconds % 60)
-                        info["duration"] = f"{minutes}:{seconds:02d}"
-                        info["fps"] = f"{fps:.1f}"
-                        info["resolution"] = f"{width}x{height}"
-
-                    cap.release()
+                        meta["fps"] = round(fps, 2)
+                        meta["duration_seconds"] = frame_count / fps
+                        meta["width"] = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                        meta["height"] = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            finally:
+                cap.release()
 
     except Exception as e:
         print(f"❌ 获取视频信息时出错: {e}")
 
+    return meta
+
+
+def format_video_info(meta):
+    """
+    将数值元数据格式化为页面显示用的字典
+
+    :param meta: probe_video_metadata 的返回值，或带有同名属性的 VideoResource
+    :return: 包含 duration、fps、resolution、size、accessible 的字典
+    """
+    if not isinstance(meta, dict):
+        meta = {key: getattr(meta, key, None) for key in
+                ("duration_seconds", "fps", "width", "height", "size_bytes", "accessible")}
+
+    info = {
+        "duration": "未知",
+        "fps": "未知",
+        "resolution": "未知",
+        "size": "未知",
+        "accessible": bool(meta.get("accessible"))
+    }
+    if meta.get("duration_seconds") is not None:
+        minutes = int(meta["duration_seconds"] // 60)
+        seconds = int(meta["duration_seconds"] % 60)
+        info["duration"] = f"{minutes}:{seconds:02d}"
+    if meta.get("fps"):
+        info["fps"] = f"{meta['fps']:.1f}"
+    if meta.get("width") and meta.get("height"):
+        info["resolution"] = f"{meta['width']}x{meta['height']}"
+    if meta.get("size_bytes") is not None:
+        info["size"] = f"{meta['size_bytes'] / (1024 * 1024):.1f} MB"
     return info
 
+
+def get_video_info_simple(video_path_or_url):
+    """
+    获取视频的基本信息（实时探测；页面渲染请优先使用 VideoResource 上的缓存元数据）
+
+    :param video_path_or_url: 视频路径或URL
+    :return: 包含视频信息的字典
+    """
+    return format_video_info(probe_video_metadata(video_path_or_url))
+
+
+def _store_video_metadata(video_id):
+    """探测视频并把元数据写回 VideoResource（在探测线程池中执行）"""
+    from database import SessionLocal, VideoResource
+
+    db = SessionLocal()
+    try:
+        video = db.query(VideoResource).filter(VideoResource.id == video_id).first()
+        if video is None:
+            return None
+        meta = probe_video_metadata(video.path)
+        for key, value in meta.items():
+            setattr(video, key, value)
+        video.meta_updated_at = datetime.now()
+        db.commit()
+        return meta
+    except Exception as e:
+        db.rollback()
+        print(f"❌ 保存视频元数据失败 (id={video_id}): {e}")
+        return None
+    finally:
+        db.close()
+
+
+def schedule_video_metadata_probe(video_id):
+    """
+    将视频元数据探测提交到有界线程池（创建视频资源后调用）
+    同一视频已有探测在排队或执行时，直接返回该任务
+
+    :param video_id: VideoResource 的ID
+    :return: Future对象
+    """
+    with _probe_inflight_lock:
+        future = _probe_inflight.get(video_id)
+        if future is not None and not future.done():
+            return future
+        future = _probe_pool.submit(_store_video_metadata, video_id)
+        _probe_inflight[video_id] = future
+
+    def _forget(done_future):
+        with _probe_inflight_lock:
+            if _probe_inflight.get(video_id) is done_future:
+                del _probe_inflight[video_id]
+
+    future.add_done_callback(_forget)
+    return future
+
+
+def refresh_stale_video_metadata(max_age_hours=VIDEO_META_MAX_AGE_HOURS, limit=50):
+    """
+    刷新缺失或过期的视频元数据
+
+    :param max_age_hours: 元数据有效期（小时）
+    :param limit: 单次刷新的最大视频数
+    :return: 已刷新的视频数
+    """
+    from database import SessionLocal, VideoResource
+
+    db = SessionLocal()
+    try:
+        threshold = datetime.now() - timedelta(hours=max_age_hours)
+        video_ids = [row.id for row in db.query(VideoResource.id).filter(
+            (VideoResource.meta_updated_at == None) | (VideoResource.meta_updated_at < threshold)
+        ).order_by(VideoResource.meta_updated_at).limit(limit).all()]
+    finally:
+        db.close()
+
+    futures = [schedule_video_metadata_probe(video_id) for video_id in video_ids]
+    refreshed = 0
+    for future in futures:
+        try:
+            if future.result(timeout=VIDEO_PROBE_TIMEOUT * 2) is not None:
+                refreshed += 1
+        except FuturesTimeoutError:
+            future.cancel()
+    return refreshed
+
+
+def start_video_metadata_refresher(interval_seconds=VIDEO_META_REFRESH_INTERVAL):
+    """启动后台元数据刷新线程（每个进程只启动一次）"""
+    global _meta_refresher_started
+    with _meta_refresher_lock:
+        if _meta_refresher_started:
+            return
+        _meta_refresher_started = True
+
+    def refresh_loop():
+        while True:
+            try:
+                refreshed = refresh_stale_video_metadata()
+                if refreshed:
+                    print(f"✅ 已刷新 {refreshed} 个视频的元数据")
+            except Exception as e:
+                print(f"❌ 视频元数据刷新失败: {e}")
+            time.sleep(interval_seconds)
+
+    thread = threading.Thread(target=refresh_loop, name="video-meta-refresher", daemon=True)
+    thread.start()
+
+def get_video_duration(video_path_or_url, timeout_seconds=VIDEO_PROBE_TIMEOUT):
+    """
+    读取视频时长（秒），无法打开或缺少帧率信息时返回None
+
+    :param video_path_or_url: 视频路径或URL
+    :param timeout_seconds: 打开视频的超时时间（秒）
+    :return: 时长（秒）或None
+    """
+    success, cap = safe_video_capture_with_timeout(video_path_or_url, timeout_seconds)
+    if not success:
+        return None
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        if fps > 0 and frame_count > 0:
+            return frame_count / fps
+        return None
+    finally:
+        cap.release()
+
+
+def split_time_windows(duration_seconds, window_seconds):
+    """
+    将视频时长切分为连续的时间窗口
+
+    :param duration_seconds: 视频总时长（秒）
+    :param window_seconds: 每个窗口的时长（秒）
+    :return: [(start, end), ...]
+    """
+    windows = []
+    start = 0.0
+    while start < duration_seconds:
+        end = min(start + window_seconds, duration_seconds)
+        windows.append((start, end))
+        start = end
+    return windows
+
+
+def frame_to_data_url(frame, max_width=768, quality=80):
+    """
+    将OpenCV帧（BGR）缩放并编码为JPEG data URL，供视觉模型以图片形式输入
+
+    :param frame: OpenCV帧
+    :param max_width: 最大宽度（像素）
+    :param quality: JPEG质量
+    :return: data URL字符串或None
+    """
+    height, width = frame.shape[:2]
+    if width > max_width:
+        frame = cv2.resize(frame, (max_width, int(height * max_width / width)), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        return None
+    return f"data:image/jpeg;base64,{base64.b64encode(buffer.tobytes()).decode()}"
+
+
+def extract_segment_frames(video_path_or_url, start_seconds, end_seconds, num_frames=8, max_width=768):
+    """
+    在时间窗口内均匀抽取若干帧，编码为JPEG data URL
+
+    :param video_path_or_url: 视频路径或URL
+    :param start_seconds: 窗口起点（秒）
+    :param end_seconds: 窗口终点（秒）
+    :param num_frames: 抽帧数量
+    :param max_width: 帧的最大宽度（像素）
+    :return: data URL列表（可能少于num_frames）
+    """
+    success, cap = safe_video_capture_with_timeout(video_path_or_url)
+    if not success:
+        return []
+
+    frames = []
+    try:
+        step = (end_seconds - start_seconds) / num_frames
+        for i in range(num_frames):
+            # 取每个子区间的中点，避开窗口边界处的转场
+            cap.set(cv2.CAP_PROP_POS_MSEC, (start_seconds + step * (i + 0.5)) * 1000)
+            ok, frame = cap.read()
+            if not ok or frame is None:
+                continue
+            data_url = frame_to_data_url(frame, max_width=max_width)
+            if data_url:
+                frames.append(data_url)
+    finally:
+        cap.release()
+    return frames
+
+
+def _histogram_batch(gray_batch, bins=32):
+    """
+    批量计算灰度直方图（向量化，不逐帧循环）
+
+    :param gray_batch: (N, H, W) uint8 灰度帧
+    :param bins: 直方图分箱数
+    :return: (N, bins) 归一化直方图
+    """
+    n = gray_batch.shape[0]
+    flat = gray_batch.reshape(n, -1)
+    binned = (flat.astype(np.int32) * bins) >> 8
+    # 为每帧的分箱加上偏移，一次 bincount 得到所有帧的直方图
+    offsets = (np.arange(n, dtype=np.int32) * bins)[:, None]
+    counts = np.bincount((binned + offsets).ravel(), minlength=n * bins).reshape(n, bins)
+    return counts.astype(np.float32) / flat.shape[1]
+
+
+def _scene_change_scores(gray_batch, prev_gray=None, prev_hist=None):
+    """
+    计算一批帧相对前一帧的变化分数：直方图差异与像素差异取较大者
+
+    :param gray_batch: (N, H, W) uint8 灰度帧
+    :param prev_gray: 上一批最后一帧（跨批次衔接），可为None
+    :param prev_hist: 上一批最后一帧的直方图，可为None
+    :return: (scores, 本批最后一帧, 本批最后一帧直方图)
+    """
+    hists = _histogram_batch(gray_batch)
+    frames = gray_batch.astype(np.float32)
+
+    if prev_gray is None:
+        # 第一帧没有前驱，分数记为0
+        hist_diff = np.concatenate([[0.0], 0.5 * np.abs(np.diff(hists, axis=0)).sum(axis=1)])
+        pixel_diff = np.concatenate([[0.0], np.abs(np.diff(frames, axis=0)).mean(axis=(1, 2)) / 255.0])
+    else:
+        all_hists = np.vstack([prev_hist[None, :], hists])
+        all_frames = np.concatenate([prev_gray[None, :, :].astype(np.float32), frames])
+        hist_diff = 0.5 * np.abs(np.diff(all_hists, axis=0)).sum(axis=1)
+        pixel_diff = np.abs(np.diff(all_frames, axis=0)).mean(axis=(1, 2)) / 255.0
+
+    return np.maximum(hist_diff, pixel_diff), gray_batch[-1], hists[-1]
+
+
+def detect_scene_changes(video_path_or_url, sample_fps=0.5, batch_size=128,
+                         analysis_size=(64, 36), min_threshold=0.15, max_keyframes=16):
+    """
+    以低采样率解码视频，批量计算帧间差异，检测场景切换（如课件翻页）并选出代表性关键帧
+
+    :param video_path_or_url: 视频路径或URL
+    :param sample_fps: 每秒采样帧数
+    :param batch_size: 每批计算的帧数
+    :param analysis_size: 用于计算差异的缩小尺寸 (width, height)
+    :param min_threshold: 场景切换分数的最低阈值（0-1）
+    :param max_keyframes: 最多返回的关键帧数
+    :return: 关键帧时间戳列表（秒，升序）
+    """
+    success, cap = safe_video_capture_with_timeout(video_path_or_url)
+    if not success:
+        return []
+
+    timestamps = []
+    score_chunks = []
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if fps <= 0:
+            return []
+        stride = max(1, int(round(fps / sample_fps)))
+
+        batch, prev_gray, prev_hist = [], None, None
+        frame_index = 0
+        while True:
+            # 非采样帧只 grab 不解码，降低解码开销
+            if frame_index % stride != 0:
+                if not cap.grab():
+                    break
+                frame_index += 1
+                continue
+            ok, frame = cap.read()
+            if not ok or frame is None:
+                break
+            gray = cv2.cvtColor(cv2.resize(frame, analysis_size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+            batch.append(gray)
+            timestamps.append(frame_index / fps)
+            frame_index += 1
+
+            if len(batch) >= batch_size:
+                scores, prev_gray, prev_hist = _scene_change_scores(np.stack(batch), prev_gray, prev_hist)
+                score_chunks.append(scores)
+                batch = []
+
+        if batch:
+            scores, prev_gray, prev_hist = _scene_change_scores(np.stack(batch), prev_gray, prev_hist)
+            score_chunks.append(scores)
+    finally:
+        cap.release()
+
+    if not timestamps:
+        return []
+
+    scores = np.concatenate(score_chunks)
+    # 自适应阈值：显著高于整体波动的变化才视为场景切换
+    threshold = max(min_threshold, float(scores.mean() + 2 * scores.std()))
+    cut_indices = np.flatnonzero(scores > threshold)
+    if len(cut_indices) > max_keyframes - 1:
+        # 只保留变化最剧烈的切换点
+        strongest = np.argsort(scores[cut_indices])[::-1][:max_keyframes - 1]
+        cut_indices = np.sort(cut_indices[strongest])
+
+    # 在每个场景内选取最稳定（与前一帧差异最小）的帧作为代表，避开转场和动画过程
+    boundaries = np.concatenate([[0], cut_indices, [len(timestamps)]]).astype(int)
+    keyframes = []
+    for start, end in zip(boundaries[:-1], boundaries[1:]):
+        if end <= start:
+            continue
+        segment_scores = scores[start:end].copy()
+        if end - start > 1:
+            segment_scores[0] = np.inf  # 场景首帧本身就是切换帧
+        keyframes.append(timestamps[start + int(np.argmin(segment_scores))])
+    return keyframes
+
+
+def extract_keyframes(video_path_or_url, max_keyframes=16, sample_fps=0.5, max_width=768):
+    """
+    提取代表性关键帧，编码为JPEG data URL
+
+    :param video_path_or_url: 视频路径或URL
+    :param max_keyframes: 最多关键帧数
+    :param sample_fps: 场景检测的采样率
+    :param max_width: 关键帧最大宽度（像素）
+    :return: [(时间戳秒, data URL), ...]
+    """
+    keyframe_times = detect_scene_changes(
+        video_path_or_url, sample_fps=sample_fps, max_keyframes=max_keyframes
+    )
+    if not keyframe_times:
+        return []
+
+    success, cap = safe_video_capture_with_timeout(video_path_or_url)
+    if not success:
+        return []
+
+    keyframes = []
+    try:
+        for timestamp in keyframe_times:
+            cap.set(cv2.CAP_PROP_POS_MSEC, timestamp * 1000)
+            ok, frame = cap.read()
+            if not ok or frame is None:
+                continue
+            data_url = frame_to_data_url(frame, max_width=max_width)
+            if data_url:
+                keyframes.append((timestamp, data_url))
+    finally:
+        cap.release()
+    return keyframes
+
+
 def image_to_base64(image):
     """
     将PIL Image转换为base64字符串，用于在Streamlit中显示
@@ -403,3 +813,147 @@ def image_to_base64(image):
     except Exception as e:
         print(f"转换图片为base64时出错: {e}")
         return None
+
+
+def thumbnail_cache_key(video_path_or_url):
+    """
+    计算缩略图缓存键：本地文件使用 (绝对路径, 修改时间, 大小)，网络视频使用URL本身。
+    文件被替换后键随之变化，旧缩略图由淘汰策略回收。
+
+    :param video_path_or_url: 视频路径或URL
+    :return: 十六进制哈希字符串
+    """
+    if not validators.url(video_path_or_url) and os.path.exists(video_path_or_url):
+        stat = os.stat(video_path_or_url)
+        raw = f"{os.path.abspath(video_path_or_url)}|{stat.st_mtime_ns}|{stat.st_size}"
+    else:
+        raw = video_path_or_url
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def get_thumbnail_cache_path(video_path_or_url):
+    """返回缩略图在缓存目录中的路径（按键的前两位分桶）"""
+    key = thumbnail_cache_key(video_path_or_url)
+    return os.path.join(THUMBNAIL_CACHE_DIR, key[:2], f"{key}.jpg")
+
+
+def render_thumbnail_to_cache(video_path_or_url, title, cache_path):
+    """
+    生成缩略图并写入缓存文件（模块级函数，可在进程池中执行）。
+
+    :param video_path_or_url: 视频路径或URL
+    :param title: 无法抽帧时默认封面上显示的标题
+    :param cache_path: 缓存文件路径
+    :return: 缓存文件路径
+    """
+    if validators.url(video_path_or_url):
+        thumbnail = get_video_thumbnail_from_url(video_path_or_url)
+    else:
+        thumbnail = get_random_video_thumbnail(video_path_or_url, max_size=THUMBNAIL_SIZE)
+
+    if thumbnail is None:
+        thumbnail = create_default_thumbnail(title or "教学视频", size=THUMBNAIL_SIZE)
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # 先写临时文件再原子替换，避免并发读取到半个文件
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    thumbnail.convert("RGB").save(tmp_path, format="JPEG", quality=80, optimize=True)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+def get_cached_thumbnail(video_path_or_url, title=None):
+    """
+    获取视频缩略图的缓存文件路径。命中缓存时不再解码视频；未命中时同步生成一次。
+
+    :param video_path_or_url: 视频路径或URL
+    :param title: 默认封面标题
+    :return: 缓存文件路径或None
+    """
+    try:
+        cache_path = get_thumbnail_cache_path(video_path_or_url)
+        if os.path.exists(cache_path):
+            # 更新访问时间，供LRU淘汰使用
+            os.utime(cache_path, None)
+            return cache_path
+
+        render_thumbnail_to_cache(video_path_or_url, title, cache_path)
+        evict_thumbnail_cache()
+        return cache_path
+    except Exception as e:
+        print(f"获取缓存缩略图失败 {video_path_or_url}: {e}")
+        return None
+
+
+def _get_thumbnail_pool():
+    """懒加载缩略图预渲染进程池"""
+    global _thumbnail_pool
+    with _thumbnail_pool_lock:
+        if _thumbnail_pool is None:
+            _thumbnail_pool = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS)
+        return _thumbnail_pool
+
+
+def prerender_video_thumbnail(video_path_or_url, title=None):
+    """
+    在上传/添加视频时将缩略图生成任务提交到进程池，不阻塞页面。
+
+    :param video_path_or_url: 视频路径或URL
+    :param title: 默认封面标题
+    :return: Future对象；已缓存或提交失败时返回None
+    """
+    try:
+        cache_path = get_thumbnail_cache_path(video_path_or_url)
+        if os.path.exists(cache_path):
+            return None
+
+        future = _get_thumbnail_pool().submit(
+            render_thumbnail_to_cache, video_path_or_url, title, cache_path
+        )
+        future.add_done_callback(lambda f: evict_thumbnail_cache() if not f.exception() else None)
+        return future
+    except Exception as e:
+        print(f"提交缩略图预渲染任务失败 {video_path_or_url}: {e}")
+        return None
+
+
+def evict_thumbnail_cache(max_bytes=None):
+    """
+    按最近访问时间淘汰缩略图，使缓存总大小不超过上限。
+
+    :param max_bytes: 容量上限（字节），默认取 THUMBNAIL_CACHE_MAX_MB
+    :return: 被删除的文件数
+    """
+    if max_bytes is None:
+        max_bytes = THUMBNAIL_CACHE_MAX_MB * 1024 * 1024
+    if not os.path.isdir(THUMBNAIL_CACHE_DIR):
+        return 0
+
+    entries = []
+    total = 0
+    for root, _, files in os.walk(THUMBNAIL_CACHE_DIR):
+        for name in files:
+            if not name.endswith(".jpg"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    if total <= max_bytes:
+        return 0
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except OSError:
+            continue
+        if total <= max_bytes:
+            break
+    return removed